@@ -0,0 +1,367 @@
+"""
+批量处理API路由
+一次上传多个PPT(zip或多文件),在批次内有限并发地完成解析、分析与生成,并提供汇总状态和打包下载
+"""
+import asyncio
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Request
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.container import get_container
+from app.models.schemas import (
+    ProcessStatus, JobLane, TaskProgress, ContentAnalysisResult, BatchProgress, BatchItemProgress
+)
+from app.api.routes import (
+    task_status,
+    task_results,
+    content_analysis_results,
+    process_ppt,
+    process_ppt_phase2,
+    update_progress,
+    with_queue_position,
+    start_job
+)
+from app.services.admission_controller import get_admission_controller, PHASE1_STAGES
+from app.services import checkpoint_store
+from app.services.checkpoint_store import get_checkpoint_store
+from app.utils import generate_ppt_id, generate_batch_id, is_allowed_file, ensure_dir
+from app.utils.file_download import file_download_response
+
+
+router = APIRouter()
+
+# 批次存储: batch_id -> {"items": [(ppt_id, filename)], "output_zip": 路径, "zipped": 已打包的ppt_id}
+batches: Dict[str, Dict[str, Any]] = {}
+
+_TERMINAL_STATUSES = (ProcessStatus.COMPLETED, ProcessStatus.FAILED, ProcessStatus.CANCELLED)
+
+
+@router.post("/batch")
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    background_tasks: BackgroundTasks = None
+):
+    """
+    批量上传PPT并开始处理
+
+    可以上传多个PPT文件,也可以上传包含PPT的zip文件(两者可混合)。
+
+    Args:
+        files: 上传的文件
+        background_tasks: 后台任务
+
+    Returns:
+        dict: 包含batch_id和各PPT的ppt_id
+    """
+    settings = get_settings()
+    upload_dir = ensure_dir(settings.upload.upload_dir)
+    loop = asyncio.get_event_loop()
+
+    try:
+        items = await loop.run_in_executor(None, _save_batch_files, files, upload_dir, settings)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
+
+    if not items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"未找到可处理的PPT。仅支持: {settings.upload.allowed_extensions} 或包含它们的zip"
+        )
+
+    # 准入控制: 自动审查的批次还会经过生成阶段
+    stages = PHASE1_STAGES + ((ProcessStatus.GENERATING,) if settings.batch.auto_approve else ())
+    decision = get_admission_controller().admit(jobs=len(items), stages=stages, lane=JobLane.BULK)
+    if not decision.admitted:
+        _remove_files(path for _, _, path in items)
+        raise HTTPException(
+            status_code=503,
+            detail=f"系统繁忙,预计处理时间 {decision.estimated_seconds:.0f} 秒,请稍后重试",
+            headers={"Retry-After": str(decision.retry_after)}
+        )
+
+    batch_id = generate_batch_id()
+    batches[batch_id] = {
+        "items": [(ppt_id, filename) for ppt_id, filename, _ in items],
+        "output_zip": None,
+        "zipped": None
+    }
+
+    checkpoints = get_checkpoint_store()
+    for ppt_id, filename, file_path in items:
+        await checkpoints.save(
+            ppt_id, checkpoint_store.UPLOADED,
+            file_path=file_path, filename=filename, lane=JobLane.BULK
+        )
+        task_status[ppt_id] = TaskProgress(
+            ppt_id=ppt_id,
+            status=ProcessStatus.PENDING,
+            progress=0,
+            current_step="上传完成",
+            message=f"文件已上传,在批次 {batch_id} 中排队"
+        )
+
+    background_tasks.add_task(run_batch, batch_id, items)
+
+    logger.info(f"批次上传成功: {batch_id}, PPT数: {len(items)}")
+
+    return {
+        "batch_id": batch_id,
+        "total": len(items),
+        "items": [{"ppt_id": ppt_id, "filename": filename} for ppt_id, filename, _ in items],
+        "status": "deferred" if decision.deferred else "uploaded",
+        "estimated_seconds": round(decision.estimated_seconds, 1),
+        "message": "系统繁忙,批次已排队等待处理" if decision.deferred else "批次上传成功,开始处理"
+    }
+
+
+async def run_batch(batch_id: str, items: List[Tuple[str, str, str]]):
+    """
+    处理一个批次
+
+    批次内使用同一个优化编排器(模型客户端与缓存),内容相同的PPT只分析一次,
+    同时处理的PPT数量不超过 batch.max_concurrency。批次任务走批量通道,
+    在各阶段排在交互任务之后;每个PPT可以通过 DELETE /api/jobs/{ppt_id} 单独取消。
+
+    Args:
+        batch_id: 批次ID
+        items: (ppt_id, 文件名, 路径)列表
+    """
+    settings = get_settings()
+    orchestrator = get_container().orchestrator
+    analysis_cache: Dict[str, ContentAnalysisResult] = {}
+    semaphore = asyncio.Semaphore(max(1, settings.batch.max_concurrency))
+
+    async def run_item(ppt_id: str, filename: str, file_path: str):
+        async with semaphore:
+            await process_ppt(ppt_id, file_path, filename, orchestrator, analysis_cache, lane=JobLane.BULK)
+
+            if not settings.batch.auto_approve:
+                return
+            if task_status[ppt_id].status != ProcessStatus.WAITING_USER_REVIEW:
+                return
+
+            default_edits = orchestrator.create_default_user_edits(content_analysis_results[ppt_id])
+            update_progress(
+                ppt_id, ProcessStatus.USER_EDITING, 45,
+                "使用默认建议", "批量处理: 使用默认优化建议..."
+            )
+            await process_ppt_phase2(ppt_id, default_edits, orchestrator)
+
+    logger.info(f"开始处理批次: {batch_id}, PPT数: {len(items)}")
+    await asyncio.gather(
+        *(start_job(item[0], run_item(*item)) for item in items),
+        return_exceptions=True
+    )
+    logger.info(f"批次处理结束: {batch_id}")
+
+
+@router.get("/batch/{batch_id}/status")
+async def get_batch_status(batch_id: str):
+    """
+    获取批次汇总状态
+
+    Args:
+        batch_id: 批次ID
+
+    Returns:
+        dict: 批次进度
+    """
+    return _batch_progress(batch_id).dict()
+
+
+@router.get("/batch/{batch_id}/download")
+async def download_batch(batch_id: str, request: Request):
+    """
+    打包下载批次中已完成的全部优化PPT
+
+    Args:
+        batch_id: 批次ID
+        request: 当前请求
+
+    Returns:
+        Response: zip文件
+    """
+    progress = _batch_progress(batch_id)
+    done = tuple(item.ppt_id for item in progress.items if item.status == ProcessStatus.COMPLETED)
+    if not done:
+        raise HTTPException(status_code=409, detail="批次中暂无已完成的PPT")
+
+    batch = batches[batch_id]
+    if batch["zipped"] != done or not batch["output_zip"] or not Path(batch["output_zip"]).exists():
+        settings = get_settings()
+        zip_path = str(ensure_dir(settings.upload.temp_dir) / f"{batch_id}_outputs.zip")
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, _build_output_zip, zip_path, done)
+        batch["output_zip"], batch["zipped"] = zip_path, done
+
+    return await file_download_response(
+        request,
+        batch["output_zip"],
+        media_type="application/zip",
+        filename=f"{batch_id}_optimized.zip"
+    )
+
+
+def _batch_progress(batch_id: str) -> BatchProgress:
+    """汇总批次中各PPT的进度"""
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="批次不存在")
+
+    items = []
+    for ppt_id, filename in batches[batch_id]["items"]:
+        status = task_status.get(ppt_id)
+        if status is not None:
+            status = with_queue_position(status)
+        items.append(BatchItemProgress(
+            ppt_id=ppt_id,
+            filename=filename,
+            status=status.status if status else ProcessStatus.PENDING,
+            progress=status.progress if status else 0,
+            message=status.message if status else "",
+            queue_position=status.queue_position if status else None
+        ))
+
+    total = len(items)
+    completed = sum(1 for item in items if item.status == ProcessStatus.COMPLETED)
+    failed = sum(1 for item in items if item.status == ProcessStatus.FAILED)
+    cancelled = sum(1 for item in items if item.status == ProcessStatus.CANCELLED)
+    waiting = sum(1 for item in items if item.status == ProcessStatus.WAITING_USER_REVIEW)
+
+    if completed + failed + cancelled < total:
+        status = "processing"
+    elif completed == total:
+        status = "completed"
+    elif completed == 0:
+        status = "failed" if failed else "cancelled"
+    else:
+        status = "partial"
+
+    return BatchProgress(
+        batch_id=batch_id,
+        status=status,
+        total=total,
+        completed=completed,
+        failed=failed,
+        cancelled=cancelled,
+        waiting_review=waiting,
+        progress=sum(100 if item.status in _TERMINAL_STATUSES else item.progress for item in items) / total,
+        items=items,
+        download_url=f"/api/batch/{batch_id}/download" if completed else None
+    )
+
+
+def _save_batch_files(files: List[UploadFile], upload_dir: Path, settings) -> List[Tuple[str, str, str]]:
+    """
+    保存批量上传的PPT(在线程池中执行,解压和写盘不阻塞事件循环)
+
+    出错时删除本批次已保存的文件。
+
+    Args:
+        files: 上传的文件
+        upload_dir: 上传目录
+        settings: 配置
+
+    Returns:
+        List[Tuple[str, str, str]]: (ppt_id, 文件名, 路径)列表
+    """
+    items: List[Tuple[str, str, str]] = []
+    try:
+        for upload in files:
+            if upload.filename.lower().endswith(".zip"):
+                items.extend(_extract_zip(upload, upload_dir, settings))
+            elif is_allowed_file(upload.filename, settings.upload.allowed_extensions):
+                items.append(_save_upload(upload.file, Path(upload.filename).name, upload_dir, settings))
+            else:
+                logger.warning(f"批量上传跳过不支持的文件: {upload.filename}")
+
+            if len(items) > settings.batch.max_files:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"文件过多。单个批次最多: {settings.batch.max_files} 个PPT"
+                )
+    except Exception:
+        _remove_files(path for _, _, path in items)
+        raise
+    return items
+
+
+def _save_upload(source, filename: str, upload_dir: Path, settings) -> Tuple[str, str, str]:
+    """保存单个PPT(超过大小限制时报错)"""
+    ppt_id = generate_ppt_id()
+    file_path = upload_dir / f"{ppt_id}_{filename}"
+
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+    if file_path.stat().st_size > settings.upload.max_size:
+        file_path.unlink()
+        raise HTTPException(
+            status_code=400,
+            detail=f"文件过大: {filename}。最大允许: {settings.upload.max_size / 1024 / 1024}MB"
+        )
+    return ppt_id, filename, str(file_path)
+
+
+def _extract_zip(upload: UploadFile, upload_dir: Path, settings) -> List[Tuple[str, str, str]]:
+    """解压zip中的PPT(只取文件名,忽略目录结构和系统文件)"""
+    items = []
+    try:
+        with zipfile.ZipFile(upload.file) as archive:
+            for info in archive.infolist():
+                filename = Path(info.filename).name
+                if info.is_dir() or info.filename.startswith("__MACOSX/") or filename.startswith("."):
+                    continue
+                if not is_allowed_file(filename, settings.upload.allowed_extensions):
+                    continue
+                if info.file_size > settings.upload.max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"文件过大: {filename}。最大允许: {settings.upload.max_size / 1024 / 1024}MB"
+                    )
+                if len(items) >= settings.batch.max_files:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"文件过多。单个批次最多: {settings.batch.max_files} 个PPT"
+                    )
+                with archive.open(info) as member:
+                    items.append(_save_upload(member, filename, upload_dir, settings))
+    except zipfile.BadZipFile:
+        _remove_files(path for _, _, path in items)
+        raise HTTPException(status_code=400, detail=f"无效的zip文件: {upload.filename}")
+    except HTTPException:
+        _remove_files(path for _, _, path in items)
+        raise
+    return items
+
+
+def _build_output_zip(zip_path: str, ppt_ids: Tuple[str, ...]):
+    """将已完成的优化PPT打包(PPTX本身已压缩,直接存储;条目使用展示文件名,重名时加ppt_id前缀)"""
+    used_names = set()
+    tmp_path = zip_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for ppt_id in ppt_ids:
+            output_file = task_results.get(ppt_id, {}).get("output_file")
+            if not output_file or not Path(output_file).exists():
+                continue
+            name = task_results[ppt_id].get("output_filename") or Path(output_file).name
+            if name in used_names:
+                name = f"{ppt_id}_{name}"
+            used_names.add(name)
+            archive.write(output_file, arcname=name)
+    Path(tmp_path).replace(zip_path)
+
+
+def _remove_files(paths):
+    """删除已保存的上传文件"""
+    for path in paths:
+        try:
+            Path(path).unlink()
+        except OSError:
+            pass
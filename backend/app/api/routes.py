@@ -2,22 +2,37 @@
 API路由模块
 提供PPT优化的REST API接口
 """
+import asyncio
 import os
 import shutil
 from pathlib import Path
-from typing import Dict, Any
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from typing import TYPE_CHECKING, Awaitable, Dict, Any, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
 from loguru import logger
 
-from app.core.config import get_settings
+from app.core.config import get_settings, get_config_snapshot, reload_settings
+from app.core.container import get_container
+from app.models.compact import CompactParseResult
 from app.models.schemas import (
-    TaskProgress, ProcessStatus, ContentAnalysisResult,
-    UserEditRequest, ChangeTrackingReport
+    TaskProgress, ProcessStatus, JobLane, ContentAnalysisResult,
+    UserEditRequest, ChangeTrackingReport, FinalOptimizationPlan, PPTGenerateResult
 )
-from app.services import PPTParser, ModelEngine, IterationCorrector, PPTGenerator
-from app.services.optimization_orchestrator import OptimizationOrchestrator
-from app.utils import generate_ppt_id, is_allowed_file, ensure_dir, get_file_size
+from app.services.change_report_index import ChangeReportIndex
+from app.services.admission_controller import get_admission_controller
+from app.services import checkpoint_store
+from app.services.checkpoint_store import get_checkpoint_store
+from app.services import tracing
+from app.services.tracing import get_tracer
+from app.services.job_profiler import get_profiler
+from app.utils import generate_ppt_id, generate_file_hash, is_allowed_file, ensure_dir, get_file_size
+from app.utils.serialized_response import SerializedPayload
+from app.utils.file_download import file_download_response, file_etag, write_gzip_sidecar
+from app.utils.cancellation import run_cancellable
+from app.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Gauge, get_metrics_registry
+
+if TYPE_CHECKING:
+    # 编排器依赖python-pptx、httpx等较重的模块,运行时通过服务容器按需加载
+    from app.services.optimization_orchestrator import OptimizationOrchestrator
 
 
 router = APIRouter()
@@ -34,21 +49,67 @@ content_analysis_results: Dict[str, ContentAnalysisResult] = {}
 # 修改追踪报告存储
 change_reports: Dict[str, ChangeTrackingReport] = {}
 
-# PPT数据存储（用于第二阶段）
+# 修改报告分页索引（与报告同时生成）
+change_report_indexes: Dict[str, ChangeReportIndex] = {}
+
+# 预序列化的结果响应: ppt_id -> {include_changes: 响应体}
+result_payloads: Dict[str, Dict[bool, SerializedPayload]] = {}
+
+# PPT数据存储（用于第二阶段,解析结果以CompactParseResult保存）
 ppt_data_cache: Dict[str, Any] = {}
 
+# 正在执行的后台任务（用于取消）
+job_tasks: Dict[str, "asyncio.Future"] = {}
+
+_FINISHED_STATUSES = (ProcessStatus.COMPLETED, ProcessStatus.FAILED, ProcessStatus.CANCELLED)
+
+# 各阶段当前负载(导出指标时从准入控制器读取)
+STAGE_IN_FLIGHT: Gauge = get_metrics_registry().register(Gauge(
+    "ppt_stage_in_flight", "各阶段进行中的任务数", ("stage",)
+))
+STAGE_QUEUED: Gauge = get_metrics_registry().register(Gauge(
+    "ppt_stage_queued", "各阶段排队的任务数", ("stage",)
+))
+
+
+def start_job(ppt_id: str, job: Awaitable) -> "asyncio.Future":
+    """
+    启动后台任务并登记（任务结束后自动移除）
+
+    Args:
+        ppt_id: PPT ID
+        job: 任务协程
+
+    Returns:
+        asyncio.Future: 后台任务
+    """
+    task = asyncio.ensure_future(job)
+    job_tasks[ppt_id] = task
+
+    def _forget(done):
+        if job_tasks.get(ppt_id) is done:
+            del job_tasks[ppt_id]
+
+    task.add_done_callback(_forget)
+    return task
+
 
 @router.post("/upload")
 async def upload_ppt(
+    response: Response,
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    profile: bool = Query(False, description="是否对该任务的CPU密集阶段进行性能分析")
 ):
     """
     上传PPT文件并开始处理
 
+    系统过载(预计完成时间超过SLO)时,排队任务未满则延后接受,否则返回503和Retry-After。
+    单文件上传走交互通道,在各阶段排在批量任务之前。
+
     Args:
+        response: 当前响应(用于设置Retry-After)
         file: 上传的PPT文件
-        background_tasks: 后台任务
+        profile: 是否开启性能分析(结果通过 /api/admin/profile/{ppt_id} 下载)
 
     Returns:
         dict: 包含ppt_id和初始状态
@@ -63,6 +124,15 @@ async def upload_ppt(
                 detail=f"不支持的文件类型。仅支持: {settings.upload.allowed_extensions}"
             )
 
+        # 准入控制
+        decision = get_admission_controller().admit()
+        if not decision.admitted:
+            raise HTTPException(
+                status_code=503,
+                detail=f"系统繁忙,预计处理时间 {decision.estimated_seconds:.0f} 秒,请稍后重试",
+                headers={"Retry-After": str(decision.retry_after)}
+            )
+
         # 生成PPT ID
         ppt_id = generate_ppt_id()
 
@@ -91,17 +161,30 @@ async def upload_ppt(
             status=ProcessStatus.PENDING,
             progress=0,
             current_step="上传完成",
-            message="文件已上传,等待处理"
+            message="系统繁忙,文件已上传并排队等待处理" if decision.deferred else "文件已上传,等待处理"
         )
 
+        await get_checkpoint_store().save(
+            ppt_id, checkpoint_store.UPLOADED,
+            file_path=str(file_path), filename=file.filename, lane=JobLane.INTERACTIVE
+        )
+
+        if profile:
+            get_profiler().enable(ppt_id)
+
         # 启动后台处理任务
-        background_tasks.add_task(process_ppt, ppt_id, str(file_path), file.filename)
+        start_job(ppt_id, process_ppt(ppt_id, str(file_path), file.filename))
+
+        if decision.deferred:
+            # 建议客户端在该时间后再轮询状态
+            response.headers["Retry-After"] = str(decision.retry_after)
 
         return {
             "ppt_id": ppt_id,
             "filename": file.filename,
-            "status": "uploaded",
-            "message": "文件上传成功,开始处理"
+            "status": "deferred" if decision.deferred else "uploaded",
+            "estimated_seconds": round(decision.estimated_seconds, 1),
+            "message": "系统繁忙,已排队等待处理" if decision.deferred else "文件上传成功,开始处理"
         }
 
     except HTTPException:
@@ -111,7 +194,15 @@ async def upload_ppt(
         raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
 
 
-async def process_ppt(ppt_id: str, file_path: str, filename: str):
+async def process_ppt(
+    ppt_id: str,
+    file_path: str,
+    filename: str,
+    orchestrator: Optional["OptimizationOrchestrator"] = None,
+    analysis_cache: Optional[Dict[str, ContentAnalysisResult]] = None,
+    parsed: Optional[CompactParseResult] = None,
+    lane: JobLane = JobLane.INTERACTIVE
+):
     """
     后台处理PPT的完整流程（两阶段）
     阶段1: PPT解析 + 内容分析 → 等待用户审查
@@ -121,34 +212,54 @@ async def process_ppt(ppt_id: str, file_path: str, filename: str):
         ppt_id: PPT ID
         file_path: 文件路径
         filename: 文件名
+        orchestrator: 优化编排器（默认使用服务容器中的共享编排器）
+        analysis_cache: 按文件哈希缓存的内容分析结果（批量处理时内容相同的PPT只分析一次）
+        parsed: 已有的解析结果（从检查点恢复时传入，跳过解析）
+        lane: 优先级通道
     """
-    settings = get_settings()
+    admission = get_admission_controller()
+    checkpoints = get_checkpoint_store()
+    tracer = get_tracer()
 
     try:
         # =====================================================================
         # 阶段1: 内容分析
         # =====================================================================
 
-        # 步骤1: 解析PPT
-        update_progress(ppt_id, ProcessStatus.PARSING, 10, "解析PPT", "正在解析PPT文件...")
-        parser = PPTParser()
-        ppt_data = parser.parse(file_path, ppt_id)
-        logger.info(f"PPT解析完成: {ppt_id}")
-
-        # 缓存PPT数据（供第二阶段使用）
-        ppt_data_cache[ppt_id] = {
-            "ppt_data": ppt_data,
-            "file_path": file_path,
-            "filename": filename
-        }
-
-        # 步骤2: 内容深度分析
-        update_progress(
-            ppt_id, ProcessStatus.CONTENT_ANALYZING, 30,
-            "内容分析", "正在使用大模型进行深度内容分析..."
-        )
-        orchestrator = OptimizationOrchestrator(settings.dict())
-        content_analysis = await orchestrator.execute_phase1_analysis(ppt_data)
+        if orchestrator is None:
+            orchestrator = get_container().orchestrator
+
+        if parsed is None and analysis_cache is None and orchestrator.streams_analysis:
+            # 步骤1+2: 分段内容分析时边解析边分析
+            content_analysis = await _parse_and_analyze(ppt_id, file_path, filename, orchestrator, lane)
+        else:
+            # 步骤1: 解析PPT
+            if parsed is None:
+                update_progress(ppt_id, ProcessStatus.PARSING, 10, "解析PPT", "正在解析PPT文件...")
+                async with admission.stage(ppt_id, ProcessStatus.PARSING, lane):
+                    parser = get_container().create_parser()
+                    async with tracer.span(ppt_id, tracing.PARSE):
+                        parse = get_profiler().wrap(ppt_id, "parse", parser.parse_compact)
+                        parsed = await run_cancellable(parse, file_path, ppt_id)
+                await checkpoints.save(ppt_id, checkpoint_store.PARSED, ppt_data=parsed.checkpoint_data())
+                logger.info(f"PPT解析完成: {ppt_id}")
+            ppt_data = parsed.to_result()
+
+            # 缓存紧凑的PPT数据（供第二阶段使用,本阶段结束后pydantic视图即被释放）
+            _cache_parsed(ppt_id, parsed, file_path, filename, lane, orchestrator)
+
+            # 步骤2: 内容深度分析
+            update_progress(
+                ppt_id, ProcessStatus.CONTENT_ANALYZING, 30,
+                "内容分析", "正在使用大模型进行深度内容分析..."
+            )
+            file_hash = await asyncio.get_event_loop().run_in_executor(None, generate_file_hash, file_path)
+            async with admission.stage(ppt_id, ProcessStatus.CONTENT_ANALYZING, lane):
+                async with tracer.span(ppt_id, tracing.CONTENT_ANALYSIS, slides=ppt_data.total_slides):
+                    if analysis_cache is not None:
+                        content_analysis = await _shared_analysis(analysis_cache, orchestrator, file_hash, ppt_data)
+                    else:
+                        content_analysis = await orchestrator.execute_phase1_analysis(ppt_data, file_hash)
         logger.info(
             f"内容分析完成: {ppt_id}, "
             f"识别 {len(content_analysis.optimization_opportunities)} 个优化机会"
@@ -156,6 +267,7 @@ async def process_ppt(ppt_id: str, file_path: str, filename: str):
 
         # 保存内容分析结果
         content_analysis_results[ppt_id] = content_analysis
+        await checkpoints.save(ppt_id, checkpoint_store.ANALYZED, content_analysis=content_analysis)
 
         # 步骤3: 等待用户审查
         update_progress(
@@ -171,18 +283,141 @@ async def process_ppt(ppt_id: str, file_path: str, filename: str):
 
     except Exception as e:
         logger.error(f"PPT处理失败（第一阶段）: {ppt_id}, 错误: {str(e)}")
-        update_progress(ppt_id, ProcessStatus.FAILED, 0, "失败", f"处理失败: {str(e)}")
+        await mark_failed(ppt_id, f"处理失败: {str(e)}")
+
+
+def _cache_parsed(
+    ppt_id: str,
+    parsed: CompactParseResult,
+    file_path: str,
+    filename: str,
+    lane: JobLane,
+    orchestrator: "OptimizationOrchestrator"
+):
+    """缓存紧凑的PPT数据和第一阶段使用的编排器（第二阶段沿用同一份配置快照）"""
+    ppt_data_cache[ppt_id] = {
+        "ppt_data": parsed,
+        "file_path": file_path,
+        "filename": filename,
+        "lane": lane,
+        "orchestrator": orchestrator
+    }
+
 
+def _job_orchestrator(ppt_id: str) -> "OptimizationOrchestrator":
+    """任务第一阶段使用的编排器(配置热加载后,进行中的任务仍使用原配置快照)"""
+    cached_data = ppt_data_cache.get(ppt_id)
+    if cached_data is not None and cached_data.get("orchestrator") is not None:
+        return cached_data["orchestrator"]
+    return get_container().orchestrator
 
-async def process_ppt_phase2(ppt_id: str, user_edits: UserEditRequest):
+
+async def _parse_and_analyze(
+    ppt_id: str,
+    file_path: str,
+    filename: str,
+    orchestrator: "OptimizationOrchestrator",
+    lane: JobLane
+) -> ContentAnalysisResult:
+    """
+    边解析边分析(分段内容分析时使用)
+
+    解析在线程池中逐页进行,每解析完一段即提交该段的内容分析;
+    解析完成后照常写入检查点并缓存解析结果,再等待分析完成。
+
+    Args:
+        ppt_id: PPT ID
+        file_path: 文件路径
+        filename: 文件名
+        orchestrator: 优化编排器
+        lane: 优先级通道
+
+    Returns:
+        ContentAnalysisResult: 内容分析结果
+    """
+    admission = get_admission_controller()
+    tracer = get_tracer()
+    loop = asyncio.get_event_loop()
+    # 文件哈希读取整个上传文件,在线程池中计算
+    file_hash = await loop.run_in_executor(None, generate_file_hash, file_path)
+
+    async def analyze(stream) -> ContentAnalysisResult:
+        async with admission.stage(ppt_id, ProcessStatus.CONTENT_ANALYZING, lane):
+            async with tracer.span(ppt_id, tracing.CONTENT_ANALYSIS, slides=stream.total_slides):
+                return await orchestrator.execute_phase1_streaming(stream, file_hash)
+
+    update_progress(ppt_id, ProcessStatus.PARSING, 10, "解析PPT", "正在解析PPT文件并分段分析...")
+    analysis = None
+    try:
+        async with admission.stage(ppt_id, ProcessStatus.PARSING, lane):
+            parser = get_container().create_parser()
+            async with tracer.span(ppt_id, tracing.PARSE):
+                stream = await loop.run_in_executor(None, parser.open_stream, file_path, ppt_id)
+                stream.start(get_profiler().wrap(ppt_id, "parse", stream.run))
+                analysis = asyncio.ensure_future(analyze(stream))
+                parsed = await stream.wait()
+        await get_checkpoint_store().save(ppt_id, checkpoint_store.PARSED, ppt_data=parsed.checkpoint_data())
+        logger.info(f"PPT解析完成: {ppt_id}")
+        _cache_parsed(ppt_id, parsed, file_path, filename, lane, orchestrator)
+
+        update_progress(
+            ppt_id, ProcessStatus.CONTENT_ANALYZING, 30,
+            "内容分析", "正在使用大模型进行深度内容分析..."
+        )
+        return await analysis
+    except BaseException:
+        # 解析失败或任务被取消: 停止进行中的分析
+        if analysis is not None:
+            analysis.cancel()
+        raise
+
+
+async def _shared_analysis(
+    analysis_cache: Dict[str, ContentAnalysisResult],
+    orchestrator: "OptimizationOrchestrator",
+    file_hash: str,
+    ppt_data
+) -> ContentAnalysisResult:
+    """
+    批次内内容相同的PPT共享一次内容分析
+
+    进行中的相同分析由编排器合并,这里只在批次内保留已完成的结果。
+
+    Args:
+        analysis_cache: 文件哈希 -> 已完成的分析结果
+        orchestrator: 优化编排器
+        file_hash: 文件内容哈希
+        ppt_data: PPT解析结果
+
+    Returns:
+        ContentAnalysisResult: 内容分析结果（ppt_id为当前PPT）
+    """
+    cached = analysis_cache.get(file_hash)
+    if cached is not None:
+        logger.info(f"复用相同内容PPT的分析结果: {ppt_data.ppt_id}")
+        return cached.copy(update={"ppt_id": ppt_data.ppt_id}, deep=True)
+
+    analysis = await orchestrator.execute_phase1_analysis(ppt_data, file_hash)
+    analysis_cache.setdefault(file_hash, analysis)
+    return analysis
+
+
+async def process_ppt_phase2(
+    ppt_id: str,
+    user_edits: UserEditRequest,
+    orchestrator: Optional["OptimizationOrchestrator"] = None,
+    final_plan: Optional[FinalOptimizationPlan] = None
+):
     """
     执行PPT优化的第二阶段
 
     Args:
         ppt_id: PPT ID
         user_edits: 用户编辑请求
+        orchestrator: 优化编排器（默认沿用第一阶段的编排器，配置热加载不影响进行中的任务）
+        final_plan: 已构建的优化方案（从检查点恢复时传入）
     """
-    settings = get_settings()
+    checkpoints = get_checkpoint_store()
 
     try:
         # 获取缓存的数据
@@ -193,8 +428,10 @@ async def process_ppt_phase2(ppt_id: str, user_edits: UserEditRequest):
             raise Exception("内容分析结果未找到")
 
         cached_data = ppt_data_cache[ppt_id]
-        ppt_data = cached_data["ppt_data"]
+        parsed: CompactParseResult = cached_data["ppt_data"]
+        ppt_data = parsed.to_result()
         file_path = cached_data["file_path"]
+        lane = cached_data.get("lane", JobLane.INTERACTIVE)
         content_analysis = content_analysis_results[ppt_id]
 
         # =====================================================================
@@ -207,7 +444,12 @@ async def process_ppt_phase2(ppt_id: str, user_edits: UserEditRequest):
             "执行优化", "正在基于您的编辑执行优化..."
         )
 
-        orchestrator = OptimizationOrchestrator(settings.dict())
+        if orchestrator is None:
+            orchestrator = _job_orchestrator(ppt_id)
+
+        if final_plan is None:
+            await checkpoints.discard_after(ppt_id, checkpoint_store.ANALYZED)
+            await checkpoints.save(ppt_id, checkpoint_store.EDITS_ACCEPTED, user_edits=user_edits)
 
         # 步骤5: 多模型分析（基于用户编辑的指引）
         update_progress(
@@ -215,44 +457,226 @@ async def process_ppt_phase2(ppt_id: str, user_edits: UserEditRequest):
             "模型分析", "正在调用多个AI模型进行优化分析..."
         )
 
+        if final_plan is None:
+            with get_tracer().span(ppt_id, tracing.PLAN):
+                final_plan = orchestrator.build_final_plan(ppt_data, user_edits, content_analysis)
+            await checkpoints.save(ppt_id, checkpoint_store.PLANNED, final_plan=final_plan)
+
         # 步骤6: 生成PPT和修改追踪报告
         update_progress(
             ppt_id, ProcessStatus.GENERATING, 85,
             "生成PPT", "正在生成优化后的PPT并追踪修改..."
         )
 
-        generate_result, change_report = await orchestrator.execute_phase2_optimization(
-            file_path,
-            ppt_data,
-            user_edits,
-            content_analysis
-        )
+        async with get_admission_controller().stage(ppt_id, ProcessStatus.GENERATING, lane):
+            generate_result, change_report = await orchestrator.execute_phase2_optimization(
+                file_path,
+                ppt_data,
+                user_edits,
+                content_analysis,
+                final_plan
+            )
 
         if not generate_result.success:
             raise Exception(generate_result.error_message)
 
         logger.info(f"PPT生成完成: {ppt_id}, 修改数: {change_report.total_changes}")
 
-        # 保存修改追踪报告
-        change_reports[ppt_id] = change_report
-
-        # 存储结果
-        task_results[ppt_id] = {
-            "ppt_data": ppt_data.dict(),
-            "content_analysis": content_analysis.dict(),
-            "user_edits": user_edits.dict(),
-            "change_report": change_report.dict(),
-            "output_file": generate_result.output_path
-        }
-
-        # 完成
-        update_progress(ppt_id, ProcessStatus.COMPLETED, 100, "完成", "PPT优化完成!")
+        await checkpoints.save(
+            ppt_id, checkpoint_store.GENERATED,
+            generate_result=generate_result, change_report=change_report
+        )
+        await _store_phase2_results(ppt_id, parsed, content_analysis, user_edits, generate_result, change_report)
+        get_tracer().job_finished(ProcessStatus.COMPLETED.value)
 
         logger.info(f"第二阶段完成: {ppt_id}")
 
     except Exception as e:
         logger.error(f"PPT处理失败（第二阶段）: {ppt_id}, 错误: {str(e)}")
-        update_progress(ppt_id, ProcessStatus.FAILED, 0, "失败", f"处理失败: {str(e)}")
+        await mark_failed(ppt_id, f"处理失败: {str(e)}")
+
+
+async def _store_phase2_results(
+    ppt_id: str,
+    ppt_data: CompactParseResult,
+    content_analysis: ContentAnalysisResult,
+    user_edits: UserEditRequest,
+    generate_result: PPTGenerateResult,
+    change_report: ChangeTrackingReport
+):
+    """
+    保存第二阶段结果并将任务标记为完成
+
+    文件哈希、gzip旁路文件和结果序列化在线程池中执行,不阻塞事件循环。
+
+    Args:
+        ppt_id: PPT ID
+        ppt_data: 紧凑的PPT解析结果
+        content_analysis: 内容分析结果
+        user_edits: 用户编辑请求
+        generate_result: PPT生成结果
+        change_report: 修改追踪报告
+    """
+    settings = get_settings()
+
+    # 保存修改追踪报告
+    change_reports[ppt_id] = change_report
+    change_report_indexes[ppt_id] = ChangeReportIndex(change_report)
+
+    # 存储结果
+    task_results[ppt_id] = {
+        "ppt_data": ppt_data,
+        "content_analysis": content_analysis.dict(),
+        "user_edits": user_edits.dict(),
+        "change_report": change_report.dict(),
+        "output_file": generate_result.output_path,
+        "output_filename": generate_result.output_filename
+    }
+
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(
+        None, _prepare_download, generate_result.output_path, settings.download
+    )
+
+    # 结果只序列化一次,后续请求直接发送缓存字节
+    result_payloads[ppt_id] = await loop.run_in_executor(None, _serialize_result, ppt_id)
+
+    # 完成(任务结束,检查点不再需要)
+    update_progress(ppt_id, ProcessStatus.COMPLETED, 100, "完成", "PPT优化完成!")
+    await get_checkpoint_store().remove(ppt_id)
+
+
+def _prepare_download(output_path: str, download_config):
+    """预先计算下载ETag,按配置生成gzip旁路文件"""
+    file_etag(output_path)
+    if download_config.precompress:
+        write_gzip_sidecar(output_path, download_config.precompress_min_saving)
+
+
+def _serialize_result(ppt_id: str) -> Dict[bool, SerializedPayload]:
+    """序列化处理结果(含/不含修改明细两个版本)"""
+    return {
+        include_changes: SerializedPayload.from_object(_build_result(ppt_id, include_changes))
+        for include_changes in (True, False)
+    }
+
+
+async def mark_failed(ppt_id: str, message: str):
+    """
+    将任务标记为失败(同时删除检查点,重启后不再重试)
+
+    Args:
+        ppt_id: PPT ID
+        message: 失败信息
+    """
+    if ppt_id in task_status and task_status[ppt_id].status == ProcessStatus.CANCELLED:
+        return
+    update_progress(ppt_id, ProcessStatus.FAILED, 0, "失败", message)
+    await get_checkpoint_store().remove(ppt_id)
+    get_tracer().job_finished(ProcessStatus.FAILED.value)
+
+
+async def resume_interrupted_jobs():
+    """
+    从检查点恢复中断的任务(应用启动后在后台执行)
+
+    已结束的任务在结束时即删除检查点,这里只剩被中断和等待审查的任务:
+    等待审查的任务恢复其状态,处理中被中断的任务从最后完成的阶段继续执行。
+    超过保留时间的检查点直接清理,不再恢复。
+    """
+    checkpoints = get_checkpoint_store()
+    ttl_seconds = get_settings().checkpoint.ttl_hours * 3600
+    resumed = expired = 0
+
+    for ppt_id in checkpoints.jobs():
+        if ppt_id in task_status:
+            continue
+        if ttl_seconds > 0 and checkpoints.age(ppt_id) > ttl_seconds:
+            await checkpoints.remove(ppt_id)
+            expired += 1
+            continue
+        try:
+            if await _resume_job(checkpoints, ppt_id):
+                resumed += 1
+        except Exception as e:
+            logger.error(f"任务恢复失败: {ppt_id}, 错误: {str(e)}")
+            await mark_failed(ppt_id, f"任务恢复失败: {str(e)}")
+        # 逐个任务让出事件循环,恢复期间不影响请求处理
+        await asyncio.sleep(0)
+
+    if expired:
+        logger.info(f"清理 {expired} 个过期任务的检查点")
+    if resumed:
+        logger.info(f"从检查点继续执行 {resumed} 个中断的任务")
+
+
+async def _resume_job(checkpoints, ppt_id: str) -> bool:
+    """
+    恢复单个任务
+
+    Args:
+        checkpoints: 检查点存储
+        ppt_id: PPT ID
+
+    Returns:
+        bool: 是否重新启动了后台处理
+    """
+    uploaded = checkpoints.load(ppt_id, checkpoint_store.UPLOADED)
+    if uploaded is None:
+        return False
+    file_path, filename = uploaded["file_path"], uploaded["filename"]
+    lane = JobLane(uploaded.get("lane", JobLane.INTERACTIVE))
+    if not os.path.exists(file_path):
+        await mark_failed(ppt_id, "原始文件已丢失,请重新上传")
+        return False
+
+    # 已上传,未解析: 从头开始
+    parsed_checkpoint = checkpoints.load(ppt_id, checkpoint_store.PARSED)
+    if parsed_checkpoint is None or parsed_checkpoint.get("ppt_data") is None:
+        update_progress(ppt_id, ProcessStatus.PENDING, 0, "恢复任务", "服务重启,重新开始处理")
+        start_job(ppt_id, process_ppt(ppt_id, file_path, filename, lane=lane))
+        return True
+
+    # 配置快照不随检查点保存,恢复的任务统一使用恢复时的编排器
+    orchestrator = get_container().orchestrator
+    parsed = CompactParseResult.from_checkpoint(parsed_checkpoint["ppt_data"])
+    _cache_parsed(ppt_id, parsed, file_path, filename, lane, orchestrator)
+
+    # 已解析,未分析: 从内容分析继续
+    content_analysis = checkpoints.load_model(
+        ppt_id, checkpoint_store.ANALYZED, "content_analysis", ContentAnalysisResult
+    )
+    if content_analysis is None:
+        update_progress(ppt_id, ProcessStatus.PARSING, 10, "恢复任务", "服务重启,从内容分析继续")
+        start_job(ppt_id, process_ppt(ppt_id, file_path, filename, orchestrator, parsed=parsed, lane=lane))
+        return True
+    content_analysis_results[ppt_id] = content_analysis
+
+    # 已分析,未提交编辑: 恢复为等待审查
+    user_edits = checkpoints.load_model(ppt_id, checkpoint_store.EDITS_ACCEPTED, "user_edits", UserEditRequest)
+    if user_edits is None:
+        update_progress(
+            ppt_id, ProcessStatus.WAITING_USER_REVIEW, 40,
+            "等待审查", "内容分析已完成，请审查优化建议",
+            requires_user_action=True,
+            action_url=f"/api/content-analysis/{ppt_id}"
+        )
+        return False
+
+    # 已生成且文件仍在: 恢复结果
+    generated = checkpoints.load(ppt_id, checkpoint_store.GENERATED)
+    if generated is not None:
+        generate_result = PPTGenerateResult.parse_obj(generated["generate_result"])
+        if os.path.exists(generate_result.output_path):
+            change_report = ChangeTrackingReport.parse_obj(generated["change_report"])
+            await _store_phase2_results(ppt_id, parsed, content_analysis, user_edits, generate_result, change_report)
+            return False
+
+    # 已接收编辑: 从优化方案(若已构建)继续生成
+    final_plan = checkpoints.load_model(ppt_id, checkpoint_store.PLANNED, "final_plan", FinalOptimizationPlan)
+    update_progress(ppt_id, ProcessStatus.USER_EDITING, 45, "恢复任务", "服务重启,继续执行优化")
+    start_job(ppt_id, process_ppt_phase2(ppt_id, user_edits, orchestrator, final_plan=final_plan))
+    return True
 
 
 def update_progress(
@@ -264,7 +688,7 @@ def update_progress(
     requires_user_action: bool = False,
     action_url: str = None
 ):
-    """更新任务进度"""
+    """更新任务进度(附各处理区间的累计耗时)"""
     task_status[ppt_id] = TaskProgress(
         ppt_id=ppt_id,
         status=status,
@@ -272,7 +696,8 @@ def update_progress(
         current_step=step,
         message=message,
         requires_user_action=requires_user_action,
-        action_url=action_url
+        action_url=action_url,
+        timings=get_tracer().stage_totals(ppt_id)
     )
 
 
@@ -281,6 +706,8 @@ async def get_status(ppt_id: str):
     """
     获取PPT处理状态
 
+    任务在某个阶段排队时,返回其队列位置和预计等待时间。
+
     Args:
         ppt_id: PPT ID
 
@@ -290,23 +717,39 @@ async def get_status(ppt_id: str):
     if ppt_id not in task_status:
         raise HTTPException(status_code=404, detail="任务不存在")
 
-    return task_status[ppt_id].dict()
+    return with_queue_position(task_status[ppt_id]).dict()
 
 
-@router.get("/result/{ppt_id}")
-async def get_result(ppt_id: str):
+def with_queue_position(progress: TaskProgress) -> TaskProgress:
     """
-    获取PPT处理结果
+    为排队中的任务附加队列位置
+
+    Args:
+        progress: 任务进度
+
+    Returns:
+        TaskProgress: 任务进度(排队时包含queue_position和estimated_wait_seconds)
+    """
+    queued = get_admission_controller().queue_position(progress.ppt_id)
+    if queued is None:
+        return progress
+    return progress.copy(update={
+        "queue_position": queued.position,
+        "estimated_wait_seconds": round(queued.estimated_wait_seconds, 1)
+    })
+
+
+def _build_result(ppt_id: str, include_changes: bool) -> Dict[str, Any]:
+    """
+    组装结果响应
 
     Args:
         ppt_id: PPT ID
+        include_changes: 是否包含修改明细
 
     Returns:
         dict: 处理结果
     """
-    if ppt_id not in task_results:
-        raise HTTPException(status_code=404, detail="结果不存在或处理未完成")
-
     result = task_results[ppt_id]
 
     response = {
@@ -325,7 +768,10 @@ async def get_result(ppt_id: str):
 
     # 包含修改追踪报告（如果有）
     if "change_report" in result:
-        response["change_report"] = result["change_report"]
+        if include_changes or ppt_id not in change_report_indexes:
+            response["change_report"] = result["change_report"]
+        else:
+            response["change_report"] = change_report_indexes[ppt_id].header()
 
     # 兼容旧版本（如果有）
     if "model_suggestions" in result:
@@ -334,19 +780,56 @@ async def get_result(ppt_id: str):
     if "final_plan" in result:
         response["final_plan"] = result["final_plan"]
 
+    # 各处理区间的耗时明细
+    timings = get_tracer().job_timings(ppt_id)
+    if timings is not None:
+        response["timings"] = timings.dict()
+
     return response
 
 
+@router.get("/result/{ppt_id}")
+async def get_result(ppt_id: str, request: Request, include_changes: bool = True):
+    """
+    获取PPT处理结果
+
+    结果在第二阶段完成时已序列化并压缩,这里按请求头直接返回缓存字节,
+    If-None-Match命中时返回304。
+
+    Args:
+        ppt_id: PPT ID
+        request: 当前请求
+        include_changes: 是否包含修改明细(为False时只返回报告头部,明细通过分页接口获取)
+
+    Returns:
+        Response: 处理结果(JSON)
+    """
+    if ppt_id not in task_results:
+        raise HTTPException(status_code=404, detail="结果不存在或处理未完成")
+
+    payloads = result_payloads.setdefault(ppt_id, {})
+    payload = payloads.get(include_changes)
+    if payload is None:
+        payload = payloads[include_changes] = SerializedPayload.from_object(
+            _build_result(ppt_id, include_changes)
+        )
+
+    return payload.to_response(request)
+
+
 @router.get("/download/{ppt_id}")
-async def download_ppt(ppt_id: str):
+async def download_ppt(ppt_id: str, request: Request):
     """
     下载优化后的PPT
 
+    支持Range断点续传、ETag/Last-Modified条件请求,以及预压缩的gzip旁路文件。
+
     Args:
         ppt_id: PPT ID
+        request: 当前请求
 
     Returns:
-        FileResponse: PPT文件
+        Response: PPT文件
     """
     if ppt_id not in task_results:
         raise HTTPException(status_code=404, detail="文件不存在")
@@ -356,17 +839,150 @@ async def download_ppt(ppt_id: str):
     if not os.path.exists(output_path):
         raise HTTPException(status_code=404, detail="文件已被删除")
 
-    return FileResponse(
+    return await file_download_response(
+        request,
         output_path,
         media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        filename=Path(output_path).name
+        filename=task_results[ppt_id].get("output_filename") or Path(output_path).name
     )
 
 
+@router.delete("/jobs/{ppt_id}")
+async def cancel_job(ppt_id: str):
+    """
+    取消任务
+
+    取消正在执行的后台任务(包括进行中的模型调用和线程中的解析/生成工作),
+    释放其占用的阶段槽位,并删除任务的检查点(重启后不再恢复)。
+
+    Args:
+        ppt_id: PPT ID
+
+    Returns:
+        dict: 响应消息
+    """
+    if ppt_id not in task_status:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    status = task_status[ppt_id].status
+    if status in _FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"任务已结束，无法取消: {status}")
+
+    update_progress(ppt_id, ProcessStatus.CANCELLED, 0, "已取消", "任务已取消")
+
+    task = job_tasks.get(ppt_id)
+    if task is not None and not task.done():
+        task.cancel()
+        # 等待任务完成清理(释放阶段槽位等)
+        await asyncio.wait([task], timeout=5)
+
+    ppt_data_cache.pop(ppt_id, None)
+    content_analysis_results.pop(ppt_id, None)
+    await get_checkpoint_store().remove(ppt_id)
+    get_tracer().job_finished(ProcessStatus.CANCELLED.value)
+    get_tracer().discard(ppt_id)
+    get_profiler().disable(ppt_id)
+
+    logger.info(f"任务已取消: {ppt_id}")
+
+    return {
+        "ppt_id": ppt_id,
+        "status": "cancelled",
+        "message": "任务已取消"
+    }
+
+
 @router.get("/health")
 async def health_check():
-    """健康检查"""
-    return {"status": "ok", "message": "服务运行正常"}
+    """健康检查(附各处理阶段的负载)"""
+    return {"status": "ok", "message": "服务运行正常", "stages": get_admission_controller().snapshot()}
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus指标(各处理区间耗时、排队等待、模型调用、任务数和各阶段当前负载)"""
+    for stage, load in get_admission_controller().snapshot().items():
+        STAGE_IN_FLIGHT.set(load["in_flight"], stage=stage)
+        STAGE_QUEUED.set(load["queued"], stage=stage)
+    return Response(content=get_metrics_registry().render(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
+@router.post("/admin/reload-config")
+async def reload_config():
+    """
+    重新加载配置文件(无需重启服务)
+
+    之后开始的任务使用新的配置快照,进行中的任务继续使用原来的快照。
+    部分配置(日志、CORS、准入控制、检查点)仍需重启后生效。
+    """
+    previous = get_config_snapshot().version
+    try:
+        reload_settings()
+    except Exception as e:
+        logger.error(f"重新加载配置失败: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"配置无效,继续使用快照版本 {previous}: {str(e)}")
+
+    return {
+        "previous_version": previous,
+        "version": get_config_snapshot().version,
+        "message": "配置已重新加载"
+    }
+
+
+def _get_admin_profiler(ppt_id: str):
+    """获取性能分析器(未启用性能分析时返回403,任务不存在时返回404)"""
+    profiler = get_profiler()
+    if not profiler.enabled:
+        raise HTTPException(status_code=403, detail="性能分析未启用")
+    if ppt_id not in task_status:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return profiler
+
+
+@router.post("/admin/profile/{ppt_id}")
+async def enable_profiling(ppt_id: str):
+    """
+    为任务开启性能分析
+
+    对之后开始的CPU密集阶段(解析、应用优化、迭代修正)生效,如在等待审查时开启可分析第二阶段。
+    """
+    profiler = _get_admin_profiler(ppt_id)
+    profiler.enable(ppt_id)
+    return {"ppt_id": ppt_id, "profiling": True, "artifacts": profiler.artifacts(ppt_id)}
+
+
+@router.delete("/admin/profile/{ppt_id}")
+async def disable_profiling(ppt_id: str):
+    """关闭任务的性能分析(已保存的结果保留)"""
+    profiler = _get_admin_profiler(ppt_id)
+    profiler.disable(ppt_id)
+    return {"ppt_id": ppt_id, "profiling": False, "artifacts": profiler.artifacts(ppt_id)}
+
+
+@router.get("/admin/profile/{ppt_id}")
+async def list_profiling_artifacts(ppt_id: str):
+    """
+    列出任务的性能分析结果
+
+    每个阶段生成 <阶段>.prof(cProfile原始数据,可用snakeviz等工具查看)、
+    <阶段>_cpu.txt(按累计耗时排序的函数)和 <阶段>_alloc.txt(内存分配最多的代码位置)。
+    """
+    profiler = _get_admin_profiler(ppt_id)
+    return {
+        "ppt_id": ppt_id,
+        "profiling": profiler.is_enabled(ppt_id),
+        "artifacts": profiler.artifacts(ppt_id)
+    }
+
+
+@router.get("/admin/profile/{ppt_id}/{artifact}")
+async def download_profiling_artifact(ppt_id: str, artifact: str, request: Request):
+    """下载性能分析结果文件"""
+    path = _get_admin_profiler(ppt_id).artifact_path(ppt_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail="分析结果不存在")
+    media_type = "application/octet-stream" if path.suffix == ".prof" else "text/plain"
+    return await file_download_response(request, str(path), media_type, f"{ppt_id}_{artifact}")
 
 
 # ============================================================================
@@ -410,14 +1026,13 @@ async def get_content_analysis(ppt_id: str):
 
 
 @router.post("/submit-edits/{ppt_id}")
-async def submit_edits(ppt_id: str, user_edits: UserEditRequest, background_tasks: BackgroundTasks):
+async def submit_edits(ppt_id: str, user_edits: UserEditRequest):
     """
     提交用户编辑并继续优化
 
     Args:
         ppt_id: PPT ID
         user_edits: 用户编辑请求
-        background_tasks: 后台任务
 
     Returns:
         dict: 响应消息
@@ -446,7 +1061,7 @@ async def submit_edits(ppt_id: str, user_edits: UserEditRequest, background_task
     )
 
     # 启动第二阶段后台任务
-    background_tasks.add_task(process_ppt_phase2, ppt_id, user_edits)
+    start_job(ppt_id, process_ppt_phase2(ppt_id, user_edits, _job_orchestrator(ppt_id)))
 
     return {
         "ppt_id": ppt_id,
@@ -456,13 +1071,12 @@ async def submit_edits(ppt_id: str, user_edits: UserEditRequest, background_task
 
 
 @router.post("/skip-review/{ppt_id}")
-async def skip_review(ppt_id: str, background_tasks: BackgroundTasks):
+async def skip_review(ppt_id: str):
     """
     跳过审查，使用默认优化建议
 
     Args:
         ppt_id: PPT ID
-        background_tasks: 后台任务
 
     Returns:
         dict: 响应消息
@@ -484,8 +1098,7 @@ async def skip_review(ppt_id: str, background_tasks: BackgroundTasks):
     logger.info(f"用户跳过审查，使用默认建议: {ppt_id}")
 
     # 创建默认用户编辑
-    settings = get_settings()
-    orchestrator = OptimizationOrchestrator(settings.dict())
+    orchestrator = _job_orchestrator(ppt_id)
     content_analysis = content_analysis_results[ppt_id]
     default_edits = orchestrator.create_default_user_edits(content_analysis)
 
@@ -496,7 +1109,7 @@ async def skip_review(ppt_id: str, background_tasks: BackgroundTasks):
     )
 
     # 启动第二阶段后台任务
-    background_tasks.add_task(process_ppt_phase2, ppt_id, default_edits)
+    start_job(ppt_id, process_ppt_phase2(ppt_id, default_edits, orchestrator))
 
     return {
         "ppt_id": ppt_id,
@@ -525,3 +1138,65 @@ async def get_change_report(ppt_id: str):
         "ppt_id": ppt_id,
         "report": report.dict()
     }
+
+
+def _get_report_index(ppt_id: str) -> ChangeReportIndex:
+    """获取修改报告分页索引"""
+    if ppt_id not in change_report_indexes:
+        raise HTTPException(status_code=404, detail="修改报告不存在或处理未完成")
+    return change_report_indexes[ppt_id]
+
+
+@router.get("/change-report/{ppt_id}/summary")
+async def get_change_report_summary(ppt_id: str):
+    """
+    获取修改追踪报告头部(统计汇总,不含修改明细)
+
+    Args:
+        ppt_id: PPT ID
+
+    Returns:
+        dict: 报告头部
+    """
+    return _get_report_index(ppt_id).header()
+
+
+@router.get("/change-report/{ppt_id}/changes")
+async def get_change_report_changes(
+    ppt_id: str,
+    request: Request,
+    slide: Optional[int] = Query(None, ge=0),
+    dimension: Optional[str] = None,
+    source: Optional[str] = None,
+    impact: Optional[str] = None,
+    change_type: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500)
+):
+    """
+    分页获取修改记录(分页结果缓存为序列化后的字节,直接返回)
+
+    Args:
+        ppt_id: PPT ID
+        request: 当前请求
+        slide: 页码筛选(从0开始)
+        dimension: 维度筛选
+        source: 来源筛选
+        impact: 影响程度筛选
+        change_type: 修改类型筛选
+        page: 页号(从1开始)
+        page_size: 每页条数
+
+    Returns:
+        Response: 分页结果(JSON)
+    """
+    payload = _get_report_index(ppt_id).page(
+        slide=slide,
+        page=page,
+        page_size=page_size,
+        dimension=dimension,
+        source=source,
+        impact=impact,
+        change_type=change_type
+    )
+    return payload.to_response(request)
@@ -1,4 +1,4 @@
 """核心配置模块"""
-from .config import get_settings, Settings, reload_settings
+from .config import get_settings, Settings, reload_settings, get_config_snapshot, ConfigSnapshot
 
-__all__ = ['get_settings', 'Settings', 'reload_settings']
+__all__ = ['get_settings', 'Settings', 'reload_settings', 'get_config_snapshot', 'ConfigSnapshot']
@@ -2,10 +2,15 @@
 核心配置模块
 负责加载和管理应用配置
 """
+import asyncio
+import hashlib
+import json
 import os
+import threading
 import yaml
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from loguru import logger
 from pydantic import BaseModel, Field
 
 
@@ -26,6 +31,52 @@ class UploadConfig(BaseModel):
     temp_dir: str = "./temp"
 
 
+class ParsingConfig(BaseModel):
+    """解析配置"""
+    lazy_details: bool = True  # 版式占位符、样式、图片、图表明细在首次访问时才从源文件读取
+
+
+class DownloadConfig(BaseModel):
+    """下载配置"""
+    precompress: bool = False  # 生成优化PPT后是否预先生成gzip旁路文件
+    precompress_min_saving: float = 0.05  # 压缩收益低于该比例时不保留旁路文件
+
+
+class BatchConfig(BaseModel):
+    """批量处理配置"""
+    max_files: int = 200  # 单个批次的最大PPT数量
+    max_concurrency: int = 4  # 批次内同时处理的PPT数量
+    auto_approve: bool = True  # 是否跳过人工审查,直接使用默认优化建议
+
+
+class CheckpointConfig(BaseModel):
+    """阶段检查点配置"""
+    enabled: bool = True
+    checkpoint_dir: str = "./checkpoints"
+    resume_on_startup: bool = True  # 启动时从最后完成的阶段恢复中断的任务
+    ttl_hours: float = 72  # 未结束任务的检查点保留时间,超过后启动时清理而不恢复(0表示不清理)
+
+
+class AdmissionConfig(BaseModel):
+    """准入控制配置"""
+    enabled: bool = True
+    slo_seconds: float = 300  # 新任务完成第一阶段(解析+内容分析)的预计时间上限
+    max_deferred: int = 20  # 超过SLO时仍接受排队的任务数上限,超过后返回503(0表示直接拒绝)
+    latency_window: int = 50  # 每个阶段用于估算耗时的最近样本数
+    # 各阶段的并发槽位数
+    stage_concurrency: Dict[str, int] = {
+        "parsing": 4,
+        "content_analyzing": 4,
+        "generating": 2
+    }
+    # 各阶段没有耗时样本时使用的默认耗时(秒)
+    default_latency: Dict[str, float] = {
+        "parsing": 5,
+        "content_analyzing": 60,
+        "generating": 30
+    }
+
+
 class ModelConfig(BaseModel):
     """单个模型配置"""
     enabled: bool = True
@@ -34,6 +85,7 @@ class ModelConfig(BaseModel):
     api_key: str = ""
     timeout: int = 30
     max_retries: int = 3
+    max_prompt_tokens: int = 8000  # 单次调用的提示词token预算
     core_strength: str
     focus_dimensions: List[str]
 
@@ -54,6 +106,9 @@ class IterationConfig(BaseModel):
     max_rounds: int = 2
     conflict_threshold: float = 0.05
     manual_threshold: float = 0.10
+    similarity_threshold: float = 0.5  # 建议相似度阈值,低于该值视为不一致
+    chunk_size: int = 10  # 工作流中每批处理的页数
+    max_concurrency: int = 4  # 工作流中同时处理的批次数
     workflow: List[Dict[str, Any]] = []
 
 
@@ -61,6 +116,60 @@ class ConflictResolutionConfig(BaseModel):
     """冲突调和配置"""
     rules: Dict[str, Dict[str, List[str]]] = {}
     arbiter_model: str = "hunyuan"
+    arbiter_batch: bool = True  # 是否将多个冲突打包为一次仲裁请求
+    arbiter_batch_tokens: int = 3000  # 单个仲裁批次的提示词token预算
+    arbiter_concurrency: int = 4  # 同时发送的仲裁批次数
+
+
+class ContentAnalysisConfig(BaseModel):
+    """内容分析配置"""
+    enabled: bool = True
+    analyzer_model: str = "qianwen"
+    timeout: int = 60
+    max_retries: int = 3
+    analysis_depth: str = "comprehensive"
+    prompt_template: str = "content_analysis_v1"
+    section_size: int = 0  # 分段分析时每段的页数(各段在解析的同时提交),0表示整份PPT一次分析
+    section_concurrency: int = 4  # 分段分析时同时请求模型的段数
+
+
+class ChangeTrackingConfig(BaseModel):
+    """修改追踪配置"""
+    enabled: bool = True
+    detail_level: str = "detailed"
+    export_formats: List[str] = ["json", "markdown"]
+    xml_diff: bool = True  # 是否比较生成前后的幻灯片XML,以实际修改生成报告
+    diff_workers: Optional[int] = None  # 差异比较进程数,0表示不使用进程池
+
+
+class MediaOptimizationConfig(BaseModel):
+    """媒体压缩配置"""
+    enabled: bool = False
+    target_dpi: int = 150  # 按显示尺寸降采样时的目标DPI
+    jpeg_quality: int = 80
+    min_saving: float = 0.1  # 压缩收益低于该比例时保留原图
+    max_workers: Optional[int] = None  # 进程池大小,0表示不使用进程池
+
+
+class TracingConfig(BaseModel):
+    """耗时追踪配置"""
+    enabled: bool = True
+    max_spans_per_job: int = 200  # 每个任务保留的区间明细上限,超过后只累计各区间耗时
+
+
+class ProfilingConfig(BaseModel):
+    """任务性能分析配置"""
+    enabled: bool = False  # 是否允许为单个任务开启性能分析(同时控制/api/admin/profile接口)
+    output_dir: str = "./profiles"
+    top_n: int = 40  # 文本报告中列出的函数数和内存分配位置数
+    trace_allocations: bool = True  # 是否同时统计内存分配(采集期间对整个进程生效)
+    traceback_frames: int = 1  # 每次内存分配保存的栈帧数
+
+
+class ConfigReloadConfig(BaseModel):
+    """配置热加载配置"""
+    watch: bool = False  # 是否监视配置文件,修改后自动重新加载
+    watch_interval: float = 5.0  # 检查配置文件修改时间的间隔(秒)
 
 
 class LoggingConfig(BaseModel):
@@ -69,7 +178,12 @@ class LoggingConfig(BaseModel):
     log_dir: str = "./logs"
     rotation: str = "100 MB"
     retention: str = "30 days"
+    compression: Optional[str] = "zip"  # 轮转后的压缩格式,为空表示不压缩
     format: str = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}"
+    enqueue: bool = True  # 日志经队列由后台线程写入,调用方不等待磁盘IO和轮转压缩
+    serialize: bool = False  # 日志文件是否输出为JSON(每行一条)
+    sample_interval: float = 1.0  # 热点路径日志(逐页解析、模型原始响应)同一键的最小输出间隔(秒)
+    sample_every: int = 100  # 热点路径日志同一键最多连续省略的条数
 
 
 class CORSConfig(BaseModel):
@@ -84,9 +198,20 @@ class Settings(BaseModel):
     """全局配置类"""
     app: AppConfig
     upload: UploadConfig
+    parsing: ParsingConfig = ParsingConfig()
+    download: DownloadConfig = DownloadConfig()
+    batch: BatchConfig = BatchConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    checkpoint: CheckpointConfig = CheckpointConfig()
     models: Dict[str, ModelConfig]
     iteration: IterationConfig
     conflict_resolution: ConflictResolutionConfig
+    content_analysis: ContentAnalysisConfig = ContentAnalysisConfig()
+    change_tracking: ChangeTrackingConfig = ChangeTrackingConfig()
+    media_optimization: MediaOptimizationConfig = MediaOptimizationConfig()
+    tracing: TracingConfig = TracingConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
+    config_reload: ConfigReloadConfig = ConfigReloadConfig()
     logging: LoggingConfig
     cors: CORSConfig
 
@@ -95,6 +220,78 @@ class Settings(BaseModel):
         arbitrary_types_allowed = True
 
 
+class AnalyzerSettings(BaseModel):
+    """内容分析器使用的配置视图(分析模型已解析,配置指纹已预先计算)"""
+    model_name: str
+    model: Optional[ModelConfig] = None  # 没有可用模型时为空
+    timeout: int = 60
+    max_prompt_tokens: int = 8000
+    content_analysis: ContentAnalysisConfig
+    fingerprint: str
+
+    class Config:
+        allow_mutation = False
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AnalyzerSettings":
+        """
+        解析分析模型(配置的模型未启用时使用第一个启用的模型)并计算配置指纹
+
+        Args:
+            settings: 全局配置
+
+        Returns:
+            AnalyzerSettings: 内容分析配置视图
+        """
+        model_name = settings.content_analysis.analyzer_model
+        model = settings.models.get(model_name)
+        if model is None or not model.enabled:
+            for name, candidate in settings.models.items():
+                if candidate.enabled:
+                    model_name, model = name, candidate
+                    break
+
+        fingerprint_source = {
+            "model": model_name,
+            "model_config": model.dict() if model is not None else {},
+            "content_analysis": settings.content_analysis.dict()
+        }
+        payload = json.dumps(fingerprint_source, sort_keys=True, default=str, ensure_ascii=False)
+
+        return cls(
+            model_name=model_name,
+            model=model,
+            timeout=model.timeout if model is not None else 60,
+            max_prompt_tokens=model.max_prompt_tokens if model is not None else 8000,
+            content_analysis=settings.content_analysis,
+            fingerprint=hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        )
+
+
+class ConfigSnapshot(BaseModel):
+    """
+    配置快照(不可修改)
+
+    每次加载配置时构建一次,服务直接使用其中的类型化配置视图,
+    不再为每个任务复制整个配置树。重新加载配置会生成新的快照,
+    已经开始的任务继续使用原来的快照。
+    """
+    version: int
+    source_path: str
+    source_mtime: float
+    settings: Settings
+    analyzer: AnalyzerSettings
+
+    class Config:
+        allow_mutation = False
+
+
+def _default_config_path() -> Path:
+    # 获取backend目录路径
+    current_dir = Path(__file__).parent.parent.parent  # app/core -> app -> backend
+    return current_dir / "config" / "config.yaml"
+
+
 def load_config(config_path: str = None) -> Settings:
     """
     加载配置文件
@@ -106,9 +303,7 @@ def load_config(config_path: str = None) -> Settings:
         Settings: 配置对象
     """
     if config_path is None:
-        # 获取backend目录路径
-        current_dir = Path(__file__).parent.parent.parent  # app/core -> app -> backend
-        config_path = current_dir / "config" / "config.yaml"
+        config_path = _default_config_path()
 
     # 检查文件是否存在
     if not os.path.exists(config_path):
@@ -122,20 +317,97 @@ def load_config(config_path: str = None) -> Settings:
     return Settings(**config_dict)
 
 
-# 全局配置实例
-_settings: Settings = None
+def build_snapshot(config_path: str = None, version: int = 1) -> ConfigSnapshot:
+    """
+    加载配置文件并构建配置快照
+
+    Args:
+        config_path: 配置文件路径,默认为 config/config.yaml
+        version: 快照版本号
+
+    Returns:
+        ConfigSnapshot: 配置快照
+    """
+    path = str(config_path or _default_config_path())
+    # 先取修改时间再读取,读取期间文件被修改时下一次检查仍会重新加载
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    settings = load_config(path)
+    return ConfigSnapshot(
+        version=version,
+        source_path=path,
+        source_mtime=mtime,
+        settings=settings,
+        analyzer=AnalyzerSettings.from_settings(settings)
+    )
+
+
+# 全局配置快照
+_snapshot: Optional[ConfigSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_config_snapshot() -> ConfigSnapshot:
+    """获取当前配置快照(单例模式)"""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = build_snapshot()
+    return _snapshot
 
 
 def get_settings() -> Settings:
     """获取全局配置实例(单例模式)"""
-    global _settings
-    if _settings is None:
-        _settings = load_config()
-    return _settings
+    return get_config_snapshot().settings
 
 
 def reload_settings() -> Settings:
-    """重新加载配置"""
-    global _settings
-    _settings = load_config()
-    return _settings
+    """
+    重新加载配置
+
+    配置文件无效时抛出异常,当前快照保持不变。
+
+    Returns:
+        Settings: 新的配置对象
+    """
+    global _snapshot
+    with _snapshot_lock:
+        current = _snapshot
+        version = current.version + 1 if current is not None else 1
+        path = current.source_path if current is not None else None
+        _snapshot = build_snapshot(path, version)
+    logger.info(f"配置已重新加载,快照版本: {version}")
+    return _snapshot.settings
+
+
+def reload_if_changed() -> bool:
+    """
+    配置文件修改时间变化时重新加载配置
+
+    Returns:
+        bool: 是否重新加载了配置
+    """
+    snapshot = get_config_snapshot()
+    try:
+        mtime = os.path.getmtime(snapshot.source_path)
+    except OSError:
+        return False
+    if mtime == snapshot.source_mtime:
+        return False
+    reload_settings()
+    return True
+
+
+async def watch_config_file(interval: float):
+    """
+    定期检查配置文件,修改后重新加载(配置无效时记录错误并保留当前配置)
+
+    Args:
+        interval: 检查间隔(秒)
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reload_if_changed()
+        except Exception as e:
+            logger.error(f"重新加载配置失败,继续使用快照版本 {get_config_snapshot().version}: {str(e)}")
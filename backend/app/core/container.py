@@ -0,0 +1,62 @@
+"""
+服务容器
+按需导入并创建服务(python-pptx、httpx等较重的依赖在第一次使用时才加载),缩短应用冷启动时间
+"""
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from app.core.config import ConfigSnapshot, get_config_snapshot
+
+if TYPE_CHECKING:
+    from app.services.optimization_orchestrator import OptimizationOrchestrator
+    from app.services.ppt_parser import PPTParser
+
+
+class ServiceContainer:
+    """服务容器(延迟创建,配置重新加载后重建)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._orchestrator: Optional["OptimizationOrchestrator"] = None
+
+    @property
+    def orchestrator(self) -> "OptimizationOrchestrator":
+        """
+        共享的优化编排器
+
+        第一次访问时创建;配置重新加载后,下一次访问按新的配置快照创建编排器,
+        已持有旧编排器的任务继续使用旧编排器(及其配置快照)。
+
+        Returns:
+            OptimizationOrchestrator: 优化编排器
+        """
+        snapshot = get_config_snapshot()
+        with self._lock:
+            if self._orchestrator is None or self._snapshot is not snapshot:
+                from app.services.optimization_orchestrator import OptimizationOrchestrator
+                self._orchestrator = OptimizationOrchestrator(snapshot)
+                self._snapshot = snapshot
+            return self._orchestrator
+
+    def create_parser(self) -> "PPTParser":
+        """
+        创建PPT解析器(每个任务单独创建,按当前配置决定是否懒加载页面明细)
+
+        Returns:
+            PPTParser: PPT解析器
+        """
+        from app.services.ppt_parser import PPTParser
+        return PPTParser(lazy_details=get_config_snapshot().settings.parsing.lazy_details)
+
+
+# 全局服务容器实例
+_container: Optional[ServiceContainer] = None
+
+
+def get_container() -> ServiceContainer:
+    """获取全局服务容器实例(单例模式)"""
+    global _container
+    if _container is None:
+        _container = ServiceContainer()
+    return _container
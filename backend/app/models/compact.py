@@ -0,0 +1,678 @@
+"""
+紧凑的PPT解析结果
+任务缓存中长期保存的解析结果: 每页一个__slots__记录,重复出现的字符串(版式名、形状名、字体、颜色等)驻留,
+形状位置尺寸保存在整数数组中。需要时转换为pydantic的PPTParseResult(API和各处理阶段使用的视图)
+
+懒加载模式下解析时每页只提取文本、类型、版式名和图片/图表数;版式占位符、样式、图片和图表明细
+在首次访问时按保留的幻灯片部件索引从源文件读取,并记入记录供之后的视图复用
+"""
+import os
+import sys
+import threading
+from array import array
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import PrivateAttr
+from pydantic.datetime_parse import parse_datetime
+
+from app.models.schemas import LayoutInfo, PPTParseResult, SlideData, SlideType, StyleInfo
+
+
+# 数组中表示"无值"的位置尺寸(python-pptx对未设置位置的形状返回None)
+_MISSING = -(2 ** 63)
+
+_GEOMETRY_KEYS = ("left", "top", "width", "height")
+
+# 懒加载的页面明细字段(按SlideData中的顺序)
+DETAIL_FIELDS = ("layout_info", "style_info", "images", "charts")
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+def _length(value: Any) -> int:
+    return _MISSING if value is None else int(value)
+
+
+def _restore(value: int) -> Optional[int]:
+    return None if value == _MISSING else value
+
+
+def _placeholder_type(value: Any) -> Any:
+    # python-pptx的占位符类型是整数枚举,保存为整数(与序列化后的值一致),不再引用枚举对象
+    return int(value) if isinstance(value, int) else value
+
+
+class SlideSource:
+    """懒加载明细的来源: 源文件路径、文件签名(大小和修改时间)和各页的幻灯片部件名"""
+
+    __slots__ = ("path", "partnames", "size", "mtime_ns")
+
+    def __init__(
+        self,
+        path: str,
+        partnames: Sequence[str],
+        size: Optional[int] = None,
+        mtime_ns: Optional[int] = None
+    ):
+        """
+        Args:
+            path: PPT文件路径
+            partnames: 各页的幻灯片部件名(如 /ppt/slides/slide3.xml),按页面顺序
+            size: 文件大小,为空时读取当前文件
+            mtime_ns: 文件修改时间(纳秒),为空时读取当前文件
+        """
+        if size is None or mtime_ns is None:
+            stat = os.stat(path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        self.path = path
+        self.partnames = [sys.intern(str(name)) for name in partnames]
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def add(self, partname: str):
+        """追加一页的幻灯片部件名(逐页解析时使用)"""
+        self.partnames.append(sys.intern(str(partname)))
+
+    def check(self):
+        """确认源文件仍存在且未被修改(明细必须与已解析的文本来自同一份文件)"""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"PPT文件不存在,无法加载页面明细: {self.path}")
+        stat = os.stat(self.path)
+        if stat.st_size != self.size or stat.st_mtime_ns != self.mtime_ns:
+            raise ValueError(f"PPT文件在解析后被修改,无法加载页面明细: {self.path}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"path": self.path, "partnames": self.partnames, "size": self.size, "mtime_ns": self.mtime_ns}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SlideSource":
+        return cls(data["path"], data["partnames"], data["size"], data["mtime_ns"])
+
+
+class CompactSlide:
+    """单页解析结果(懒加载模式下明细在首次访问时补全,之后只读)"""
+
+    __slots__ = (
+        "slide_index",
+        "slide_type",
+        "content",
+        "layout_type",
+        "image_count",
+        "chart_count",
+        "style",
+        "placeholder_names",
+        "placeholder_types",
+        "image_names",
+        "chart_names",
+        "chart_types",
+        "geometry"
+    )
+
+    def __init__(
+        self,
+        slide_index: int,
+        slide_type: SlideType,
+        content: str,
+        layout_type: str,
+        style: Optional[StyleInfo] = None,
+        placeholders: Sequence[Dict[str, Any]] = (),
+        images: Sequence[Dict[str, Any]] = (),
+        charts: Sequence[Dict[str, Any]] = (),
+        image_count: Optional[int] = None,
+        chart_count: Optional[int] = None
+    ):
+        """
+        打包单页解析结果
+
+        Args:
+            slide_index: 幻灯片索引
+            slide_type: 幻灯片类型
+            content: 文本内容
+            layout_type: 版式名
+            style: 样式信息,为空表示明细尚未加载(懒加载模式)
+            placeholders: 占位符(type、name和位置尺寸)
+            images: 图片(name和位置尺寸)
+            charts: 图表(name、chart_type和位置尺寸)
+            image_count: 图片数(明细尚未加载时提供)
+            chart_count: 图表数(明细尚未加载时提供)
+        """
+        self.slide_index = slide_index
+        self.slide_type = slide_type
+        self.content = content
+        self.layout_type = sys.intern(layout_type)
+        self.image_count = image_count if image_count is not None else len(images)
+        self.chart_count = chart_count if chart_count is not None else len(charts)
+        self.style: Optional[Tuple[Any, ...]] = None
+        self.placeholder_names: Tuple[str, ...] = ()
+        self.placeholder_types: Tuple[Any, ...] = ()
+        self.image_names: Tuple[str, ...] = ()
+        self.chart_names: Tuple[str, ...] = ()
+        self.chart_types: Tuple[str, ...] = ()
+        self.geometry = array("q")
+        if style is not None:
+            self.set_details(style, placeholders, images, charts)
+
+    @classmethod
+    def from_slide_data(cls, slide: SlideData) -> "CompactSlide":
+        """
+        从pydantic的SlideData打包(如从检查点恢复的解析结果)
+
+        Args:
+            slide: 幻灯片数据
+
+        Returns:
+            CompactSlide: 单页解析结果
+        """
+        return cls(
+            slide.slide_index,
+            slide.slide_type,
+            slide.content,
+            slide.layout_info.layout_type,
+            slide.style_info,
+            slide.layout_info.placeholders,
+            slide.images,
+            slide.charts
+        )
+
+    @property
+    def details_loaded(self) -> bool:
+        """版式占位符、样式、图片和图表明细是否已加载"""
+        return self.style is not None
+
+    def set_details(
+        self,
+        style: StyleInfo,
+        placeholders: Sequence[Dict[str, Any]],
+        images: Sequence[Dict[str, Any]],
+        charts: Sequence[Dict[str, Any]]
+    ):
+        """
+        记入页面明细
+
+        Args:
+            style: 样式信息
+            placeholders: 占位符
+            images: 图片
+            charts: 图表
+        """
+        self.placeholder_names = tuple(sys.intern(item["name"]) for item in placeholders)
+        self.placeholder_types = tuple(_placeholder_type(item.get("type")) for item in placeholders)
+        self.image_names = tuple(sys.intern(item["name"]) for item in images)
+        self.chart_names = tuple(sys.intern(item["name"]) for item in charts)
+        self.chart_types = tuple(sys.intern(item.get("chart_type", "unknown")) for item in charts)
+        self.image_count = len(images)
+        self.chart_count = len(charts)
+        # 占位符、图片、图表的位置尺寸依次排列,每个形状4个整数(EMU)
+        self.geometry = array("q", (
+            _length(item.get(key))
+            for group in (placeholders, images, charts)
+            for item in group
+            for key in _GEOMETRY_KEYS
+        ))
+        # 最后设置样式,其他线程看到details_loaded时明细已完整
+        self.style = (
+            _intern(style.font_name),
+            style.font_size,
+            _intern(style.font_color),
+            _intern(style.background_color),
+            _intern(style.alignment)
+        )
+
+    def _shapes(self, offset: int, names: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        shapes = []
+        for idx, name in enumerate(names):
+            start = (offset + idx) * 4
+            shape = {"name": name}
+            for key, value in zip(_GEOMETRY_KEYS, self.geometry[start:start + 4]):
+                shape[key] = _restore(value)
+            shapes.append(shape)
+        return shapes
+
+    @property
+    def placeholders(self) -> List[Dict[str, Any]]:
+        """占位符(与原解析结果的键顺序一致)"""
+        return [
+            dict(type=placeholder_type, **shape)
+            for placeholder_type, shape in zip(self.placeholder_types, self._shapes(0, self.placeholder_names))
+        ]
+
+    @property
+    def images(self) -> List[Dict[str, Any]]:
+        """图片"""
+        return self._shapes(len(self.placeholder_names), self.image_names)
+
+    @property
+    def charts(self) -> List[Dict[str, Any]]:
+        """图表"""
+        shapes = self._shapes(len(self.placeholder_names) + len(self.image_names), self.chart_names)
+        return [
+            dict(name=shape.pop("name"), chart_type=chart_type, **shape)
+            for chart_type, shape in zip(self.chart_types, shapes)
+        ]
+
+    def layout_info(self, width: int, height: int) -> LayoutInfo:
+        """版式信息"""
+        return LayoutInfo(layout_type=self.layout_type, width=width, height=height, placeholders=self.placeholders)
+
+    def style_info(self) -> StyleInfo:
+        """样式信息"""
+        font_name, font_size, font_color, background_color, alignment = self.style
+        return StyleInfo(
+            font_name=font_name,
+            font_size=font_size,
+            font_color=font_color,
+            background_color=background_color,
+            alignment=alignment
+        )
+
+    def detail(self, name: str, width: int, height: int) -> Any:
+        """
+        按字段名获取页面明细(明细须已加载)
+
+        Args:
+            name: layout_info / style_info / images / charts
+            width: 幻灯片宽度(EMU)
+            height: 幻灯片高度(EMU)
+
+        Returns:
+            Any: 字段值
+        """
+        if name == "layout_info":
+            return self.layout_info(width, height)
+        if name == "style_info":
+            return self.style_info()
+        return getattr(self, name)
+
+    def to_slide_data(self, width: int, height: int) -> SlideData:
+        """
+        转换为pydantic的SlideData(明细须已加载)
+
+        Args:
+            width: 幻灯片宽度(EMU)
+            height: 幻灯片高度(EMU)
+
+        Returns:
+            SlideData: 幻灯片数据
+        """
+        return SlideData(
+            slide_id=self.slide_index + 1,
+            slide_index=self.slide_index,
+            slide_type=self.slide_type,
+            content=self.content,
+            layout_info=self.layout_info(width, height),
+            style_info=self.style_info(),
+            images=self.images,
+            charts=self.charts
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        """不含明细的摘要(懒加载结果写入检查点时使用)"""
+        return {
+            "slide_index": self.slide_index,
+            "slide_type": self.slide_type.value,
+            "content": self.content,
+            "layout_type": self.layout_type,
+            "image_count": self.image_count,
+            "chart_count": self.chart_count
+        }
+
+    @classmethod
+    def from_summary(cls, data: Dict[str, Any]) -> "CompactSlide":
+        return cls(
+            data["slide_index"],
+            SlideType(data["slide_type"]),
+            data["content"],
+            data["layout_type"],
+            image_count=data["image_count"],
+            chart_count=data["chart_count"]
+        )
+
+
+def _requested(name: str, include: Any, exclude: Any) -> bool:
+    """序列化时字段是否会被输出(按pydantic的include/exclude语义)"""
+    if include is not None and name not in include:
+        return False
+    if exclude is not None and name in exclude:
+        excluded = exclude[name] if isinstance(exclude, Mapping) else True
+        if excluded is True or excluded is Ellipsis:
+            return False
+    return True
+
+
+class LazySlideData(SlideData):
+    """
+    懒加载的幻灯片视图
+
+    layout_info、style_info、images、charts在首次访问时加载;
+    dict()/json()只加载include/exclude后仍会输出的明细字段。
+    """
+
+    _record: Any = PrivateAttr()
+    _loader: Any = PrivateAttr()
+
+    @classmethod
+    def create(cls, record: CompactSlide, loader: "_DetailLoader") -> "LazySlideData":
+        """
+        创建视图
+
+        Args:
+            record: 单页解析结果
+            loader: 明细加载器(同一视图的各页共用)
+
+        Returns:
+            LazySlideData: 幻灯片视图
+        """
+        view = cls.construct(
+            _fields_set=set(cls.__fields__),
+            slide_id=record.slide_index + 1,
+            slide_index=record.slide_index,
+            slide_type=record.slide_type,
+            content=record.content
+        )
+        for name in DETAIL_FIELDS:
+            view.__dict__.pop(name, None)
+        view._record = record
+        view._loader = loader
+        return view
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in DETAIL_FIELDS:
+            raise AttributeError(name)
+        value = self._loader.detail(self._record, name)
+        values = self.__dict__
+        values[name] = value
+        # 保持与SlideData相同的字段顺序
+        object.__setattr__(self, "__dict__", {key: values[key] for key in self.__fields__ if key in values})
+        return value
+
+    @property
+    def layout_type(self) -> str:
+        return self._record.layout_type
+
+    @property
+    def image_count(self) -> int:
+        return self._record.image_count
+
+    @property
+    def chart_count(self) -> int:
+        return self._record.chart_count
+
+    def _iter(
+        self,
+        to_dict: bool = False,
+        by_alias: bool = False,
+        include=None,
+        exclude=None,
+        exclude_unset: bool = False,
+        exclude_defaults: bool = False,
+        exclude_none: bool = False
+    ):
+        for name in DETAIL_FIELDS:
+            if name not in self.__dict__ and _requested(name, include, exclude):
+                getattr(self, name)
+        return super()._iter(
+            to_dict=to_dict,
+            by_alias=by_alias,
+            include=include,
+            exclude=exclude,
+            exclude_unset=exclude_unset,
+            exclude_defaults=exclude_defaults,
+            exclude_none=exclude_none
+        )
+
+
+class _DetailLoader:
+    """
+    为一个懒加载视图加载页面明细
+
+    首次需要时打开源文件并保留到视图释放,同一视图内之后的页面不再重复打开;
+    加载的明细记入CompactSlide,之后的视图直接复用。
+    """
+
+    def __init__(self, result: "CompactParseResult"):
+        self._result = result
+        self._slides: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def detail(self, record: CompactSlide, name: str) -> Any:
+        if not record.details_loaded:
+            with self._lock:
+                if not record.details_loaded:
+                    from app.services.ppt_parser import PPTParser
+
+                    if self._slides is None:
+                        self._slides = PPTParser.open_source(self._result.source)
+                    partname = self._result.source.partnames[record.slide_index]
+                    PPTParser.load_details(record, self._slides[partname])
+        return record.detail(name, self._result.slide_width, self._result.slide_height)
+
+
+class CompactParseResult:
+    """整份PPT的解析结果(任务缓存中保存的形式)"""
+
+    __slots__ = (
+        "ppt_id",
+        "filename",
+        "slide_width",
+        "slide_height",
+        "slides",
+        "theme",
+        "metadata",
+        "parse_time",
+        "source"
+    )
+
+    def __init__(
+        self,
+        ppt_id: str,
+        filename: str,
+        slide_width: int,
+        slide_height: int,
+        slides: Sequence[CompactSlide],
+        theme: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        parse_time: Optional[datetime] = None,
+        source: Optional[SlideSource] = None
+    ):
+        """
+        Args:
+            ppt_id: PPT ID
+            filename: 文件名
+            slide_width: 幻灯片宽度(EMU)
+            slide_height: 幻灯片高度(EMU)
+            slides: 各页解析结果(逐页解析时由append追加)
+            theme: 主题信息
+            metadata: 元数据
+            parse_time: 解析时间
+            source: 懒加载明细的来源(所有页面的明细都已解析时为空)
+        """
+        self.ppt_id = ppt_id
+        self.filename = filename
+        self.slide_width = int(slide_width)
+        self.slide_height = int(slide_height)
+        self.slides: List[CompactSlide] = list(slides)
+        self.theme = theme or {}
+        self.metadata = metadata or {}
+        self.parse_time = parse_time or datetime.now()
+        self.source = source
+
+    @classmethod
+    def from_result(cls, result: PPTParseResult) -> "CompactParseResult":
+        """
+        从pydantic的解析结果打包
+
+        Args:
+            result: PPT解析结果
+
+        Returns:
+            CompactParseResult: 紧凑的解析结果
+        """
+        first = result.slides[0].layout_info if result.slides else None
+        return cls(
+            ppt_id=result.ppt_id,
+            filename=result.filename,
+            slide_width=first.width if first else result.theme.get("slide_width", 0),
+            slide_height=first.height if first else result.theme.get("slide_height", 0),
+            slides=[CompactSlide.from_slide_data(slide) for slide in result.slides],
+            theme=result.theme,
+            metadata=result.metadata,
+            parse_time=result.parse_time
+        )
+
+    @property
+    def total_slides(self) -> int:
+        """总页数"""
+        return len(self.slides)
+
+    def append(self, slide: CompactSlide, partname: Optional[str] = None):
+        """
+        追加一页(逐页解析时使用)
+
+        Args:
+            slide: 单页解析结果
+            partname: 幻灯片部件名(懒加载时记入明细来源)
+        """
+        if self.source is not None and partname is not None:
+            self.source.add(partname)
+        self.slides.append(slide)
+
+    @property
+    def details_pending(self) -> bool:
+        """是否还有页面的明细未加载"""
+        return any(not slide.details_loaded for slide in self.slides)
+
+    def materialize(self, indices: Optional[Iterable[int]] = None):
+        """
+        一次性加载多页的明细(只打开一次源文件)
+
+        Args:
+            indices: 幻灯片索引,为空时加载全部
+        """
+        records = self.slides if indices is None else [self.slides[idx] for idx in indices]
+        pending = [record for record in records if not record.details_loaded]
+        if not pending:
+            return
+
+        from app.services.ppt_parser import PPTParser
+
+        slides = PPTParser.open_source(self.source)
+        for record in pending:
+            PPTParser.load_details(record, slides[self.source.partnames[record.slide_index]])
+
+    def slide(self, index: int) -> SlideData:
+        """
+        获取单页的pydantic视图(明细已加载)
+
+        Args:
+            index: 幻灯片索引
+
+        Returns:
+            SlideData: 幻灯片数据
+        """
+        self.materialize([index])
+        return self.slides[index].to_slide_data(self.slide_width, self.slide_height)
+
+    def detail_loader(self) -> "_DetailLoader":
+        """创建明细加载器(同一加载器创建的视图共用一次打开的源文件)"""
+        return _DetailLoader(self)
+
+    def slide_view(self, index: int, loader: Optional["_DetailLoader"] = None) -> SlideData:
+        """
+        获取单页的pydantic视图(明细未加载时为懒加载视图,不在此处加载)
+
+        Args:
+            index: 幻灯片索引
+            loader: 明细加载器,为空时单独创建
+
+        Returns:
+            SlideData: 幻灯片数据
+        """
+        record = self.slides[index]
+        if self.source is None or record.details_loaded:
+            return record.to_slide_data(self.slide_width, self.slide_height)
+        return LazySlideData.create(record, loader or _DetailLoader(self))
+
+    def to_result(self) -> PPTParseResult:
+        """
+        转换为pydantic的解析结果(各处理阶段和API使用,用完即可释放)
+
+        有页面明细未加载时返回懒加载视图,明细在视图中首次访问时加载。
+
+        Returns:
+            PPTParseResult: PPT解析结果
+        """
+        if self.source is not None and self.details_pending:
+            loader = _DetailLoader(self)
+            return PPTParseResult.construct(
+                ppt_id=self.ppt_id,
+                filename=self.filename,
+                total_slides=len(self.slides),
+                slides=[LazySlideData.create(slide, loader) for slide in self.slides],
+                theme=self.theme,
+                metadata=self.metadata,
+                parse_time=self.parse_time
+            )
+
+        return PPTParseResult(
+            ppt_id=self.ppt_id,
+            filename=self.filename,
+            total_slides=len(self.slides),
+            slides=[slide.to_slide_data(self.slide_width, self.slide_height) for slide in self.slides],
+            theme=self.theme,
+            metadata=self.metadata,
+            parse_time=self.parse_time
+        )
+
+    def checkpoint_data(self) -> Dict[str, Any]:
+        """
+        写入检查点的内容
+
+        懒加载结果只写入各页摘要和明细来源,不为写检查点而加载明细;
+        否则与PPTParseResult.dict()相同。
+
+        Returns:
+            Dict[str, Any]: 检查点内容
+        """
+        if self.source is None:
+            return self.to_result().dict()
+        return {
+            "ppt_id": self.ppt_id,
+            "filename": self.filename,
+            "total_slides": len(self.slides),
+            "slide_width": self.slide_width,
+            "slide_height": self.slide_height,
+            "slides": [slide.summary() for slide in self.slides],
+            "theme": self.theme,
+            "metadata": self.metadata,
+            "parse_time": self.parse_time,
+            "source": self.source.to_dict()
+        }
+
+    @classmethod
+    def from_checkpoint(cls, data: Dict[str, Any]) -> "CompactParseResult":
+        """
+        从检查点内容恢复(兼容checkpoint_data的两种格式)
+
+        Args:
+            data: 检查点内容
+
+        Returns:
+            CompactParseResult: 紧凑的解析结果
+        """
+        if data.get("source") is None:
+            return cls.from_result(PPTParseResult.parse_obj(data))
+        return cls(
+            ppt_id=data["ppt_id"],
+            filename=data["filename"],
+            slide_width=data["slide_width"],
+            slide_height=data["slide_height"],
+            slides=[CompactSlide.from_summary(slide) for slide in data["slides"]],
+            theme=data.get("theme"),
+            metadata=data.get("metadata"),
+            parse_time=parse_datetime(data["parse_time"]),
+            source=SlideSource.from_dict(data["source"])
+        )
@@ -47,6 +47,13 @@ class ProcessStatus(str, Enum):
     GENERATING = "generating"  # 生成中
     COMPLETED = "completed"  # 已完成
     FAILED = "failed"  # 失败
+    CANCELLED = "cancelled"  # 已取消
+
+
+class JobLane(str, Enum):
+    """任务优先级通道(在各共享限流点,交互任务排在批量任务之前)"""
+    INTERACTIVE = "interactive"  # 单文件上传
+    BULK = "bulk"  # 批量处理
 
 
 class LayoutInfo(BaseModel):
@@ -77,6 +84,21 @@ class SlideData(BaseModel):
     images: List[Dict[str, Any]] = []
     charts: List[Dict[str, Any]] = []
 
+    @property
+    def layout_type(self) -> str:
+        """版式名"""
+        return self.layout_info.layout_type
+
+    @property
+    def image_count(self) -> int:
+        """图片数"""
+        return len(self.images)
+
+    @property
+    def chart_count(self) -> int:
+        """图表数"""
+        return len(self.charts)
+
 
 class PPTParseResult(BaseModel):
     """PPT解析结果"""
@@ -131,6 +153,8 @@ class IterationResult(BaseModel):
     model_name: str
     suggestions: List[OptimizationSuggestion]
     corrections: List[CorrectionRecord] = []
+    action: Optional[str] = None  # 工作流动作: generate/correct/merge
+    latency_ms: Optional[float] = None  # 该步骤本轮耗时(毫秒)
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
@@ -178,6 +202,23 @@ class PPTGenerateResult(BaseModel):
     success: bool
     error_message: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.now)
+    metadata: Dict[str, Any] = {}  # 如媒体压缩统计
+
+
+class SpanRecord(BaseModel):
+    """单个耗时区间"""
+    name: str  # parse / content_analysis / provider_call / correction_round / generation / change_tracking / *_wait 等
+    start_offset: float  # 相对任务第一个区间开始的时间(秒)
+    seconds: float
+    outcome: str = "ok"  # ok / error / cancelled
+    attrs: Dict[str, Any] = {}  # 模型名、重试次数、token数等
+
+
+class JobTimings(BaseModel):
+    """任务耗时明细"""
+    stages: Dict[str, float] = {}  # 区间名 -> 累计耗时(秒,并发区间分别计入)
+    spans: List[SpanRecord] = []  # 按开始时间排列的区间(超过上限后只累计stages)
+    dropped_spans: int = 0  # 超过上限未保留的区间数
 
 
 class TaskProgress(BaseModel):
@@ -189,6 +230,34 @@ class TaskProgress(BaseModel):
     message: str
     requires_user_action: bool = False  # 是否需要用户操作
     action_url: Optional[str] = None  # 操作URL
+    queue_position: Optional[int] = None  # 在当前阶段队列中的位置(从1开始,未排队时为空)
+    estimated_wait_seconds: Optional[float] = None  # 排队时的预计等待时间
+    timings: Optional[Dict[str, float]] = None  # 各处理区间的累计耗时(秒)
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+
+class BatchItemProgress(BaseModel):
+    """批次中单个PPT的进度"""
+    ppt_id: str
+    filename: str
+    status: ProcessStatus
+    progress: float
+    message: str = ""
+    queue_position: Optional[int] = None  # 在当前阶段队列中的位置
+
+
+class BatchProgress(BaseModel):
+    """批次汇总进度"""
+    batch_id: str
+    status: str  # processing / completed / partial / failed / cancelled
+    total: int
+    completed: int
+    failed: int
+    cancelled: int = 0
+    waiting_review: int
+    progress: float  # 0-100
+    items: List[BatchItemProgress]
+    download_url: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
@@ -1,8 +1,12 @@
-"""服务模块"""
-from .ppt_parser import PPTParser
-from .model_engine import ModelEngine
-from .iteration_corrector import IterationCorrector
-from .ppt_generator import PPTGenerator
+"""服务模块(服务类在第一次访问时才导入,避免启动时加载python-pptx、httpx等依赖)"""
+import importlib
+
+_LAZY_EXPORTS = {
+    'PPTParser': '.ppt_parser',
+    'ModelEngine': '.model_engine',
+    'IterationCorrector': '.iteration_corrector',
+    'PPTGenerator': '.ppt_generator'
+}
 
 __all__ = [
     'PPTParser',
@@ -10,3 +14,12 @@ __all__ = [
     'IterationCorrector',
     'PPTGenerator'
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,306 @@
+"""
+准入控制模块
+按处理阶段跟踪进行中和排队的任务,根据近期各阶段耗时估算新任务的完成时间,
+估算超过SLO时延后或拒绝新的上传。各阶段排队按优先级通道调度,交互任务优先于批量任务
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from itertools import chain
+from typing import Deque, Dict, Iterable, Iterator, NamedTuple, Optional, Set
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.models.schemas import ProcessStatus, JobLane
+from app.services.tracing import get_tracer
+
+
+# 参与准入控制的处理阶段(按流水线顺序)
+TRACKED_STAGES = (ProcessStatus.PARSING, ProcessStatus.CONTENT_ANALYZING, ProcessStatus.GENERATING)
+
+# 第一阶段(上传到等待审查)经过的处理阶段
+PHASE1_STAGES = (ProcessStatus.PARSING, ProcessStatus.CONTENT_ANALYZING)
+
+# 优先级通道(从高到低)
+LANES = (JobLane.INTERACTIVE, JobLane.BULK)
+
+
+class AdmissionDecision(NamedTuple):
+    """准入判断结果"""
+    admitted: bool
+    deferred: bool  # 已接受,但预计完成时间超过SLO
+    estimated_seconds: float  # 预计完成时间
+    retry_after: int  # 建议的重试/轮询间隔(秒)
+
+
+class QueuePosition(NamedTuple):
+    """任务在阶段队列中的位置"""
+    stage: ProcessStatus
+    position: int  # 从1开始
+    estimated_wait_seconds: float
+
+
+class _Stage:
+    """单个处理阶段: 有限并发槽位 + 按通道划分的FIFO等待队列 + 近期耗时窗口"""
+
+    def __init__(self, status: ProcessStatus, capacity: int, default_latency: float, window: int):
+        self.status = status
+        self.capacity = max(1, capacity)
+        self.default_latency = default_latency
+        self.active: Set[str] = set()
+        self.waiters: Dict[JobLane, "OrderedDict[str, asyncio.Future]"] = {lane: OrderedDict() for lane in LANES}
+        self.latencies: Deque[float] = deque(maxlen=max(1, window))
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self.waiters.values())
+
+    def load(self, lane: JobLane = JobLane.BULK) -> int:
+        """进行中的任务数 + 排在lane新任务之前的排队任务数"""
+        ahead = LANES[:LANES.index(lane) + 1]
+        return len(self.active) + sum(len(self.waiters[ahead_lane]) for ahead_lane in ahead)
+
+    def ordered_waiters(self) -> Iterator[str]:
+        """按调度顺序排列的排队任务"""
+        return chain.from_iterable(self.waiters[lane] for lane in LANES)
+
+    def latency(self) -> float:
+        """近期平均耗时(无样本时使用默认值)"""
+        if not self.latencies:
+            return self.default_latency
+        return sum(self.latencies) / len(self.latencies)
+
+    def drain_seconds(self, jobs: int) -> float:
+        """该阶段处理完jobs个任务所需时间"""
+        return math.ceil(jobs / self.capacity) * self.latency()
+
+    def release(self, job_id: str):
+        self.active.discard(job_id)
+        for lane in LANES:
+            waiters = self.waiters[lane]
+            while waiters and len(self.active) < self.capacity:
+                next_id, future = waiters.popitem(last=False)
+                if future.done():
+                    continue
+                self.active.add(next_id)
+                future.set_result(None)
+
+
+class _StageSlot:
+    """阶段槽位(异步上下文管理器,兼容Python 3.6)"""
+
+    __slots__ = ("_stage", "_job_id", "_lane", "_started")
+
+    def __init__(self, stage: _Stage, job_id: str, lane: JobLane):
+        self._stage = stage
+        self._job_id = job_id
+        self._lane = lane
+        self._started = 0.0
+
+    async def __aenter__(self):
+        stage, job_id = self._stage, self._job_id
+        waiting = time.monotonic()
+        if len(stage.active) < stage.capacity and not stage.queued:
+            stage.active.add(job_id)
+        else:
+            waiters = stage.waiters[self._lane]
+            future = asyncio.get_event_loop().create_future()
+            waiters[job_id] = future
+            try:
+                await future
+            except BaseException:
+                # 等待期间被取消: 离开队列;若槽位已分配则转交给下一个任务
+                if waiters.get(job_id) is future:
+                    del waiters[job_id]
+                else:
+                    stage.release(job_id)
+                raise
+        self._started = time.monotonic()
+        get_tracer().record_wait(job_id, stage.status.value, self._started - waiting, waiting)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # 失败的任务耗时不代表正常处理时间,不计入样本
+        if exc_type is None:
+            self._stage.latencies.append(time.monotonic() - self._started)
+        self._stage.release(self._job_id)
+        return False
+
+
+class AdmissionController:
+    """准入控制器"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        slo_seconds: float = 300,
+        stage_concurrency: Optional[Dict[str, int]] = None,
+        default_latency: Optional[Dict[str, float]] = None,
+        latency_window: int = 50,
+        max_deferred: int = 0
+    ):
+        """
+        初始化准入控制器
+
+        Args:
+            enabled: 是否启用准入判断(关闭时仍跟踪各阶段,但总是接受新任务)
+            slo_seconds: 新任务预计完成时间的上限(秒)
+            stage_concurrency: 各阶段的并发槽位数(键为ProcessStatus值)
+            default_latency: 各阶段没有耗时样本时使用的默认耗时(秒)
+            latency_window: 每个阶段保留的最近耗时样本数
+            max_deferred: 超过SLO时最多延后接受的排队任务数,超过后拒绝(0表示直接拒绝)
+        """
+        stage_concurrency = stage_concurrency or {}
+        default_latency = default_latency or {}
+        self.enabled = enabled
+        self.slo_seconds = slo_seconds
+        self.max_deferred = max_deferred
+        self._stages: Dict[ProcessStatus, _Stage] = {
+            status: _Stage(
+                status,
+                stage_concurrency.get(status.value, 4),
+                default_latency.get(status.value, 30.0),
+                latency_window
+            )
+            for status in TRACKED_STAGES
+        }
+
+    @classmethod
+    def from_config(cls, config) -> "AdmissionController":
+        """根据AdmissionConfig创建"""
+        return cls(
+            enabled=config.enabled,
+            slo_seconds=config.slo_seconds,
+            stage_concurrency=config.stage_concurrency,
+            default_latency=config.default_latency,
+            latency_window=config.latency_window,
+            max_deferred=config.max_deferred
+        )
+
+    def stage(
+        self,
+        job_id: str,
+        status: ProcessStatus,
+        lane: JobLane = JobLane.INTERACTIVE
+    ) -> "_StageSlot":
+        """
+        在指定阶段占用一个槽位(async with),槽位已满时排队等待,退出时记录该阶段耗时
+
+        槽位释放时先分配给交互通道的排队任务,再分配给批量通道。
+
+        Args:
+            job_id: 任务ID
+            status: 处理阶段
+            lane: 优先级通道
+
+        Returns:
+            _StageSlot: 异步上下文管理器
+        """
+        return _StageSlot(self._stages[status], job_id, lane)
+
+    def estimate_seconds(
+        self,
+        jobs: int = 1,
+        stages: Iterable[ProcessStatus] = PHASE1_STAGES,
+        lane: JobLane = JobLane.INTERACTIVE
+    ) -> float:
+        """
+        估算新提交jobs个任务时最后一个任务走完指定阶段的时间
+
+        上游阶段中的任务随后也会进入下游阶段,因此计入下游阶段的负载;
+        低优先级通道中排队的任务排在新任务之后,不计入。
+
+        Args:
+            jobs: 新任务数
+            stages: 新任务依次经过的阶段
+            lane: 新任务的优先级通道
+
+        Returns:
+            float: 预计完成时间(秒)
+        """
+        total = 0.0
+        upstream = 0
+        for status in stages:
+            stage = self._stages[status]
+            upstream += stage.load(lane)
+            total += stage.drain_seconds(upstream + jobs)
+        return total
+
+    def admit(
+        self,
+        jobs: int = 1,
+        stages: Iterable[ProcessStatus] = PHASE1_STAGES,
+        lane: JobLane = JobLane.INTERACTIVE
+    ) -> AdmissionDecision:
+        """
+        判断是否接受新任务
+
+        预计完成时间不超过SLO时接受;超过时,若排队任务数未达到max_deferred则延后接受,否则拒绝。
+        retry_after为预计完成时间回落到SLO以内所需的时间。
+
+        Args:
+            jobs: 新任务数
+            stages: 新任务依次经过的阶段
+            lane: 新任务的优先级通道
+
+        Returns:
+            AdmissionDecision: 准入判断结果
+        """
+        stages = tuple(stages)
+        estimate = self.estimate_seconds(jobs, stages, lane)
+        if not self.enabled or estimate <= self.slo_seconds:
+            return AdmissionDecision(True, False, estimate, 0)
+
+        retry_after = max(1, math.ceil(estimate - self.slo_seconds))
+        queued = sum(self._stages[status].queued for status in stages)
+        if queued + jobs <= self.max_deferred:
+            return AdmissionDecision(True, True, estimate, retry_after)
+
+        logger.warning(
+            f"准入拒绝: 预计完成 {estimate:.1f}s 超过SLO {self.slo_seconds}s, "
+            f"排队 {queued} 个, 建议 {retry_after}s 后重试"
+        )
+        return AdmissionDecision(False, False, estimate, retry_after)
+
+    def queue_position(self, job_id: str) -> Optional[QueuePosition]:
+        """
+        任务在阶段队列中的位置(未排队时为None)
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[QueuePosition]: 队列位置和预计等待时间
+        """
+        for stage in self._stages.values():
+            for position, waiting_id in enumerate(stage.ordered_waiters(), 1):
+                if waiting_id == job_id:
+                    return QueuePosition(stage.status, position, stage.drain_seconds(position))
+        return None
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """各阶段的进行中任务数、排队数和近期平均耗时"""
+        return {
+            status.value: {
+                "in_flight": len(stage.active),
+                "queued": stage.queued,
+                "queued_bulk": len(stage.waiters[JobLane.BULK]),
+                "capacity": stage.capacity,
+                "latency_seconds": round(stage.latency(), 3)
+            }
+            for status, stage in self._stages.items()
+        }
+
+
+# 全局准入控制器实例
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器实例(单例模式)"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController.from_config(get_settings().admission)
+    return _controller
@@ -0,0 +1,136 @@
+"""
+修改报告分页索引
+为修改追踪报告预先计算按页面、维度等的偏移和倒排表,支持分页筛选并缓存序列化后的分页结果
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.models.schemas import ChangeTrackingReport, ChangeRecord
+from app.utils.serialized_response import SerializedPayload
+
+
+# 可筛选的字段: 查询参数名 -> ChangeRecord字段
+FILTER_FIELDS = {
+    "dimension": "dimension",
+    "source": "source",
+    "impact": "impact_level",
+    "change_type": "change_type",
+}
+
+PageKey = Tuple[Optional[int], Tuple[Tuple[str, str], ...], int, int]
+
+
+class ChangeReportIndex:
+    """修改报告分页索引"""
+
+    def __init__(self, report: ChangeTrackingReport, page_cache_size: int = 128):
+        """
+        构建索引
+
+        修改记录按页码稳定排序后,记录每页在序列中的 [start, end) 偏移,
+        以及各筛选字段取值对应的位置列表(升序)。
+
+        Args:
+            report: 修改追踪报告
+            page_cache_size: 缓存的分页数量
+        """
+        self.ppt_id = report.ppt_id
+        self._changes: List[ChangeRecord] = sorted(report.changes, key=lambda c: c.slide_index)
+
+        self.slide_offsets: Dict[int, Tuple[int, int]] = {}
+        self.postings: Dict[str, Dict[str, List[int]]] = {name: {} for name in FILTER_FIELDS}
+
+        for pos, change in enumerate(self._changes):
+            start, _ = self.slide_offsets.get(change.slide_index, (pos, pos))
+            self.slide_offsets[change.slide_index] = (start, pos + 1)
+            for name, field in FILTER_FIELDS.items():
+                self.postings[name].setdefault(getattr(change, field), []).append(pos)
+
+        self._header = {
+            "ppt_id": report.ppt_id,
+            "generation_timestamp": report.generation_timestamp,
+            "total_changes": report.total_changes,
+            "slides_modified": report.slides_modified,
+            "change_summary": report.change_summary.dict(),
+            "by_slide": {idx: end - start for idx, (start, end) in self.slide_offsets.items()},
+        }
+
+        self._page_cache_size = page_cache_size
+        self._pages: "OrderedDict[PageKey, SerializedPayload]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def header(self) -> Dict[str, Any]:
+        """报告头部(不含修改明细)"""
+        return self._header
+
+    def page(
+        self,
+        slide: Optional[int] = None,
+        page: int = 1,
+        page_size: int = 50,
+        **filters: Optional[str]
+    ) -> SerializedPayload:
+        """
+        获取一页筛选后的修改记录(缓存序列化并压缩后的字节)
+
+        Args:
+            slide: 页码筛选
+            page: 页号(从1开始)
+            page_size: 每页条数
+            **filters: dimension/source/impact/change_type 筛选
+
+        Returns:
+            SerializedPayload: 分页结果
+        """
+        active = tuple(sorted((k, v) for k, v in filters.items() if v and k in FILTER_FIELDS))
+        key: PageKey = (slide, active, page, page_size)
+
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached is not None:
+                self._pages.move_to_end(key)
+                return cached
+
+        positions = self._select(slide, active)
+        total = len(positions)
+        start = (page - 1) * page_size
+        items = [self._changes[pos].dict() for pos in positions[start:start + page_size]]
+
+        result = SerializedPayload.from_object({
+            "ppt_id": self.ppt_id,
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "pages": (total + page_size - 1) // page_size,
+            "items": items,
+        })
+
+        with self._lock:
+            self._pages[key] = result
+            while len(self._pages) > self._page_cache_size:
+                self._pages.popitem(last=False)
+        return result
+
+    def _select(self, slide: Optional[int], active: Sequence[Tuple[str, str]]) -> Sequence[int]:
+        """按筛选条件求出记录位置(升序)"""
+        candidates: List[Sequence[int]] = []
+        if slide is not None:
+            start, end = self.slide_offsets.get(slide, (0, 0))
+            candidates.append(range(start, end))
+        for name, value in active:
+            candidates.append(self.postings[name].get(value, []))
+
+        if not candidates:
+            return range(len(self._changes))
+
+        # 从最短的列表出发,逐个与其余条件求交
+        candidates.sort(key=len)
+        positions = candidates[0]
+        for other in candidates[1:]:
+            if isinstance(other, range):
+                positions = [pos for pos in positions if pos in other]
+            else:
+                members = set(other)
+                positions = [pos for pos in positions if pos in members]
+        return positions
@@ -2,7 +2,8 @@
 修改追踪服务
 追踪PPT优化过程中的所有修改，生成详细的修改报告
 """
-from typing import Dict, List, Any
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 from collections import defaultdict
@@ -16,16 +17,63 @@ from app.models.schemas import (
     ChangeTrackingReport,
     ChangeRecord,
     ChangeSummary,
+    OptimizationOpportunity,
     OptimizationSuggestion
 )
+from app.services.slide_diff import ShapeChange, diff_presentations
+from app.utils.cancellation import CancelToken, check_cancelled
+
+
+class UserEditIndex:
+    """用户修改过的优化机会的页面倒排索引"""
+
+    __slots__ = ("by_slide", "_annotations")
+
+    def __init__(self, opportunities: List[OptimizationOpportunity]):
+        """
+        构建索引
+
+        Args:
+            opportunities: 用户编辑后的优化机会
+        """
+        self.by_slide: Dict[int, List[OptimizationOpportunity]] = {}
+        for opp in opportunities:
+            if not opp.user_modified:
+                continue
+            for slide_idx in dict.fromkeys(opp.slide_indices):
+                self.by_slide.setdefault(slide_idx, []).append(opp)
+
+        self._annotations: Dict[int, str] = {}
+
+    def __contains__(self, slide_index: int) -> bool:
+        return slide_index in self.by_slide
+
+    def annotation(self, slide_index: int) -> str:
+        """页面上全部用户备注拼接成的原因后缀(按页缓存)"""
+        annotation = self._annotations.get(slide_index)
+        if annotation is None:
+            annotation = "".join(
+                f" (用户备注: {opp.user_comment})"
+                for opp in self.by_slide.get(slide_index, ())
+                if opp.user_comment
+            )
+            self._annotations[slide_index] = annotation
+        return annotation
 
 
 class ChangeTracker:
     """修改追踪器 - 生成详细的修改追踪报告"""
 
-    def __init__(self):
-        """初始化修改追踪器"""
-        pass
+    def __init__(self, xml_diff: bool = True, diff_workers: Optional[int] = None):
+        """
+        初始化修改追踪器
+
+        Args:
+            xml_diff: 是否比较生成前后的幻灯片XML,以实际修改代替方案中的预期修改
+            diff_workers: 差异比较进程数,0表示不使用进程池
+        """
+        self.xml_diff = xml_diff
+        self.diff_workers = diff_workers
 
     def generate_report(
         self,
@@ -33,7 +81,9 @@ class ChangeTracker:
         content_analysis: ContentAnalysisResult,
         user_edits: UserEditRequest,
         optimization_plan: FinalOptimizationPlan,
-        generate_result: PPTGenerateResult
+        generate_result: PPTGenerateResult,
+        original_ppt_path: Optional[str] = None,
+        cancel_token: Optional[CancelToken] = None
     ) -> ChangeTrackingReport:
         """
         生成详细的修改追踪报告
@@ -44,6 +94,8 @@ class ChangeTracker:
             user_edits: 用户编辑请求
             optimization_plan: 最终优化方案
             generate_result: PPT生成结果
+            original_ppt_path: 原始PPT文件路径(提供时比较生成前后的XML)
+            cancel_token: 取消令牌(在XML比较前检查)
 
         Returns:
             ChangeTrackingReport: 修改追踪报告
@@ -52,29 +104,39 @@ class ChangeTracker:
 
         changes = []
 
+        # 用户修改过的优化机会按页面建立索引,后续各步骤共用
+        user_index = UserEditIndex(user_edits.modified_opportunities)
+
         # 1. 从内容分析中提取的修改
         content_analysis_changes = self._extract_from_content_analysis(
             content_analysis,
-            user_edits
+            user_edits,
+            user_index
         )
         changes.extend(content_analysis_changes)
 
-        # 2. 从优化方案中提取的修改
-        optimization_changes = self._extract_from_optimization_plan(
-            optimization_plan,
-            original_ppt
-        )
-        changes.extend(optimization_changes)
-
-        # 3. 关联用户请求的修改
-        changes = self._mark_user_requested_changes(changes, user_edits)
+        # 2. 生成器实际做出的修改(无法比较时退回优化方案中的预期修改)
+        optimization_changes = None
+        if self._can_diff(original_ppt_path, generate_result):
+            check_cancelled(cancel_token)
+            try:
+                optimization_changes = self._extract_from_xml_diff(
+                    original_ppt_path,
+                    generate_result.output_path,
+                    optimization_plan
+                )
+            except Exception as e:
+                logger.warning(f"幻灯片XML比较失败,使用优化方案生成报告: {original_ppt.ppt_id}, 错误: {str(e)}")
 
-        # 4. 生成统计汇总
-        summary = self._generate_summary(changes)
+        if optimization_changes is None:
+            optimization_changes = self._extract_from_optimization_plan(
+                optimization_plan,
+                original_ppt
+            )
+        changes.extend(optimization_changes)
 
-        # 5. 提取修改的页面列表
-        slides_modified = list(set(c.slide_index for c in changes))
-        slides_modified.sort()
+        # 3. 关联用户请求的修改,同时生成统计汇总和修改页面列表
+        summary, slides_modified = self._generate_summary(changes, user_index)
 
         report = ChangeTrackingReport(
             ppt_id=original_ppt.ppt_id,
@@ -95,14 +157,18 @@ class ChangeTracker:
     def _extract_from_content_analysis(
         self,
         content_analysis: ContentAnalysisResult,
-        user_edits: UserEditRequest
+        user_edits: UserEditRequest,
+        user_index: UserEditIndex
     ) -> List[ChangeRecord]:
         """
         从内容分析中提取修改记录
 
+        用户修改过的页面在创建记录时即标记为用户请求并附上备注。
+
         Args:
             content_analysis: 内容分析结果
             user_edits: 用户编辑
+            user_index: 用户修改的页面索引
 
         Returns:
             List[ChangeRecord]: 修改记录列表
@@ -116,6 +182,7 @@ class ChangeTracker:
 
             # 根据优化机会创建修改记录
             for slide_idx in opp.slide_indices:
+                user_requested = slide_idx in user_index
                 change = ChangeRecord(
                     slide_index=slide_idx,
                     change_type=self._map_category_to_type(opp.category),
@@ -123,8 +190,8 @@ class ChangeTracker:
                     element=self._infer_element_from_category(opp.category),
                     before=opp.current_state,
                     after=opp.suggested_action,
-                    reason=opp.description,
-                    source="content_analysis" if not opp.user_modified else "user_request",
+                    reason=opp.description + user_index.annotation(slide_idx) if user_requested else opp.description,
+                    source="user_request" if user_requested else "content_analysis",
                     impact_level=self._map_priority_to_impact(opp.priority)
                 )
                 changes.append(change)
@@ -173,64 +240,116 @@ class ChangeTracker:
 
         return changes
 
-    def _mark_user_requested_changes(
+    def _can_diff(self, original_ppt_path: Optional[str], generate_result: PPTGenerateResult) -> bool:
+        """是否具备比较生成前后XML的条件"""
+        return (
+            self.xml_diff
+            and bool(original_ppt_path)
+            and generate_result.success
+            and bool(generate_result.output_path)
+            and Path(original_ppt_path).exists()
+            and Path(generate_result.output_path).exists()
+        )
+
+    def _extract_from_xml_diff(
         self,
-        changes: List[ChangeRecord],
-        user_edits: UserEditRequest
+        original_ppt_path: str,
+        output_path: str,
+        optimization_plan: FinalOptimizationPlan
     ) -> List[ChangeRecord]:
         """
-        标记用户主动请求的修改
+        比较原始与生成后的PPT,提取实际发生的修改
+
+        每条修改尽量关联到同页同维度的优化建议以给出原因和影响程度。
 
         Args:
-            changes: 原始修改列表
-            user_edits: 用户编辑
+            original_ppt_path: 原始PPT路径
+            output_path: 生成后的PPT路径
+            optimization_plan: 最终优化方案
 
         Returns:
-            List[ChangeRecord]: 更新后的修改列表
+            List[ChangeRecord]: 修改记录列表
         """
-        # 获取用户修改过的优化机会
-        user_modified_opps = [
-            opp for opp in user_edits.modified_opportunities
-            if opp.user_modified
-        ]
+        shape_changes = diff_presentations(original_ppt_path, output_path, self.diff_workers)
 
-        # 标记相关的修改
-        for change in changes:
-            for opp in user_modified_opps:
-                if change.slide_index in opp.slide_indices:
-                    change.source = "user_request"
-                    if opp.user_comment:
-                        change.reason += f" (用户备注: {opp.user_comment})"
+        suggestions: Dict[Tuple[int, str], OptimizationSuggestion] = {}
+        for suggestion in optimization_plan.suggestions:
+            suggestions.setdefault(
+                (suggestion.slide_index, suggestion.optimization_dimension.value),
+                suggestion
+            )
+
+        changes = []
+        for shape_change in shape_changes:
+            dimension = self._attribute_to_dimension(shape_change.attribute)
+            suggestion = suggestions.get((shape_change.slide_index, dimension))
+
+            changes.append(ChangeRecord(
+                slide_index=shape_change.slide_index,
+                change_type=self._attribute_to_type(shape_change.attribute),
+                dimension=dimension,
+                element=shape_change.element,
+                before=shape_change.before[:200],
+                after=shape_change.after[:200],
+                reason=suggestion.reason if suggestion else self._describe_shape_change(shape_change),
+                source="model_suggestion",
+                impact_level=self._priority_to_impact(suggestion.priority.value) if suggestion else "minor"
+            ))
 
+        logger.info(f"幻灯片XML比较完成,实际修改 {len(changes)} 处")
         return changes
 
-    def _generate_summary(self, changes: List[ChangeRecord]) -> ChangeSummary:
+    def _mark_user_requested_change(self, change: ChangeRecord, user_index: UserEditIndex):
+        """
+        标记用户主动请求的修改(已标记的记录不再重复追加备注)
+
+        Args:
+            change: 修改记录
+            user_index: 用户修改的页面索引
+        """
+        if change.source == "user_request" or change.slide_index not in user_index:
+            return
+        change.source = "user_request"
+        annotation = user_index.annotation(change.slide_index)
+        if annotation:
+            change.reason += annotation
+
+    def _generate_summary(
+        self,
+        changes: List[ChangeRecord],
+        user_index: UserEditIndex
+    ) -> Tuple[ChangeSummary, List[int]]:
         """
-        生成修改汇总统计
+        标记用户请求的修改并生成汇总统计(单次遍历)
 
         Args:
             changes: 修改记录列表
+            user_index: 用户修改的页面索引
 
         Returns:
-            ChangeSummary: 修改汇总
+            Tuple[ChangeSummary, List[int]]: 修改汇总和修改过的页码(升序)
         """
         by_type = defaultdict(int)
         by_dimension = defaultdict(int)
         by_source = defaultdict(int)
         by_impact = defaultdict(int)
+        slides = set()
 
         for change in changes:
+            self._mark_user_requested_change(change, user_index)
             by_type[change.change_type] += 1
             by_dimension[change.dimension] += 1
             by_source[change.source] += 1
             by_impact[change.impact_level] += 1
+            slides.add(change.slide_index)
 
-        return ChangeSummary(
+        summary = ChangeSummary(
             by_type=dict(by_type),
             by_dimension=dict(by_dimension),
             by_source=dict(by_source),
             by_impact=dict(by_impact)
         )
+        return summary, sorted(slides)
 
     # ============================================================================
     # 辅助映射方法
@@ -299,6 +418,43 @@ class ChangeTracker:
         }
         return mapping.get(dimension, "body")
 
+    def _attribute_to_dimension(self, attribute: str) -> str:
+        """形状属性到维度"""
+        mapping = {
+            "text": "content",
+            "font": "font",
+            "fill": "color",
+            "position": "layout",
+            "added": "layout",
+            "removed": "layout"
+        }
+        return mapping.get(attribute, "content")
+
+    def _attribute_to_type(self, attribute: str) -> str:
+        """形状属性到修改类型"""
+        mapping = {
+            "text": "content",
+            "font": "style",
+            "fill": "style",
+            "position": "layout",
+            "added": "structure",
+            "removed": "structure"
+        }
+        return mapping.get(attribute, "content")
+
+    def _describe_shape_change(self, shape_change: ShapeChange) -> str:
+        """无关联建议时的修改说明"""
+        labels = {
+            "text": "文本",
+            "font": "字体",
+            "fill": "填充",
+            "position": "位置",
+            "added": "新增",
+            "removed": "删除"
+        }
+        target = shape_change.shape_name or shape_change.element
+        return f"生成器调整了{target}的{labels.get(shape_change.attribute, shape_change.attribute)}"
+
     def _priority_to_impact(self, priority: str) -> str:
         """优先级到影响程度"""
         mapping = {
@@ -0,0 +1,215 @@
+"""
+阶段检查点模块
+在每个阶段边界将任务状态写入磁盘(gzip压缩的JSON),进程重启后从最后完成的阶段恢复
+"""
+import asyncio
+import functools
+import gzip
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+import orjson
+from loguru import logger
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+
+
+M = TypeVar("M", bound=BaseModel)
+
+# 阶段边界(按流水线顺序)
+UPLOADED = "uploaded"  # 已上传: 文件路径与文件名
+PARSED = "parsed"  # 已解析: PPT解析结果
+ANALYZED = "analyzed"  # 已分析: 内容分析结果
+EDITS_ACCEPTED = "edits_accepted"  # 已接收用户编辑
+PLANNED = "planned"  # 已生成优化方案
+GENERATED = "generated"  # 已生成PPT与修改追踪报告
+
+STAGES = (UPLOADED, PARSED, ANALYZED, EDITS_ACCEPTED, PLANNED, GENERATED)
+
+_SUFFIX = ".json.gz"
+
+
+class CheckpointStore:
+    """
+    阶段检查点存储: {checkpoint_dir}/{ppt_id}/{stage}.json.gz
+
+    写入和删除在单线程执行器中按提交顺序执行,fsync不阻塞事件循环,
+    同一任务的写入与删除也不会乱序。任务结束(完成、失败或取消)后删除其检查点。
+    """
+
+    def __init__(self, checkpoint_dir: str = "./checkpoints", enabled: bool = True):
+        """
+        初始化检查点存储
+
+        Args:
+            checkpoint_dir: 检查点目录
+            enabled: 是否启用(关闭时写入为空操作,读取无结果)
+        """
+        self.root = Path(checkpoint_dir)
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+
+    async def save(self, ppt_id: str, stage: str, **payload: Any):
+        """
+        写入一个阶段检查点(在执行器中先写临时文件再原子替换)
+
+        Args:
+            ppt_id: PPT ID
+            stage: 阶段名
+            **payload: 检查点内容(pydantic模型或可JSON序列化的值)
+        """
+        if not self.enabled:
+            return
+        await self._run(self._write, ppt_id, stage, payload)
+
+    def _write(self, ppt_id: str, stage: str, payload: Dict[str, Any]):
+        """序列化并写入检查点(在执行器中执行)"""
+        data = {
+            key: value.dict() if isinstance(value, BaseModel) else value
+            for key, value in payload.items()
+        }
+        body = gzip.compress(
+            orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS),
+            compresslevel=6
+        )
+
+        job_dir = self.root / ppt_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        path = job_dir / f"{stage}{_SUFFIX}"
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(str(tmp_path), str(path))
+
+    async def _run(self, fn, *args):
+        """在检查点执行器中执行"""
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    def load(self, ppt_id: str, stage: str) -> Optional[Dict[str, Any]]:
+        """
+        读取阶段检查点
+
+        Args:
+            ppt_id: PPT ID
+            stage: 阶段名
+
+        Returns:
+            Optional[Dict[str, Any]]: 检查点内容,不存在或损坏时为None
+        """
+        if not self.enabled:
+            return None
+
+        path = self.root / ppt_id / f"{stage}{_SUFFIX}"
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                return orjson.loads(gzip.decompress(f.read()))
+        except (OSError, EOFError, orjson.JSONDecodeError) as e:
+            logger.warning(f"检查点损坏,忽略: {path}, 错误: {str(e)}")
+            return None
+
+    def load_model(self, ppt_id: str, stage: str, key: str, model: Type[M]) -> Optional[M]:
+        """
+        读取阶段检查点中的单个模型
+
+        Args:
+            ppt_id: PPT ID
+            stage: 阶段名
+            key: 检查点内容中的键
+            model: 模型类型
+
+        Returns:
+            Optional[M]: 模型实例,不存在时为None
+        """
+        data = self.load(ppt_id, stage)
+        if data is None or data.get(key) is None:
+            return None
+        return model.parse_obj(data[key])
+
+    def last_stage(self, ppt_id: str) -> Optional[str]:
+        """
+        最后完成的阶段
+
+        Args:
+            ppt_id: PPT ID
+
+        Returns:
+            Optional[str]: 阶段名,没有检查点时为None
+        """
+        job_dir = self.root / ppt_id
+        for stage in reversed(STAGES):
+            if (job_dir / f"{stage}{_SUFFIX}").exists():
+                return stage
+        return None
+
+    async def discard_after(self, ppt_id: str, stage: str):
+        """
+        删除指定阶段之后的检查点(重新执行后续阶段前调用,避免恢复到旧结果)
+
+        Args:
+            ppt_id: PPT ID
+            stage: 保留的最后阶段
+        """
+        if not self.enabled:
+            return
+        await self._run(self._discard_after, ppt_id, stage)
+
+    def _discard_after(self, ppt_id: str, stage: str):
+        """删除指定阶段之后的检查点(在执行器中执行)"""
+        for later in STAGES[STAGES.index(stage) + 1:]:
+            try:
+                (self.root / ppt_id / f"{later}{_SUFFIX}").unlink()
+            except OSError:
+                pass
+
+    def age(self, ppt_id: str) -> float:
+        """
+        任务检查点的存在时间(距最后一次写入的秒数)
+
+        Args:
+            ppt_id: PPT ID
+
+        Returns:
+            float: 秒数,目录为空时以目录修改时间计
+        """
+        job_dir = self.root / ppt_id
+        try:
+            mtimes = [path.stat().st_mtime for path in job_dir.iterdir()]
+            mtimes.append(job_dir.stat().st_mtime)
+        except OSError:
+            return 0.0
+        return time.time() - max(mtimes)
+
+    def jobs(self) -> List[str]:
+        """所有带检查点的任务ID"""
+        if not self.enabled or not self.root.exists():
+            return []
+        return sorted(path.name for path in self.root.iterdir() if path.is_dir())
+
+    async def remove(self, ppt_id: str):
+        """删除任务的全部检查点(排在该任务已提交的写入之后)"""
+        if not self.enabled:
+            return
+        await self._run(shutil.rmtree, self.root / ppt_id, True)
+
+
+# 全局检查点存储实例
+_store: Optional[CheckpointStore] = None
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """获取全局检查点存储实例(单例模式)"""
+    global _store
+    if _store is None:
+        config = get_settings().checkpoint
+        _store = CheckpointStore(config.checkpoint_dir, config.enabled)
+    return _store
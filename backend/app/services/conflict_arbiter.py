@@ -0,0 +1,247 @@
+"""
+冲突批量仲裁模块
+将多个冲突打包为一次结构化请求交给仲裁模型,并缓存仲裁结论
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.models.schemas import Conflict, ConflictResolution, OptimizationSuggestion
+from app.services.prompt_renderer import estimate_tokens, normalize_cell
+from app.services.tracing import get_tracer
+
+
+# 仲裁结论缓存: (维度, 归一化建议集合) -> (选中的归一化建议, 理由)
+RulingKey = Tuple[str, Tuple[str, ...]]
+
+_RULING_CACHE_SIZE = 4096
+_ruling_cache: "OrderedDict[RulingKey, Tuple[str, str]]" = OrderedDict()
+_ruling_lock = threading.Lock()
+
+_ARBITER_HEADER = """你是PPT优化建议的仲裁专家。以下每个冲突包含同一页面、同一维度下互相矛盾的候选建议,
+请为每个冲突选出最合适的一条。
+
+格式: 以"#冲突编号|页码|维度"开头,其后每行一个候选"候选编号|优先级|建议内容"。
+
+"""
+
+_ARBITER_FOOTER = """
+
+请严格按照以下JSON格式返回(只返回JSON,不要其他文字),每个冲突一条结论:
+{"decisions": [{"conflict_id": 0, "choice": 1, "reason": "选择理由"}]}
+"""
+
+_ARBITER_FIXED_TOKENS = estimate_tokens(_ARBITER_HEADER) + estimate_tokens(_ARBITER_FOOTER)
+
+
+def _normalize(text: str) -> str:
+    """归一化建议文本(用于缓存键)"""
+    return " ".join(text.lower().split()) if text else ""
+
+
+def ruling_key(conflict: Conflict) -> RulingKey:
+    """按维度和归一化的候选建议集合生成缓存键(与候选顺序、重复无关)"""
+    texts = sorted({_normalize(s.suggestion) for s in conflict.conflicting_suggestions})
+    return conflict.dimension.value, tuple(texts)
+
+
+def clear_ruling_cache():
+    """清空仲裁结论缓存"""
+    with _ruling_lock:
+        _ruling_cache.clear()
+
+
+class ConflictArbiter:
+    """冲突批量仲裁器"""
+
+    def __init__(
+        self,
+        client,
+        batch_tokens: int = 3000,
+        max_concurrency: int = 4
+    ):
+        """
+        初始化仲裁器
+
+        Args:
+            client: 仲裁模型客户端
+            batch_tokens: 单个批次的提示词token预算
+            max_concurrency: 同时发送的批次数
+        """
+        self.client = client
+        self.batch_tokens = batch_tokens
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def resolve(
+        self,
+        ppt_id: str,
+        conflicts: List[Conflict],
+        fallback: Callable[[Conflict], ConflictResolution]
+    ) -> List[ConflictResolution]:
+        """
+        批量仲裁冲突
+
+        已缓存的冲突直接复用结论;其余按token预算打包,并发发送给仲裁模型。
+        模型未给出有效结论的冲突使用fallback处理。
+
+        Args:
+            ppt_id: PPT ID
+            conflicts: 待仲裁冲突
+            fallback: 单个冲突的降级处理函数
+
+        Returns:
+            List[ConflictResolution]: 与输入顺序一致的调和结果
+        """
+        keys = [ruling_key(c) for c in conflicts]
+        rulings: Dict[RulingKey, Tuple[str, str]] = {}
+
+        with _ruling_lock:
+            for key in keys:
+                cached = _ruling_cache.get(key)
+                if cached is not None:
+                    _ruling_cache.move_to_end(key)
+                    rulings[key] = cached
+
+        # 相同的冲突只仲裁一次
+        pending: "OrderedDict[RulingKey, Conflict]" = OrderedDict()
+        for key, conflict in zip(keys, conflicts):
+            if key not in rulings and key not in pending:
+                pending[key] = conflict
+
+        logger.info(
+            f"批量仲裁: {ppt_id}, 冲突 {len(conflicts)} 个, "
+            f"缓存命中 {len(conflicts) - sum(1 for k in keys if k in pending)} 个, "
+            f"待仲裁 {len(pending)} 个"
+        )
+
+        if pending:
+            batches = self._pack(list(pending.items()))
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            tracer = get_tracer()
+
+            async def run(batch):
+                waiting = time.monotonic()
+                async with semaphore:
+                    tracer.record_wait(ppt_id, "arbitration", time.monotonic() - waiting, waiting)
+                    return await self._arbitrate_batch(ppt_id, batch)
+
+            results = await asyncio.gather(*(run(batch) for batch in batches))
+            new_rulings = {}
+            for result in results:
+                new_rulings.update(result)
+
+            with _ruling_lock:
+                for key, ruling in new_rulings.items():
+                    _ruling_cache[key] = ruling
+                while len(_ruling_cache) > _RULING_CACHE_SIZE:
+                    _ruling_cache.popitem(last=False)
+            rulings.update(new_rulings)
+
+        resolutions = []
+        for key, conflict in zip(keys, conflicts):
+            resolution = self._to_resolution(conflict, rulings.get(key))
+            resolutions.append(resolution if resolution is not None else fallback(conflict))
+        return resolutions
+
+    def _pack(
+        self,
+        items: List[Tuple[RulingKey, Conflict]]
+    ) -> List[List[Tuple[int, RulingKey, Conflict, str]]]:
+        """按token预算贪心打包冲突,每个批次至少包含一个冲突"""
+        budget = self.batch_tokens - _ARBITER_FIXED_TOKENS
+        batches = []
+        current = []
+        used = 0
+
+        for conflict_id, (key, conflict) in enumerate(items):
+            block = self._render_conflict(conflict_id, conflict)
+            tokens = estimate_tokens(block)
+            if current and used + tokens > budget:
+                batches.append(current)
+                current, used = [], 0
+            current.append((conflict_id, key, conflict, block))
+            used += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _render_conflict(conflict_id: int, conflict: Conflict) -> str:
+        """渲染单个冲突(候选编号从1开始)"""
+        lines = [f"#{conflict_id}|第{conflict.slide_index + 1}页|{conflict.dimension.value}"]
+        for i, sug in enumerate(conflict.conflicting_suggestions, start=1):
+            lines.append(f"{i}|{sug.priority.value}|{normalize_cell(sug.suggestion)}")
+        return "\n".join(lines) + "\n"
+
+    async def _arbitrate_batch(
+        self,
+        ppt_id: str,
+        batch: List[Tuple[int, RulingKey, Conflict, str]]
+    ) -> Dict[RulingKey, Tuple[str, str]]:
+        """发送一个批次并解析结论"""
+        prompt = "".join([_ARBITER_HEADER] + [block for _, _, _, block in batch] + [_ARBITER_FOOTER])
+
+        try:
+            text = await self.client.complete(prompt, ppt_id)
+            decisions = self._parse_decisions(text)
+        except Exception as e:
+            logger.error(f"批量仲裁调用失败: {ppt_id}, {len(batch)} 个冲突, 错误: {str(e)}")
+            return {}
+
+        rulings = {}
+        for conflict_id, key, conflict, _ in batch:
+            decision = decisions.get(conflict_id)
+            if decision is None:
+                continue
+            choice, reason = decision
+            if 1 <= choice <= len(conflict.conflicting_suggestions):
+                selected = conflict.conflicting_suggestions[choice - 1]
+                rulings[key] = (_normalize(selected.suggestion), reason or "由仲裁模型选择")
+        return rulings
+
+    @staticmethod
+    def _parse_decisions(text: str) -> Dict[int, Tuple[int, str]]:
+        """解析仲裁模型返回的JSON结论"""
+        json_start = text.find("{")
+        json_end = text.rfind("}") + 1
+        if json_start == -1 or json_end == 0:
+            raise ValueError("仲裁响应中未找到有效的JSON")
+
+        data = json.loads(text[json_start:json_end])
+        decisions = {}
+        for item in data.get("decisions", []):
+            try:
+                decisions[int(item["conflict_id"])] = (int(item["choice"]), str(item.get("reason", "")))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return decisions
+
+    @staticmethod
+    def _to_resolution(
+        conflict: Conflict,
+        ruling: Optional[Tuple[str, str]]
+    ) -> Optional[ConflictResolution]:
+        """将仲裁结论映射回当前冲突中的建议"""
+        if ruling is None:
+            return None
+
+        chosen_text, reason = ruling
+        selected: Optional[OptimizationSuggestion] = next(
+            (s for s in conflict.conflicting_suggestions if _normalize(s.suggestion) == chosen_text),
+            None
+        )
+        if selected is None:
+            return None
+
+        return ConflictResolution(
+            conflict=conflict,
+            resolution_method="model_arbiter",
+            selected_suggestion=selected,
+            reason=reason
+        )
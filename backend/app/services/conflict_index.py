@@ -0,0 +1,193 @@
+"""
+增量冲突索引
+按 (slide_index, dimension) 维护建议分组及其冲突状态,只对发生变化的分组重新计算
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from app.models.schemas import (
+    ModelSuggestion,
+    OptimizationSuggestion,
+    OptimizationDimension,
+    Conflict,
+    ConflictType
+)
+from app.services.suggestion_similarity import SuggestionSimilarity
+
+
+GroupKey = Tuple[int, OptimizationDimension]
+
+
+class ConflictIndex:
+    """增量冲突索引"""
+
+    def __init__(self, similarity: SuggestionSimilarity):
+        """
+        初始化冲突索引
+
+        Args:
+            similarity: 建议相似度引擎
+        """
+        self.similarity = similarity
+
+        # 分组: key -> [(模型名, 建议)]
+        self._groups: Dict[GroupKey, List[Tuple[str, OptimizationSuggestion]]] = OrderedDict()
+        self._slide_keys: Dict[int, Set[GroupKey]] = {}
+        self._models: Dict[str, ModelSuggestion] = OrderedDict()
+
+        # 冲突状态: key -> Conflict(仅冲突分组)
+        self._conflicts: Dict[GroupKey, Conflict] = {}
+        self._dirty: Set[GroupKey] = set()
+
+        # 运行计数
+        self._total_count = 0
+        self._conflict_count = 0
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def build(self, model_suggestions: Iterable[ModelSuggestion]) -> "ConflictIndex":
+        """从各模型建议构建索引"""
+        for model_suggestion in model_suggestions:
+            self.add(model_suggestion)
+        return self
+
+    def add(self, model_suggestion: ModelSuggestion):
+        """
+        加入一个模型的建议(同名模型的建议追加到已有条目)
+
+        Args:
+            model_suggestion: 模型建议
+        """
+        name = model_suggestion.model_name
+        if name not in self._models:
+            self._models[name] = model_suggestion.copy(update={"optimization_suggestions": []})
+
+        for sug in model_suggestion.optimization_suggestions:
+            key = (sug.slide_index, sug.optimization_dimension)
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = []
+                self._slide_keys.setdefault(sug.slide_index, set()).add(key)
+            group.append((name, sug))
+            self._total_count += 1
+            self._dirty.add(key)
+
+    def resolve(self, decisions: Dict[GroupKey, OptimizationSuggestion]):
+        """
+        用修正结论替换分组: 分组内每个模型只保留一条结论建议
+
+        Args:
+            decisions: key -> 结论建议
+        """
+        for key, decided in decisions.items():
+            group = self._groups.get(key)
+            if group is None:
+                continue
+            models = list(OrderedDict.fromkeys(name for name, _ in group))
+            self._total_count += len(models) - len(group)
+            self._groups[key] = [(name, decided) for name in models]
+            self._dirty.add(key)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    @property
+    def model_names(self) -> Set[str]:
+        """已加入索引的模型名"""
+        return set(self._models)
+
+    @property
+    def total_count(self) -> int:
+        """建议总数"""
+        return self._total_count
+
+    @property
+    def conflict_rate(self) -> float:
+        """冲突率 = 冲突分组内建议条数 / 总建议条数"""
+        self._refresh()
+        if self._total_count == 0:
+            return 0.0
+        return self._conflict_count / self._total_count
+
+    def conflicting_keys(self) -> List[GroupKey]:
+        """存在冲突的分组"""
+        self._refresh()
+        return list(self._conflicts)
+
+    def is_conflicting(self, key: GroupKey) -> bool:
+        """分组是否存在冲突"""
+        self._refresh()
+        return key in self._conflicts
+
+    def keys_for_slides(self, slide_indices: Iterable[int]) -> List[GroupKey]:
+        """指定页面的全部分组"""
+        keys = []
+        for slide_idx in slide_indices:
+            keys.extend(self._slide_keys.get(slide_idx, ()))
+        return keys
+
+    def group(self, key: GroupKey) -> List[OptimizationSuggestion]:
+        """分组内的建议"""
+        return [sug for _, sug in self._groups.get(key, ())]
+
+    def conflicts(self) -> List[Conflict]:
+        """全部冲突(按页码、维度排序)"""
+        self._refresh()
+        return [
+            self._conflicts[key]
+            for key in sorted(self._conflicts, key=lambda k: (k[0], k[1].value))
+        ]
+
+    def to_model_suggestions(self) -> List[ModelSuggestion]:
+        """导出为各模型建议列表"""
+        per_model: Dict[str, List[OptimizationSuggestion]] = {name: [] for name in self._models}
+        for group in self._groups.values():
+            for name, sug in group:
+                per_model[name].append(sug)
+        return [
+            model.copy(update={"optimization_suggestions": per_model[name]})
+            for name, model in self._models.items()
+        ]
+
+    # ------------------------------------------------------------------
+    # 增量刷新
+    # ------------------------------------------------------------------
+
+    def _refresh(self):
+        """只对变化过的分组重新计算相似度并更新冲突计数"""
+        if not self._dirty:
+            return
+
+        dirty = list(self._dirty)
+        self._dirty.clear()
+
+        for key in dirty:
+            previous = self._conflicts.pop(key, None)
+            if previous is not None:
+                self._conflict_count -= len(previous.conflicting_suggestions)
+
+        candidates = [key for key in dirty if len(self._groups.get(key, ())) > 1]
+        results = self.similarity.analyze_groups(
+            [[sug.suggestion for _, sug in self._groups[key]] for key in candidates]
+        )
+
+        for key, result in zip(candidates, results):
+            if not result.has_conflict:
+                continue
+
+            slide_idx, dimension = key
+            suggestions_list = [sug for _, sug in self._groups[key]]
+            self._conflicts[key] = Conflict(
+                slide_index=slide_idx,
+                dimension=dimension,
+                conflict_type=ConflictType.DIRECT if result.is_direct else ConflictType.PARTIAL,
+                conflicting_suggestions=suggestions_list,
+                description=(
+                    f"第{slide_idx+1}页的{dimension.value}维度存在{len(suggestions_list)}个建议,"
+                    f"分为{result.cluster_count}组不一致的方案"
+                )
+            )
+            self._conflict_count += len(suggestions_list)
@@ -3,8 +3,10 @@
 使用大模型进行深度内容分析，识别优化机会
 """
 import json
+import time
 import asyncio
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Sequence, Tuple
 from datetime import datetime
 from loguru import logger
 import httpx
@@ -20,39 +22,60 @@ from app.models.schemas import (
     ContentIssue,
     OptimizationOpportunity
 )
-from app.core.config import ModelConfig
+from app.core.config import AnalyzerSettings
+from app.services.tracing import get_tracer
+from app.services.prompt_renderer import (
+    RenderedTable,
+    SlideDigest,
+    digest_slide,
+    estimate_tokens,
+    get_deck_digest,
+    fit_slide_table,
+    table_legend
+)
+
+if TYPE_CHECKING:
+    from app.services.ppt_parser import SlideStream
+
+
+# 内容分析提示词中的幻灯片表格列
+_ANALYSIS_COLUMNS = ("index", "type", "img", "chart", "content")
+
+# 结构质量从好到差(合并分段结果时取最差的一段)
+_STRUCTURE_QUALITY_ORDER = ("excellent", "good", "fair", "poor")
+
+# 固定部分超出预算时,幻灯片表格至少可使用的预算比例
+_MIN_TABLE_BUDGET_RATIO = 0.25
 
 
 class ContentAnalyzer:
     """内容分析器 - 使用大模型进行深度内容分析"""
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: AnalyzerSettings):
         """
         初始化内容分析器
 
         Args:
-            config: 系统配置，包含模型配置
+            config: 内容分析配置视图(分析模型已在构建配置快照时解析)
         """
         self.config = config
+        self.analyzer_model_name = config.model_name
+        self.analyzer_model_config = config.model
+        self.timeout = config.timeout
+        self.max_prompt_tokens = config.max_prompt_tokens
+        self.section_size = max(0, config.content_analysis.section_size)
+        self.section_concurrency = max(1, config.content_analysis.section_concurrency)
 
-        # 选择分析模型（使用通义千问作为默认分析模型）
-        analyzer_model_name = config.get("content_analysis", {}).get("analyzer_model", "qianwen")
-        self.analyzer_model_config = config["models"].get(analyzer_model_name, {})
-
-        if not self.analyzer_model_config.get("enabled", False):
-            logger.warning(f"分析模型 {analyzer_model_name} 未启用，尝试使用第一个可用模型")
-            # 寻找第一个启用的模型
-            for model_name, model_config in config["models"].items():
-                if model_config.get("enabled", False):
-                    self.analyzer_model_config = model_config
-                    analyzer_model_name = model_name
-                    break
-
-        self.analyzer_model_name = analyzer_model_name
-        self.timeout = self.analyzer_model_config.get("timeout", 60)
+        if config.model is None or config.model_name != config.content_analysis.analyzer_model:
+            logger.warning(f"分析模型 {config.content_analysis.analyzer_model} 未启用，使用: {config.model_name}")
 
         logger.info(f"内容分析器初始化完成，使用模型: {self.analyzer_model_name}")
 
+    @property
+    def settings_fingerprint(self) -> str:
+        """影响分析结果的配置指纹（分析模型及其配置、内容分析配置）"""
+        return self.config.fingerprint
+
     async def analyze_content(self, ppt_data: PPTParseResult) -> ContentAnalysisResult:
         """
         执行内容分析
@@ -65,17 +88,33 @@ class ContentAnalyzer:
         """
         logger.info(f"开始内容分析: {ppt_data.ppt_id}")
 
+        if self.section_size > 0:
+            return await self._analyze_in_sections(ppt_data, self.section_size)
+
         try:
             # 1. 构建分析提示词
-            prompt = self._build_analysis_prompt(ppt_data)
-            logger.debug(f"分析提示词长度: {len(prompt)}")
+            prompt, table = self._build_analysis_prompt(ppt_data)
+            if table.slide_count < ppt_data.total_slides:
+                # 整份PPT超出提示词预算: 按能放下的页数分段分析,不丢弃后面的页面
+                logger.info(
+                    f"提示词只能容纳 {table.slide_count}/{ppt_data.total_slides} 页,改为分段分析: {ppt_data.ppt_id}"
+                )
+                return await self._analyze_in_sections(ppt_data, table.slide_count)
+            prompt_tokens = estimate_tokens(prompt)
+            logger.info(
+                f"分析提示词: {ppt_data.ppt_id}, 约 {prompt_tokens} tokens "
+                f"(预算: {self.max_prompt_tokens})"
+            )
 
             # 2. 调用大模型
-            raw_response = await self._call_model(prompt)
+            with get_tracer().provider_span(ppt_data.ppt_id, self.analyzer_model_name, prompt_tokens) as span:
+                raw_response = await self._call_model(prompt, span)
+                span.usage(raw_response)
             logger.debug(f"模型响应获取成功")
 
             # 3. 解析响应
             analysis_result = self._parse_analysis_response(raw_response, ppt_data.ppt_id)
+            analysis_result.metadata["prompt_tokens"] = prompt_tokens
             logger.info(f"内容分析完成: {ppt_data.ppt_id}, 识别 {len(analysis_result.optimization_opportunities)} 个优化机会")
 
             # 4. 后处理和验证
@@ -88,39 +127,265 @@ class ContentAnalyzer:
             # 返回一个基本的分析结果
             return self._create_fallback_analysis(ppt_data)
 
-    def _build_analysis_prompt(self, ppt_data: PPTParseResult) -> str:
+    async def _analyze_in_sections(self, ppt_data: PPTParseResult, section_size: int) -> ContentAnalysisResult:
         """
-        构建内容分析提示词
+        分段分析已解析完成的PPT
 
         Args:
             ppt_data: PPT解析结果
+            section_size: 每段页数
 
         Returns:
-            str: 分析提示词
+            ContentAnalysisResult: 内容分析结果
         """
-        # 提取PPT内容摘要
-        slides_summary = []
-        for slide in ppt_data.slides:
-            slide_summary = {
-                "index": slide.slide_index,
-                "type": slide.slide_type.value,
-                "content": slide.content[:500] if slide.content else "",  # 限制长度
-                "has_images": len(slide.images) > 0,
-                "has_charts": len(slide.charts) > 0
+        digest = get_deck_digest(ppt_data)
+        semaphore = asyncio.Semaphore(self.section_concurrency)
+        sections = []
+        start = 0
+        while start < len(digest):
+            rows = self._fit_section(ppt_data, ppt_data.total_slides, digest[start:start + section_size])
+            sections.append(asyncio.ensure_future(
+                self._analyze_section(ppt_data, ppt_data.total_slides, rows, semaphore)
+            ))
+            start += len(rows)
+        return await self._finish_sections(ppt_data, sections)
+
+    def _fit_section(self, deck, total_slides: int, rows: Sequence[SlideDigest]) -> Sequence[SlideDigest]:
+        """
+        截取一段中能放进提示词预算的前若干页(其余页面留给下一段,不丢弃)
+
+        Args:
+            deck: PPT解析结果(只使用filename、theme)
+            total_slides: 总页数
+            rows: 本段的幻灯片摘要
+
+        Returns:
+            Sequence[SlideDigest]: 能放进预算的幻灯片摘要(至少一页)
+        """
+        _, table = self._build_analysis_prompt(deck, rows, total_slides)
+        return rows[:table.slide_count]
+
+    async def analyze_stream(self, stream: "SlideStream") -> ContentAnalysisResult:
+        """
+        边解析边分析: 每解析完一段即提交该段的分析,与后续页面的解析重叠
+
+        未开启分段分析(section_size为0)时等待解析完成后整份分析。
+
+        Args:
+            stream: 已开始解析的幻灯片流
+
+        Returns:
+            ContentAnalysisResult: 内容分析结果
+        """
+        if self.section_size <= 0:
+            return await self.analyze_content((await stream.wait()).to_result())
+
+        logger.info(f"开始分段内容分析: {stream.ppt_id}, 共 {stream.total_slides} 页, 每段 {self.section_size} 页")
+        semaphore = asyncio.Semaphore(self.section_concurrency)
+        sections: List[asyncio.Future] = []
+        rows: List[SlideDigest] = []
+
+        def dispatch(rows: List[SlideDigest]) -> List[SlideDigest]:
+            # 提交能放进预算的部分,其余页面并入下一段
+            fitted = self._fit_section(stream.result, stream.total_slides, rows)
+            sections.append(asyncio.ensure_future(
+                self._analyze_section(stream.result, stream.total_slides, fitted, semaphore)
+            ))
+            return rows[len(fitted):]
+
+        try:
+            async for slide in stream:
+                rows.append(digest_slide(slide))
+                if len(rows) >= self.section_size:
+                    rows = dispatch(rows)
+            while rows:
+                rows = dispatch(rows)
+        except BaseException:
+            # 解析失败或任务被取消: 已提交的分段不再需要
+            for section in sections:
+                section.cancel()
+            raise
+
+        ppt_data = (await stream.wait()).to_result()
+        return await self._finish_sections(ppt_data, sections)
+
+    async def _analyze_section(
+        self,
+        deck,
+        total_slides: int,
+        rows: Sequence[SlideDigest],
+        semaphore: asyncio.Semaphore
+    ) -> Optional[ContentAnalysisResult]:
+        """
+        分析一段幻灯片
+
+        Args:
+            deck: PPT解析结果(PPTParseResult或CompactParseResult,只使用ppt_id、filename、theme)
+            total_slides: 总页数
+            rows: 本段的幻灯片摘要
+            semaphore: 同时请求模型的段数限制
+
+        Returns:
+            Optional[ContentAnalysisResult]: 本段的分析结果,失败时为None
+        """
+        ppt_id = deck.ppt_id
+        first, last = rows[0].index + 1, rows[-1].index + 1
+        waiting = time.monotonic()
+        async with semaphore:
+            tracer = get_tracer()
+            tracer.record_wait(ppt_id, "content_section", time.monotonic() - waiting, waiting)
+            try:
+                prompt, _ = self._build_analysis_prompt(deck, rows, total_slides)
+                prompt_tokens = estimate_tokens(prompt)
+                logger.debug(f"分段分析提示词: {ppt_id}, 第 {first}-{last} 页, 约 {prompt_tokens} tokens")
+
+                with tracer.provider_span(ppt_id, self.analyzer_model_name, prompt_tokens, section=first) as span:
+                    raw_response = await self._call_model(prompt, span)
+                    span.usage(raw_response)
+
+                result = self._parse_analysis_response(raw_response, ppt_id)
+                result.metadata["prompt_tokens"] = prompt_tokens
+                return result
+
+            except Exception as e:
+                logger.error(f"分段内容分析失败: {ppt_id}, 第 {first}-{last} 页, 错误: {str(e)}")
+                return None
+
+    async def _finish_sections(
+        self,
+        ppt_data: PPTParseResult,
+        sections: List[asyncio.Future]
+    ) -> ContentAnalysisResult:
+        """
+        等待各段分析完成并按页面顺序合并(全部失败时使用降级分析)
+
+        Args:
+            ppt_data: PPT解析结果
+            sections: 按页面顺序提交的分段分析
+
+        Returns:
+            ContentAnalysisResult: 内容分析结果
+        """
+        results = await asyncio.gather(*sections)
+        succeeded = [result for result in results if result is not None]
+        if not succeeded:
+            logger.error(f"内容分析失败: {ppt_data.ppt_id}, 所有分段均失败")
+            return self._create_fallback_analysis(ppt_data)
+
+        analysis_result = self._merge_sections(ppt_data.ppt_id, succeeded)
+        analysis_result.metadata["failed_sections"] = len(results) - len(succeeded)
+        logger.info(
+            f"内容分析完成: {ppt_data.ppt_id}, {len(succeeded)}/{len(results)} 段成功, "
+            f"识别 {len(analysis_result.optimization_opportunities)} 个优化机会"
+        )
+        return self._post_process(analysis_result, ppt_data)
+
+    def _merge_sections(self, ppt_id: str, results: List[ContentAnalysisResult]) -> ContentAnalysisResult:
+        """
+        合并各段的分析结果
+
+        每页分析和优化机会按段顺序拼接;整体分析中的主题等取第一段,
+        要点、章节、问题和建议按顺序去重合并,评分按各段页数加权平均,结构质量取最差的一段。
+
+        Args:
+            ppt_id: PPT ID
+            results: 各段的分析结果(按页面顺序)
+
+        Returns:
+            ContentAnalysisResult: 合并后的分析结果
+        """
+        def unique(values):
+            return list(OrderedDict.fromkeys(values))
+
+        overalls = [result.overall_analysis for result in results]
+        weights = [max(1, len(result.slide_analyses)) for result in results]
+
+        def weighted(field: str) -> float:
+            total = sum(getattr(overall, field) * weight for overall, weight in zip(overalls, weights))
+            return round(total / sum(weights), 2)
+
+        qualities = [overall.outline_structure.structure_quality for overall in overalls]
+        first = overalls[0]
+        outline_structure = OutlineStructure(
+            sections=[section for overall in overalls for section in overall.outline_structure.sections],
+            structure_type=first.outline_structure.structure_type,
+            structure_quality=max(
+                qualities,
+                key=lambda q: _STRUCTURE_QUALITY_ORDER.index(q) if q in _STRUCTURE_QUALITY_ORDER else 0
+            ),
+            structure_issues=unique(
+                issue for overall in overalls for issue in overall.outline_structure.structure_issues
+            )
+        )
+
+        overall_analysis = OverallAnalysis(
+            key_points=unique(point for overall in overalls for point in overall.key_points),
+            theme=first.theme,
+            target_audience=first.target_audience,
+            presentation_goal=first.presentation_goal,
+            outline_structure=outline_structure,
+            content_coherence=weighted("content_coherence"),
+            logic_flow=weighted("logic_flow"),
+            completeness=weighted("completeness"),
+            overall_suggestions=unique(
+                suggestion for overall in overalls for suggestion in overall.overall_suggestions
+            )
+        )
+
+        return ContentAnalysisResult(
+            ppt_id=ppt_id,
+            overall_analysis=overall_analysis,
+            slide_analyses=[analysis for result in results for analysis in result.slide_analyses],
+            optimization_opportunities=[
+                opportunity for result in results for opportunity in result.optimization_opportunities
+            ],
+            metadata={
+                "analyzer_model": self.analyzer_model_name,
+                "raw_response_length": sum(result.metadata.get("raw_response_length", 0) for result in results),
+                "prompt_tokens": sum(result.metadata.get("prompt_tokens", 0) for result in results),
+                "sections": len(results)
             }
-            slides_summary.append(slide_summary)
+        )
+
+    def _build_analysis_prompt(
+        self,
+        ppt_data,
+        rows: Optional[Sequence[SlideDigest]] = None,
+        total_slides: Optional[int] = None
+    ) -> Tuple[str, RenderedTable]:
+        """
+        构建内容分析提示词
+
+        Args:
+            ppt_data: PPT解析结果(分段分析时也可以是CompactParseResult)
+            rows: 分段分析时本段的幻灯片摘要,为空时分析整份PPT
+            total_slides: 总页数(分段分析时提供,解析尚未完成时ppt_data中的页数不完整)
 
-        prompt = f"""你是一位专业的PPT内容分析专家。请对以下PPT进行深度分析，并以JSON格式返回分析结果。
+        Returns:
+            Tuple[str, RenderedTable]: 分析提示词, 其中的幻灯片表格(slide_count小于页数时表示超出预算被截断)
+        """
+        if rows is None:
+            rows = get_deck_digest(ppt_data)
+            total_slides = ppt_data.total_slides
+            scope = "请对以下PPT进行深度分析"
+            section_line = ""
+        else:
+            first, last = rows[0].index, rows[-1].index
+            scope = f"请对以下PPT的第 {first}-{last} 页(页码从0开始)进行深度分析"
+            section_line = f"- 本次分析范围: 第 {first}-{last} 页(其余页面分段单独分析,只返回本范围内页面的分析)\n"
+
+        header = f"""你是一位专业的PPT内容分析专家。{scope}，并以JSON格式返回分析结果。
 
 # PPT基本信息
 - 文件名: {ppt_data.filename}
-- 总页数: {ppt_data.total_slides}
+- 总页数: {total_slides}
 - 主题: {ppt_data.theme.get('name', '未知')}
-
+{section_line}
 # 每页内容
-{json.dumps(slides_summary, ensure_ascii=False, indent=2)}
+每行一页，列: {table_legend(_ANALYSIS_COLUMNS)}
+"""
 
-# 分析任务
+        instructions = """# 分析任务
 请从以下几个维度进行分析：
 
 1. **整体分析** (overall_analysis)
@@ -165,33 +430,33 @@ class ContentAnalyzer:
 请严格按照以下JSON结构返回结果（不要包含任何其他文字）:
 
 ```json
-{{
-  "overall_analysis": {{
+{
+  "overall_analysis": {
     "key_points": ["要点1", "要点2", "要点3"],
     "theme": "PPT主题",
     "target_audience": "目标受众",
     "presentation_goal": "演示目标",
-    "outline_structure": {{
+    "outline_structure": {
       "sections": [
-        {{
+        {
           "section_name": "章节名",
           "slide_indices": [0, 1, 2],
           "purpose": "章节目的",
           "is_necessary": true,
           "improvement_suggestion": "改进建议（可选）"
-        }}
+        }
       ],
       "structure_type": "linear",
       "structure_quality": "good",
       "structure_issues": ["问题1", "问题2"]
-    }},
+    },
     "content_coherence": 7.5,
     "logic_flow": 8.0,
     "completeness": 7.0,
     "overall_suggestions": ["建议1", "建议2"]
-  }},
+  },
   "slide_analyses": [
-    {{
+    {
       "slide_index": 0,
       "slide_title": "页面标题",
       "main_points": ["要点1", "要点2"],
@@ -199,18 +464,18 @@ class ContentAnalyzer:
       "relevance": 9.0,
       "information_density": "appropriate",
       "issues": [
-        {{
+        {
           "issue_type": "unclear",
           "description": "问题描述",
           "severity": "minor",
           "location": "具体位置（可选）"
-        }}
+        }
       ],
       "optimization_directions": ["方向1", "方向2"]
-    }}
+    }
   ],
   "optimization_opportunities": [
-    {{
+    {
       "scope": "slide",
       "slide_indices": [0],
       "category": "content",
@@ -221,26 +486,42 @@ class ContentAnalyzer:
       "expected_benefit": "预期收益",
       "priority": "high",
       "impact_score": 8.0
-    }}
+    }
   ]
-}}
+}
 ```
 
 请开始分析。
 """
-        return prompt
+
+        # 提取PPT内容摘要(紧凑表格,按token预算截断;固定部分过长时仍为表格保留最低预算)
+        table_budget = max(
+            self.max_prompt_tokens - estimate_tokens(header) - estimate_tokens(instructions),
+            int(self.max_prompt_tokens * _MIN_TABLE_BUDGET_RATIO)
+        )
+        table = fit_slide_table(
+            rows,
+            table_budget,
+            columns=_ANALYSIS_COLUMNS,
+            content_limit=500
+        )
+
+        return "".join([header, table.text, "\n\n", instructions]), table
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    async def _call_model(self, prompt: str) -> Dict[str, Any]:
+    async def _call_model(self, prompt: str, span=None) -> Dict[str, Any]:
         """
         调用大模型API（带重试）
 
         Args:
             prompt: 分析提示词
+            span: 模型调用区间（每次尝试计入）
 
         Returns:
             Dict: 模型响应
         """
+        if span is not None:
+            span.attempt()
         model_name = self.analyzer_model_name
 
         if model_name == "qianwen":
@@ -256,8 +537,8 @@ class ContentAnalyzer:
 
     async def _call_qianwen(self, prompt: str) -> Dict[str, Any]:
         """调用通义千问API"""
-        api_url = self.analyzer_model_config.get("api_url")
-        api_key = self.analyzer_model_config.get("api_key")
+        api_url = self.analyzer_model_config.api_url
+        api_key = self.analyzer_model_config.api_key
 
         headers = {
             "Authorization": f"Bearer {api_key}",
@@ -0,0 +1,407 @@
+"""
+迭代修正工作流引擎
+按 iteration.workflow 配置执行 生成 → 修正 → 融合 步骤,逐批调用真实模型
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence, Set
+from loguru import logger
+
+from app.models.schemas import (
+    PPTParseResult,
+    ModelSuggestion,
+    OptimizationSuggestion,
+    OptimizationDimension,
+    IterationResult,
+    CorrectionRecord,
+    CorrectionAction
+)
+from app.services.prompt_renderer import get_deck_digest, render_slide_table, normalize_cell
+from app.services.suggestion_similarity import SuggestionSimilarity
+from app.services.conflict_index import ConflictIndex, GroupKey
+from app.services.tracing import get_tracer
+
+
+# 工作流提示词的输出格式说明
+_OUTPUT_FORMAT = """请严格按照以下JSON格式返回(只返回JSON,不要其他文字):
+{
+  "suggestions": [
+    {
+      "slide_index": 0,
+      "optimization_dimension": "layout",
+      "original_content": "原始内容描述",
+      "suggestion": "具体优化建议",
+      "reason": "建议理由",
+      "priority": "recommend"
+    }
+  ]
+}
+slide_index为从0开始的页码; optimization_dimension可选: content/logic/layout/color/font/chart;
+priority可选: must/recommend/optional"""
+
+_ACTION_INSTRUCTIONS = {
+    "correct": "以下是多个模型对同一页面、同一维度给出的不一致建议。请作为该领域专家修正它们,"
+               "为每个(页码, 维度)只返回一条修正后的建议。",
+    "merge": "以下是经过修正后仍不一致的建议。请综合各方案的优点进行融合,"
+             "为每个(页码, 维度)只返回一条最终建议。",
+}
+
+
+class WorkflowStep:
+    """工作流步骤"""
+
+    __slots__ = ("index", "model", "action", "dimensions", "input_from")
+
+    def __init__(
+        self,
+        index: int,
+        model: str,
+        action: str,
+        dimensions: Sequence[str] = (),
+        input_from: Optional[str] = None
+    ):
+        self.index = index
+        self.model = model
+        self.action = action
+        self.dimensions: Set[OptimizationDimension] = {OptimizationDimension(d) for d in dimensions}
+        self.input_from = input_from
+
+
+class _StepRun:
+    """单轮中某个步骤的执行统计"""
+
+    __slots__ = ("started", "finished", "calls", "suggestions", "corrections")
+
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.calls = 0
+        self.suggestions: List[OptimizationSuggestion] = []
+        self.corrections: List[CorrectionRecord] = []
+
+    @property
+    def latency_ms(self) -> float:
+        """从首个批次开始到最后一个批次结束的耗时"""
+        if self.started is None or self.finished is None:
+            return 0.0
+        return (self.finished - self.started) * 1000
+
+
+class CorrectionWorkflow:
+    """迭代修正工作流"""
+
+    def __init__(
+        self,
+        workflow_config: List[Dict],
+        model_engine=None,
+        similarity: SuggestionSimilarity = None,
+        chunk_size: int = 10,
+        max_concurrency: int = 4
+    ):
+        """
+        初始化工作流
+
+        Args:
+            workflow_config: iteration.workflow 步骤配置
+            model_engine: 模型引擎(提供各模型客户端)
+            similarity: 建议相似度引擎
+            chunk_size: 每批处理的页数
+            max_concurrency: 同时处理的批次数
+        """
+        self.steps = [WorkflowStep(i, **step) for i, step in enumerate(workflow_config)]
+        self.model_engine = model_engine
+        self.similarity = similarity or SuggestionSimilarity()
+        self.chunk_size = max(1, chunk_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.stages = self._plan_stages(self.steps)
+
+    @property
+    def available(self) -> bool:
+        """是否至少有一个步骤的模型可用"""
+        return any(self._client(step) is not None for step in self.steps)
+
+    def _client(self, step: WorkflowStep):
+        """获取步骤对应的模型客户端(未启用时为None)"""
+        if self.model_engine is None:
+            return None
+        return self.model_engine.clients.get(step.model)
+
+    @staticmethod
+    def _plan_stages(steps: List[WorkflowStep]) -> List[List[WorkflowStep]]:
+        """
+        将步骤划分为阶段
+
+        相邻的修正步骤若维度互不重叠,则它们修改的建议互不相交,
+        后一步对前一步的依赖在其维度上等价于直接读取阶段输入,可以并发执行。
+        未指定维度的步骤作用于全部维度,不与任何步骤并发。
+        """
+        stages: List[List[WorkflowStep]] = []
+        for step in steps:
+            last = stages[-1] if stages else None
+            if (
+                step.action == "correct"
+                and last
+                and step.dimensions
+                and all(
+                    s.action == "correct" and s.dimensions and not (s.dimensions & step.dimensions)
+                    for s in last
+                )
+            ):
+                last.append(step)
+            else:
+                stages.append([step])
+        return stages
+
+    async def run_round(
+        self,
+        round_num: int,
+        ppt_id: str,
+        index: ConflictIndex,
+        ppt_data: PPTParseResult = None
+    ) -> List[IterationResult]:
+        """
+        执行一轮修正,结果直接写回冲突索引
+
+        页面按批次在各阶段间流水线执行: 前一批进入修正阶段时,
+        后一批可以同时处于生成阶段。只有存在冲突的页面会被处理。
+
+        Args:
+            round_num: 轮次(从1开始)
+            ppt_id: PPT ID
+            index: 冲突索引(保存当前各模型建议)
+            ppt_data: PPT解析数据(用于在提示词中提供页面内容)
+
+        Returns:
+            List[IterationResult]: 本轮各步骤的迭代记录
+        """
+        runs = {step.index: _StepRun() for step in self.steps}
+        existing_models = index.model_names
+
+        # 仅当生成模型尚无建议时才调用生成步骤
+        generate_steps = [
+            step for step in self.steps
+            if step.action == "generate"
+            and self._client(step) is not None
+            and not {step.model, self._client(step).name} & existing_models
+            and ppt_data is not None
+        ]
+
+        conflicting = index.conflicting_keys()
+        if generate_steps:
+            slide_indices = list(range(ppt_data.total_slides))
+        else:
+            slide_indices = sorted({key[0] for key in conflicting})
+
+        chunks = [
+            slide_indices[i:i + self.chunk_size]
+            for i in range(0, len(slide_indices), self.chunk_size)
+        ]
+        conflicting_set = set(conflicting)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        tracer = get_tracer()
+
+        async def run_chunk(chunk: List[int]) -> Dict[GroupKey, OptimizationSuggestion]:
+            waiting = time.monotonic()
+            async with semaphore:
+                tracer.record_wait(ppt_id, "correction", time.monotonic() - waiting, waiting)
+                keys = index.keys_for_slides(chunk)
+                groups = {key: index.group(key) for key in keys}
+                pending = {key for key in keys if key in conflicting_set}
+                return await self._run_chunk(
+                    ppt_id, ppt_data, chunk, groups, pending, generate_steps, runs
+                )
+
+        chunk_results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+        # 写回索引: 只有新生成或被修正的分组需要重新计算冲突
+        for step in generate_steps:
+            client = self._client(step)
+            index.add(ModelSuggestion(
+                ppt_id=ppt_id,
+                model_name=client.name,
+                optimization_suggestions=list(runs[step.index].suggestions),
+                core_strength=client.config.core_strength
+            ))
+        for decisions in chunk_results:
+            index.resolve(decisions)
+
+        history = []
+        for step in self.steps:
+            run = runs[step.index]
+            if run.calls == 0:
+                continue
+            history.append(IterationResult(
+                round=round_num,
+                model_name=step.model,
+                suggestions=run.suggestions,
+                corrections=run.corrections,
+                action=step.action,
+                latency_ms=round(run.latency_ms, 1)
+            ))
+            logger.info(
+                f"第 {round_num} 轮 {step.action}({step.model}): "
+                f"{run.calls} 次调用, 耗时 {run.latency_ms:.0f} ms"
+            )
+
+        return history
+
+    async def _run_chunk(
+        self,
+        ppt_id: str,
+        ppt_data: Optional[PPTParseResult],
+        chunk: List[int],
+        groups: Dict[GroupKey, List[OptimizationSuggestion]],
+        pending: Set[GroupKey],
+        generate_steps: List[WorkflowStep],
+        runs: Dict[int, _StepRun]
+    ) -> Dict[GroupKey, OptimizationSuggestion]:
+        """按阶段顺序处理一批页面,返回本批各分组的最终建议"""
+        decisions: Dict[GroupKey, OptimizationSuggestion] = {}
+
+        for stage in self.stages:
+            active = [step for step in stage if self._client(step) is not None]
+            if not active:
+                continue
+
+            if stage[0].action == "generate":
+                active = [step for step in active if step in generate_steps]
+                if not active:
+                    continue
+                outputs = await asyncio.gather(*(
+                    self._generate(step, ppt_id, ppt_data, chunk, runs[step.index])
+                    for step in active
+                ))
+                changed = set()
+                for generated in outputs:
+                    for sug in generated:
+                        key = (sug.slide_index, sug.optimization_dimension)
+                        groups.setdefault(key, []).append(sug)
+                        changed.add(key)
+                # 只对新增建议的分组重新判断冲突
+                pending = (pending - changed) | set(self._conflicting_keys({k: groups[k] for k in changed}))
+                continue
+
+            # 已无冲突的批次提前结束
+            if not pending:
+                break
+
+            outputs = await asyncio.gather(*(
+                self._correct(
+                    step, ppt_id, ppt_data,
+                    {k: groups[k] for k in pending if not step.dimensions or k[1] in step.dimensions},
+                    runs[step.index]
+                )
+                for step in active
+            ))
+            for corrected in outputs:
+                for key, sug in corrected.items():
+                    groups[key] = [sug]
+                    decisions[key] = sug
+                    pending.discard(key)
+
+        return decisions
+
+    async def _generate(
+        self,
+        step: WorkflowStep,
+        ppt_id: str,
+        ppt_data: PPTParseResult,
+        chunk: List[int],
+        run: _StepRun
+    ) -> List[OptimizationSuggestion]:
+        """生成步骤: 为本批页面生成初始建议"""
+        digest = get_deck_digest(ppt_data)
+        rows = [digest[i] for i in chunk if i < len(digest)]
+        dims = ", ".join(sorted(d.value for d in step.dimensions)) or "全部维度"
+        prompt = "".join([
+            f"你是一个专业的PPT优化助手。请针对以下页面从 {dims} 维度提供优化建议。\n\n",
+            f"PPT文件名: {ppt_data.filename}\n总页数: {ppt_data.total_slides}\n\n",
+            render_slide_table(rows, columns=("index", "type", "layout", "content")),
+            "\n\n",
+            _OUTPUT_FORMAT
+        ])
+
+        suggestions = await self._call(step, prompt, ppt_id, run)
+        chunk_set = set(chunk)
+        result = [
+            s for s in suggestions
+            if s.slide_index in chunk_set and (not step.dimensions or s.optimization_dimension in step.dimensions)
+        ]
+        run.suggestions.extend(result)
+        return result
+
+    async def _correct(
+        self,
+        step: WorkflowStep,
+        ppt_id: str,
+        ppt_data: Optional[PPTParseResult],
+        groups: Dict[GroupKey, List[OptimizationSuggestion]],
+        run: _StepRun
+    ) -> Dict[GroupKey, OptimizationSuggestion]:
+        """修正/融合步骤: 为每个冲突分组给出一条建议"""
+        if not groups:
+            return {}
+
+        lines = ["slide_index|dimension|candidate"]
+        for (slide_idx, dimension), candidates in sorted(groups.items(), key=lambda kv: (kv[0][0], kv[0][1].value)):
+            for sug in candidates:
+                lines.append(f"{slide_idx}|{dimension.value}|{normalize_cell(sug.suggestion)}")
+
+        parts = [_ACTION_INSTRUCTIONS.get(step.action, _ACTION_INSTRUCTIONS["correct"]), "\n\n"]
+        if ppt_data is not None:
+            digest = get_deck_digest(ppt_data)
+            slide_indices = sorted({k[0] for k in groups})
+            rows = [digest[i] for i in slide_indices if i < len(digest)]
+            parts += ["# 页面内容\n", render_slide_table(rows, content_limit=150), "\n\n"]
+        parts += ["# 待处理建议\n", "\n".join(lines), "\n\n", _OUTPUT_FORMAT]
+
+        suggestions = await self._call(step, "".join(parts), ppt_id, run)
+
+        corrected: Dict[GroupKey, OptimizationSuggestion] = {}
+        for sug in suggestions:
+            key = (sug.slide_index, sug.optimization_dimension)
+            if key not in groups or key in corrected:
+                continue
+            corrected[key] = sug
+            run.corrections.append(CorrectionRecord(
+                action=CorrectionAction.MODIFY,
+                original_suggestion=groups[key][0],
+                new_suggestion=sug,
+                reason=sug.reason or f"{step.model} {step.action}",
+                corrector_model=step.model
+            ))
+
+        run.suggestions.extend(corrected.values())
+        return corrected
+
+    async def _call(
+        self,
+        step: WorkflowStep,
+        prompt: str,
+        ppt_id: str,
+        run: _StepRun
+    ) -> List[OptimizationSuggestion]:
+        """调用步骤模型并记录耗时,失败时返回空列表(保留原建议)"""
+        client = self._client(step)
+        started = time.perf_counter()
+        if run.started is None or started < run.started:
+            run.started = started
+
+        try:
+            result = await client.run_prompt(prompt, ppt_id)
+            return result.optimization_suggestions
+        except Exception as e:
+            logger.error(f"工作流步骤 {step.action}({step.model}) 调用失败: {str(e)}")
+            return []
+        finally:
+            run.calls += 1
+            finished = time.perf_counter()
+            if run.finished is None or finished > run.finished:
+                run.finished = finished
+
+    def _conflicting_keys(self, groups: Dict[GroupKey, List[OptimizationSuggestion]]) -> List[GroupKey]:
+        """返回仍存在冲突的分组"""
+        candidates = [(key, group) for key, group in groups.items() if len(group) > 1]
+        results = self.similarity.analyze_groups([[s.suggestion for s in g] for _, g in candidates])
+        return [key for (key, _), result in zip(candidates, results) if result.has_conflict]
@@ -2,12 +2,11 @@
 跨模型建议迭代修正器 - 核心强化模块
 实现多模型建议的迭代修正、冲突检测与调和
 """
-import json
-from typing import List, Dict, Any, Tuple
-from collections import defaultdict
+from typing import List, Optional
 from loguru import logger
 
 from app.models.schemas import (
+    PPTParseResult,
     ModelSuggestion,
     OptimizationSuggestion,
     FinalOptimizationPlan,
@@ -20,6 +19,12 @@ from app.models.schemas import (
     OptimizationDimension
 )
 from app.core.config import IterationConfig, ConflictResolutionConfig
+from app.services.suggestion_similarity import SuggestionSimilarity
+from app.services.correction_workflow import CorrectionWorkflow
+from app.services.conflict_arbiter import ConflictArbiter
+from app.services.conflict_index import ConflictIndex
+from app.services.job_profiler import get_profiler
+from app.services.tracing import get_tracer, CORRECTION_ROUND, ARBITRATION
 
 
 class IterationCorrector:
@@ -28,7 +33,8 @@ class IterationCorrector:
     def __init__(
         self,
         iteration_config: IterationConfig,
-        conflict_config: ConflictResolutionConfig
+        conflict_config: ConflictResolutionConfig,
+        model_engine=None
     ):
         """
         初始化迭代修正器
@@ -36,42 +42,67 @@ class IterationCorrector:
         Args:
             iteration_config: 迭代配置
             conflict_config: 冲突调和配置
+            model_engine: 模型引擎,为空时不执行模型修正
         """
         self.config = iteration_config
         self.conflict_config = conflict_config
+        self.model_engine = model_engine
+        self.similarity = SuggestionSimilarity(
+            similarity_threshold=iteration_config.similarity_threshold
+        )
+        self.workflow = CorrectionWorkflow(
+            iteration_config.workflow,
+            model_engine,
+            self.similarity,
+            chunk_size=iteration_config.chunk_size,
+            max_concurrency=iteration_config.max_concurrency
+        )
         logger.info("迭代修正器初始化完成")
 
     async def process(
         self,
         ppt_id: str,
-        model_suggestions: List[ModelSuggestion]
+        model_suggestions: List[ModelSuggestion],
+        ppt_data: PPTParseResult = None
     ) -> FinalOptimizationPlan:
         """
-        处理模型建议,执行迭代修正
+        处理模型建议,执行迭代修正(任务开启性能分析时在cProfile下执行)
 
         Args:
             ppt_id: PPT ID
             model_suggestions: 原始模型建议列表
+            ppt_data: PPT解析数据,提供时修正提示词会附带页面内容
 
         Returns:
             FinalOptimizationPlan: 最终优化方案
         """
+        with get_profiler().capture(ppt_id, "iteration_correction"):
+            return await self._process(ppt_id, model_suggestions, ppt_data)
+
+    async def _process(
+        self,
+        ppt_id: str,
+        model_suggestions: List[ModelSuggestion],
+        ppt_data: PPTParseResult = None
+    ) -> FinalOptimizationPlan:
+        """执行迭代修正(见process)"""
         logger.info(f"开始迭代修正流程: {ppt_id}")
 
         # 如果未启用迭代修正,直接合并所有建议
         if not self.config.enabled:
             return self._merge_without_iteration(ppt_id, model_suggestions)
 
-        # 执行迭代修正
+        # 执行迭代修正(冲突索引在各轮之间增量更新)
         iteration_history = []
-        current_suggestions = model_suggestions
+        index = ConflictIndex(self.similarity).build(model_suggestions)
+        rounds_run = 0
 
+        tracer = get_tracer()
         for round_num in range(self.config.max_rounds):
             logger.info(f"开始第 {round_num + 1} 轮迭代修正")
 
             # 检测冲突
-            conflicts = self._detect_conflicts(current_suggestions)
-            conflict_rate = self._calculate_conflict_rate(conflicts, current_suggestions)
+            conflict_rate = index.conflict_rate
 
             logger.info(f"第 {round_num + 1} 轮冲突率: {conflict_rate:.2%}")
 
@@ -80,21 +111,29 @@ class IterationCorrector:
                 logger.info(f"冲突率低于阈值 {self.config.conflict_threshold},停止迭代")
                 break
 
-            # 执行修正 (这里简化处理,实际应该调用模型API进行修正)
-            # 在生产环境中,这里应该按照workflow配置依次调用模型进行修正
-            iteration_history.append(IterationResult(
-                round=round_num + 1,
-                model_name="iteration_processor",
-                suggestions=self._flatten_suggestions(current_suggestions),
-                corrections=[]
-            ))
+            if not self.workflow.available:
+                logger.warning("工作流中没有可用的模型,跳过模型修正")
+                break
 
-        # 检测最终冲突
-        final_conflicts = self._detect_conflicts(current_suggestions)
-        conflict_rate = self._calculate_conflict_rate(final_conflicts, current_suggestions)
+            # 按workflow配置调用模型进行修正
+            with tracer.span(ppt_id, CORRECTION_ROUND, round=round_num + 1, conflict_rate=round(conflict_rate, 4)):
+                round_history = await self.workflow.run_round(
+                    round_num + 1,
+                    ppt_id,
+                    index,
+                    ppt_data
+                )
+            iteration_history.extend(round_history)
+            rounds_run += 1
+
+        # 最终冲突
+        final_conflicts = index.conflicts()
+        conflict_rate = index.conflict_rate
+        current_suggestions = index.to_model_suggestions()
 
         # 调和冲突
-        resolutions = self._resolve_conflicts(final_conflicts, current_suggestions)
+        with tracer.span(ppt_id, ARBITRATION, conflicts=len(final_conflicts)):
+            resolutions = await self._resolve_conflicts(ppt_id, final_conflicts, current_suggestions)
 
         # 生成最终方案
         final_suggestions = self._generate_final_suggestions(
@@ -110,96 +149,18 @@ class IterationCorrector:
             resolutions=resolutions,
             conflict_rate=conflict_rate,
             metadata={
-                "total_iterations": len(iteration_history),
-                "model_count": len(model_suggestions)
+                "total_iterations": rounds_run,
+                "workflow_steps": len(iteration_history),
+                "model_count": len(current_suggestions)
             }
         )
 
         logger.info(f"迭代修正完成: {ppt_id}, 最终建议数: {len(final_suggestions)}, 冲突率: {conflict_rate:.2%}")
         return plan
 
-    def _detect_conflicts(self, suggestions: List[ModelSuggestion]) -> List[Conflict]:
-        """
-        检测模型建议之间的冲突
-
-        Args:
-            suggestions: 模型建议列表
-
-        Returns:
-            List[Conflict]: 冲突列表
-        """
-        conflicts = []
-
-        # 按 (slide_index, dimension) 分组建议
-        grouped: Dict[Tuple[int, OptimizationDimension], List[Tuple[str, OptimizationSuggestion]]] = defaultdict(list)
-
-        for model_sug in suggestions:
-            for sug in model_sug.optimization_suggestions:
-                key = (sug.slide_index, sug.optimization_dimension)
-                grouped[key].append((model_sug.model_name, sug))
-
-        # 检查每组是否有冲突
-        for (slide_idx, dimension), group_suggestions in grouped.items():
-            if len(group_suggestions) <= 1:
-                continue  # 只有一个建议,无冲突
-
-            # 检查建议是否冲突
-            suggestions_list = [s for _, s in group_suggestions]
-            if self._has_conflict(suggestions_list):
-                conflict = Conflict(
-                    slide_index=slide_idx,
-                    dimension=dimension,
-                    conflict_type=ConflictType.DIRECT,
-                    conflicting_suggestions=suggestions_list,
-                    description=f"第{slide_idx+1}页的{dimension}维度存在{len(suggestions_list)}个不同建议"
-                )
-                conflicts.append(conflict)
-
-        return conflicts
-
-    def _has_conflict(self, suggestions: List[OptimizationSuggestion]) -> bool:
-        """
-        判断多个建议是否冲突
-
-        简单实现: 如果建议内容差异较大则认为冲突
-        """
-        if len(suggestions) <= 1:
-            return False
-
-        # 提取所有建议内容
-        contents = [s.suggestion.lower() for s in suggestions]
-
-        # 简单判断: 如果内容完全不同则认为冲突
-        # 在实际应用中,这里应该使用更复杂的语义相似度比较
-        unique_contents = set(contents)
-        return len(unique_contents) > 1
-
-    def _calculate_conflict_rate(
-        self,
-        conflicts: List[Conflict],
-        suggestions: List[ModelSuggestion]
-    ) -> float:
-        """
-        计算冲突率
-
-        冲突率 = 冲突建议条数 / 总建议条数
-        """
-        if not conflicts:
-            return 0.0
-
-        # 统计冲突涉及的建议总数
-        conflict_count = sum(len(c.conflicting_suggestions) for c in conflicts)
-
-        # 统计总建议数
-        total_count = sum(len(s.optimization_suggestions) for s in suggestions)
-
-        if total_count == 0:
-            return 0.0
-
-        return conflict_count / total_count
-
-    def _resolve_conflicts(
+    async def _resolve_conflicts(
         self,
+        ppt_id: str,
         conflicts: List[Conflict],
         suggestions: List[ModelSuggestion]
     ) -> List[ConflictResolution]:
@@ -207,26 +168,53 @@ class IterationCorrector:
         调和冲突
 
         Args:
+            ppt_id: PPT ID
             conflicts: 冲突列表
             suggestions: 模型建议
 
         Returns:
             List[ConflictResolution]: 调和结果列表
         """
-        resolutions = []
+        resolutions: List[ConflictResolution] = [None] * len(conflicts)
+        unresolved = []
 
-        for conflict in conflicts:
+        for i, conflict in enumerate(conflicts):
             # 尝试按规则调和
             resolution = self._resolve_by_rules(conflict)
-
             if resolution is None:
-                # 规则无法调和,使用模型仲裁
-                resolution = self._resolve_by_arbiter(conflict)
-
-            resolutions.append(resolution)
+                unresolved.append(i)
+            else:
+                resolutions[i] = resolution
+
+        if unresolved:
+            # 规则无法调和,使用模型仲裁
+            arbiter = self._get_arbiter()
+            pending = [conflicts[i] for i in unresolved]
+            if arbiter is not None:
+                arbitrated = await arbiter.resolve(ppt_id, pending, self._resolve_by_arbiter)
+            else:
+                arbitrated = [self._resolve_by_arbiter(c) for c in pending]
+
+            for i, resolution in zip(unresolved, arbitrated):
+                resolutions[i] = resolution
 
         return resolutions
 
+    def _get_arbiter(self) -> Optional[ConflictArbiter]:
+        """获取批量仲裁器(未开启批量仲裁或仲裁模型不可用时为None)"""
+        if not self.conflict_config.arbiter_batch or self.model_engine is None:
+            return None
+
+        client = self.model_engine.clients.get(self.conflict_config.arbiter_model)
+        if client is None:
+            return None
+
+        return ConflictArbiter(
+            client,
+            batch_tokens=self.conflict_config.arbiter_batch_tokens,
+            max_concurrency=self.conflict_config.arbiter_concurrency
+        )
+
     def _resolve_by_rules(self, conflict: Conflict) -> ConflictResolution:
         """
         按预设规则调和冲突
@@ -259,10 +247,10 @@ class IterationCorrector:
 
     def _resolve_by_arbiter(self, conflict: Conflict) -> ConflictResolution:
         """
-        使用仲裁模型调和冲突
+        使用仲裁模型调和冲突(单个冲突的降级方案)
 
-        在实际应用中,这里应该调用仲裁模型API
-        这里简化为选择第一个must优先级的建议,或随机选择
+        批量仲裁不可用或模型未给出结论时使用,
+        选择第一个must优先级的建议,否则选择第一个建议
         """
         # 优先选择must级别的建议
         must_suggestions = [
@@ -348,13 +336,3 @@ class IterationCorrector:
             conflict_rate=0.0,
             metadata={"iteration_enabled": False}
         )
-
-    def _flatten_suggestions(
-        self,
-        model_suggestions: List[ModelSuggestion]
-    ) -> List[OptimizationSuggestion]:
-        """展平模型建议为建议列表"""
-        result = []
-        for ms in model_suggestions:
-            result.extend(ms.optimization_suggestions)
-        return result
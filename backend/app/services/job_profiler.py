@@ -0,0 +1,305 @@
+"""
+任务性能分析模块
+为指定任务的CPU密集阶段(解析、应用优化、迭代修正)开启cProfile和tracemalloc,
+结果保存为可下载的文件。未开启分析的任务只多一次集合查找
+"""
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional, Set, TypeVar
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.utils import is_valid_ppt_id
+
+
+T = TypeVar("T")
+
+# 分配统计中忽略的帧(分析工具自身)
+_ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class _NullCapture:
+    """未开启分析时使用的空上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_CAPTURE = _NullCapture()
+
+
+class _Capture:
+    """单个阶段的性能采集(在执行该阶段的线程中进入和退出)"""
+
+    def __init__(self, profiler: "JobProfiler", ppt_id: str, stage: str):
+        self._profiler = profiler
+        self._ppt_id = ppt_id
+        self._stage = stage
+        self._profile: Optional[cProfile.Profile] = None
+        self._traced = False
+
+    def __enter__(self):
+        profiler = self._profiler
+        if profiler.trace_allocations:
+            profiler._start_tracemalloc()
+            self._traced = True
+
+        # 同一线程同时只能有一个cProfile(如事件循环中并发的两个分析任务),后进入的只采集内存
+        if not getattr(profiler._local, "profiling", False):
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+                profiler._local.profiling = True
+            except ValueError:
+                self._profile = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        profiler = self._profiler
+        if self._profile is not None:
+            self._profile.disable()
+            profiler._local.profiling = False
+
+        snapshot = None
+        peak = 0
+        if self._traced:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            profiler._stop_tracemalloc()
+
+        try:
+            profiler._save(self._ppt_id, self._stage, self._profile, snapshot, peak)
+        except Exception as e:
+            logger.warning(f"保存性能分析结果失败: {self._ppt_id}/{self._stage}, 错误: {str(e)}")
+        return False
+
+
+class JobProfiler:
+    """任务性能分析器"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        output_dir: str = "./profiles",
+        top_n: int = 40,
+        trace_allocations: bool = True,
+        traceback_frames: int = 1
+    ):
+        """
+        初始化性能分析器
+
+        Args:
+            enabled: 是否允许开启任务性能分析
+            output_dir: 分析结果目录(每个任务一个子目录)
+            top_n: 文本报告中列出的函数数和分配位置数
+            trace_allocations: 是否同时用tracemalloc统计内存分配(采集期间对整个进程生效)
+            traceback_frames: tracemalloc为每次分配保存的栈帧数
+        """
+        self.enabled = enabled
+        self.output_dir = Path(output_dir)
+        self.top_n = top_n
+        self.trace_allocations = trace_allocations
+        self.traceback_frames = max(1, traceback_frames)
+        self._jobs: Set[str] = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tracemalloc_users = 0
+        self._owns_tracemalloc = False
+
+    @classmethod
+    def from_config(cls, config) -> "JobProfiler":
+        """
+        从性能分析配置创建分析器
+
+        Args:
+            config: ProfilingConfig
+
+        Returns:
+            JobProfiler: 性能分析器
+        """
+        return cls(
+            enabled=config.enabled,
+            output_dir=config.output_dir,
+            top_n=config.top_n,
+            trace_allocations=config.trace_allocations,
+            traceback_frames=config.traceback_frames
+        )
+
+    def enable(self, ppt_id: str) -> bool:
+        """
+        为任务开启性能分析(对之后开始的阶段生效)
+
+        Args:
+            ppt_id: PPT ID
+
+        Returns:
+            bool: 是否已开启(配置不允许时为False)
+        """
+        if not self.enabled:
+            return False
+        self._jobs.add(ppt_id)
+        logger.info(f"已为任务开启性能分析: {ppt_id}")
+        return True
+
+    def disable(self, ppt_id: str):
+        """关闭任务的性能分析(已保存的结果保留)"""
+        self._jobs.discard(ppt_id)
+
+    def is_enabled(self, ppt_id: str) -> bool:
+        """任务是否开启了性能分析"""
+        return ppt_id in self._jobs
+
+    def capture(self, ppt_id: Optional[str], stage: str):
+        """
+        采集一个阶段(with语句,在执行该阶段的线程中使用)
+
+        用于协程时,cProfile同时会记录期间在事件循环中运行的其他任务。
+
+        Args:
+            ppt_id: PPT ID
+            stage: 阶段名(用作结果文件名)
+
+        Returns:
+            上下文管理器(任务未开启分析时为空上下文)
+        """
+        if ppt_id not in self._jobs:
+            return _NULL_CAPTURE
+        return _Capture(self, ppt_id, stage)
+
+    def wrap(self, ppt_id: Optional[str], stage: str, fn: Callable[..., T]) -> Callable[..., T]:
+        """
+        包装同步函数,使其在执行线程中采集(任务未开启分析时原样返回)
+
+        Args:
+            ppt_id: PPT ID
+            stage: 阶段名
+            fn: 同步函数
+
+        Returns:
+            Callable: 函数
+        """
+        if ppt_id not in self._jobs:
+            return fn
+
+        @functools.wraps(fn)
+        def profiled(*args, **kwargs):
+            with self.capture(ppt_id, stage):
+                return fn(*args, **kwargs)
+
+        return profiled
+
+    def artifacts(self, ppt_id: str) -> List[str]:
+        """
+        列出任务的分析结果文件
+
+        Args:
+            ppt_id: PPT ID
+
+        Returns:
+            List[str]: 文件名列表
+        """
+        job_dir = self._job_dir(ppt_id)
+        if job_dir is None or not job_dir.is_dir():
+            return []
+        return sorted(path.name for path in job_dir.iterdir() if path.is_file())
+
+    def artifact_path(self, ppt_id: str, name: str) -> Optional[Path]:
+        """
+        获取分析结果文件路径(只接受artifacts中列出的文件名)
+
+        Args:
+            ppt_id: PPT ID
+            name: 文件名
+
+        Returns:
+            Optional[Path]: 文件路径,不存在时为None
+        """
+        if name not in self.artifacts(ppt_id):
+            return None
+        return self._job_dir(ppt_id) / name
+
+    def _job_dir(self, ppt_id: str) -> Optional[Path]:
+        """任务的分析结果目录(ID格式不合法或目录不在output_dir下时为None)"""
+        if not is_valid_ppt_id(ppt_id):
+            return None
+        root = self.output_dir.resolve()
+        job_dir = (root / ppt_id).resolve()
+        if job_dir.parent != root:
+            return None
+        return job_dir
+
+    def _start_tracemalloc(self):
+        with self._lock:
+            if self._tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(self.traceback_frames)
+                self._owns_tracemalloc = True
+            self._tracemalloc_users += 1
+
+    def _stop_tracemalloc(self):
+        with self._lock:
+            self._tracemalloc_users -= 1
+            if self._tracemalloc_users == 0 and self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+
+    def _save(
+        self,
+        ppt_id: str,
+        stage: str,
+        profile: Optional[cProfile.Profile],
+        snapshot: Optional[tracemalloc.Snapshot],
+        peak: int
+    ):
+        job_dir = self._job_dir(ppt_id)
+        if job_dir is None:
+            logger.warning(f"任务ID不合法,不保存性能分析结果: {ppt_id}")
+            return
+        job_dir.mkdir(parents=True, exist_ok=True)
+
+        if profile is not None:
+            profile.dump_stats(str(job_dir / f"{stage}.prof"))
+            buffer = io.StringIO()
+            stats = pstats.Stats(profile, stream=buffer)
+            stats.sort_stats("cumulative").print_stats(self.top_n)
+            (job_dir / f"{stage}_cpu.txt").write_text(buffer.getvalue(), encoding="utf-8")
+
+        if snapshot is not None:
+            lines = [f"tracemalloc峰值: {peak / 1024:.1f} KB(采集期间整个进程)", ""]
+            top = snapshot.filter_traces(_ALLOCATION_FILTERS).statistics("lineno")[:self.top_n]
+            for index, stat in enumerate(top, 1):
+                frame = stat.traceback[0]
+                lines.append(
+                    f"{index:>3}. {frame.filename}:{frame.lineno}  "
+                    f"{stat.size / 1024:.1f} KB  {stat.count} 个对象"
+                )
+            (job_dir / f"{stage}_alloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        logger.info(f"性能分析结果已保存: {job_dir}/{stage}")
+
+
+# 全局性能分析器实例
+_profiler: Optional[JobProfiler] = None
+
+
+def get_profiler() -> JobProfiler:
+    """获取全局性能分析器实例(单例模式)"""
+    global _profiler
+    if _profiler is None:
+        _profiler = JobProfiler.from_config(get_settings().profiling)
+    return _profiler
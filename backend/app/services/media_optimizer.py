@@ -0,0 +1,258 @@
+"""
+媒体压缩模块
+将PPT中的图片按实际显示尺寸降采样并重新压缩,合并内容相同的图片
+"""
+import hashlib
+import io
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, NamedTuple, Optional, Tuple
+from loguru import logger
+from PIL import Image
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+from app.utils.cancellation import CancelToken, check_cancelled
+
+# EMU -> 英寸
+_EMU_PER_INCH = 914400
+
+# 只处理以下格式(保持原格式,避免修改部件的内容类型)
+_SUPPORTED_FORMATS = {"JPEG", "PNG"}
+
+# 少于该数量的图片不启动进程池
+_PARALLEL_MIN_IMAGES = 4
+
+# 子进程以spawn方式启动: 压缩在多线程进程的工作线程中执行,fork出的子进程可能继承被其他线程持有的锁而死锁
+_POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+# 进程池常驻复用,避免每生成一份PPT都重新启动子进程
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+class MediaOptimizationStats(NamedTuple):
+    """媒体压缩统计"""
+    images: int  # 图片部件数
+    recompressed: int  # 重新压缩的图片数
+    deduplicated: int  # 合并的重复图片数
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+class _ImageJob(NamedTuple):
+    """单张图片的压缩任务(传入进程池)"""
+    blob: bytes
+    target_size: Tuple[int, int]  # 显示所需的最大像素尺寸
+    jpeg_quality: int
+    min_saving: float
+
+
+def recompress_image(job: _ImageJob) -> Optional[bytes]:
+    """
+    降采样并重新压缩单张图片(保持原格式)
+
+    Args:
+        job: 压缩任务
+
+    Returns:
+        Optional[bytes]: 新的图片数据,收益不足或格式不支持时为None
+    """
+    try:
+        with Image.open(io.BytesIO(job.blob)) as img:
+            fmt = img.format
+            if fmt not in _SUPPORTED_FORMATS or getattr(img, "is_animated", False):
+                return None
+
+            # 保持宽高比,缩放到宽、高都不低于显示所需的尺寸
+            target_w, target_h = job.target_size
+            scale = max(target_w / img.width, target_h / img.height)
+            if scale < 1:
+                size = (max(math.ceil(img.width * scale), 1), max(math.ceil(img.height * scale), 1))
+                img = img.resize(size, Image.LANCZOS)
+
+            save_kwargs = {"optimize": True}
+            for key in ("icc_profile", "exif", "dpi"):
+                if img.info.get(key):
+                    save_kwargs[key] = img.info[key]
+            if fmt == "JPEG":
+                save_kwargs["quality"] = job.jpeg_quality
+                if img.mode not in ("RGB", "L", "CMYK"):
+                    img = img.convert("RGB")
+
+            out = io.BytesIO()
+            img.save(out, format=fmt, **save_kwargs)
+    except Exception:
+        return None
+
+    data = out.getvalue()
+    if len(data) > len(job.blob) * (1 - job.min_saving):
+        return None
+    return data
+
+
+class MediaOptimizer:
+    """媒体压缩器"""
+
+    def __init__(
+        self,
+        target_dpi: int = 150,
+        jpeg_quality: int = 80,
+        min_saving: float = 0.1,
+        max_workers: Optional[int] = None
+    ):
+        """
+        初始化媒体压缩器
+
+        Args:
+            target_dpi: 按显示尺寸计算目标像素时使用的DPI
+            jpeg_quality: JPEG压缩质量(1-95)
+            min_saving: 压缩收益低于该比例时保留原图
+            max_workers: 进程池大小,0表示不使用进程池
+        """
+        self.target_dpi = target_dpi
+        self.jpeg_quality = jpeg_quality
+        self.min_saving = min_saving
+        self.max_workers = max_workers
+
+    def optimize(self, prs, cancel_token: Optional[CancelToken] = None) -> MediaOptimizationStats:
+        """
+        压缩演示文稿中的图片(原地修改)
+
+        1. 内容相同的图片部件合并为一个
+        2. 每个图片部件按其所有引用中的最大显示尺寸降采样并重新压缩
+
+        Args:
+            prs: Presentation对象
+            cancel_token: 取消令牌(每压缩完一张图片检查一次,取消时放弃未开始的压缩任务)
+
+        Returns:
+            MediaOptimizationStats: 压缩统计
+        """
+        pictures = list(self._iter_pictures(prs))
+
+        # 按内容哈希合并重复图片
+        canonical: Dict[str, object] = {}
+        deduplicated: Dict[str, int] = {}  # 被合并的部件名 -> 字节数
+        for slide, picture in pictures:
+            rId = picture._element.blip_rId
+            image_part = slide.part.rels[rId].target_part
+            digest = hashlib.sha1(image_part.blob).hexdigest()
+            target = canonical.setdefault(digest, image_part)
+            if target is not image_part:
+                new_rId = slide.part.relate_to(target, RT.IMAGE)
+                picture._element.blipFill.blip.rEmbed = new_rId
+                slide.part.drop_rel(rId)
+                deduplicated[image_part.partname] = len(image_part.blob)
+
+        # 每个图片部件所需的最大像素尺寸
+        extents: Dict[str, Tuple[int, int]] = {}
+        for slide, picture in pictures:
+            image_part = slide.part.rels[picture._element.blip_rId].target_part
+            width, height = self._display_pixels(picture)
+            current = extents.get(image_part.partname, (0, 0))
+            extents[image_part.partname] = (max(current[0], width), max(current[1], height))
+
+        parts = list(canonical.values())
+        bytes_before = sum(len(part.blob) for part in parts) + sum(deduplicated.values())
+        jobs = [
+            _ImageJob(part.blob, extents[part.partname], self.jpeg_quality, self.min_saving)
+            for part in parts
+        ]
+
+        results = None
+        if self.max_workers != 0 and len(jobs) >= _PARALLEL_MIN_IMAGES:
+            try:
+                results = self._recompress_in_pool(jobs, cancel_token)
+            except BrokenProcessPool:
+                # 子进程异常退出: 丢弃进程池,本次在当前线程压缩
+                logger.warning("媒体压缩进程池不可用,改为在当前线程压缩")
+                shutdown_media_pool()
+        if results is None:
+            results = []
+            for job in jobs:
+                results.append(recompress_image(job))
+                check_cancelled(cancel_token)
+
+        recompressed = 0
+        for part, data in zip(parts, results):
+            if data is not None:
+                part._blob = data
+                recompressed += 1
+
+        stats = MediaOptimizationStats(
+            images=len(parts) + len(deduplicated),
+            recompressed=recompressed,
+            deduplicated=len(deduplicated),
+            bytes_before=bytes_before,
+            bytes_after=sum(len(part.blob) for part in parts)
+        )
+        logger.info(
+            f"媒体压缩完成: 图片 {stats.images} 张, 重新压缩 {stats.recompressed} 张, "
+            f"合并重复 {stats.deduplicated} 张, 节省 {stats.bytes_saved} 字节"
+        )
+        return stats
+
+    def _recompress_in_pool(self, jobs, cancel_token: Optional[CancelToken]) -> list:
+        """在常驻进程池中压缩图片(取消时放弃未开始的任务)"""
+        futures = [_get_pool(self.max_workers).submit(recompress_image, job) for job in jobs]
+        try:
+            results = []
+            for future in futures:
+                results.append(future.result())
+                check_cancelled(cancel_token)
+            return results
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _iter_pictures(self, prs):
+        """遍历所有页面中嵌入的图片形状(含组合形状内部和图片占位符)"""
+        for slide in prs.slides:
+            stack = list(slide.shapes)
+            while stack:
+                shape = stack.pop()
+                if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+                    stack.extend(shape.shapes)
+                elif shape._element.tag == qn("p:pic") and shape._element.blip_rId:
+                    yield slide, shape
+
+    def _display_pixels(self, picture) -> Tuple[int, int]:
+        """图片完整尺寸(考虑裁剪)在目标DPI下对应的像素"""
+        visible_w = max(1.0 - picture.crop_left - picture.crop_right, 0.01)
+        visible_h = max(1.0 - picture.crop_top - picture.crop_bottom, 0.01)
+        width = (picture.width or 0) / visible_w / _EMU_PER_INCH * self.target_dpi
+        height = (picture.height or 0) / visible_h / _EMU_PER_INCH * self.target_dpi
+        return int(round(width)), int(round(height))
+
+
+def _get_pool(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    """获取常驻的媒体压缩进程池(进程数变化时重建)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=_POOL_CONTEXT)
+            _pool_workers = max_workers
+        return _pool
+
+
+def shutdown_media_pool():
+    """关闭媒体压缩进程池(应用关闭时调用)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+        _pool_workers = None
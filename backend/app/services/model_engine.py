@@ -18,6 +18,13 @@ from app.models.schemas import (
     Priority
 )
 from app.core.config import ModelConfig
+from app.services.prompt_renderer import estimate_tokens, get_deck_digest, fit_slide_table, table_legend
+from app.services.tracing import get_tracer
+from app.utils.log_sampling import LogSampler
+
+
+# 模型原始响应日志的采样器(按模型名限流)
+_response_log = LogSampler()
 
 
 class BaseModelClient(ABC):
@@ -34,6 +41,11 @@ class BaseModelClient(ABC):
         self.name = config.name
         self.enabled = config.enabled
 
+        # 提示词token统计
+        self.call_count = 0
+        self.last_prompt_tokens = 0
+        self.total_prompt_tokens = 0
+
     @abstractmethod
     async def analyze_ppt(self, ppt_data: PPTParseResult) -> ModelSuggestion:
         """
@@ -74,17 +86,131 @@ class BaseModelClient(ABC):
         """
         pass
 
+    def _prepare_prompt(self, ppt_data: PPTParseResult) -> str:
+        """
+        构建提示词并记录token用量
+
+        Args:
+            ppt_data: PPT解析数据
+
+        Returns:
+            str: 提示词
+        """
+        prompt = self._build_prompt(ppt_data)
+        self._record_prompt(prompt, ppt_data.ppt_id)
+        return prompt
+
+    def _record_prompt(self, prompt: str, ppt_id: str) -> int:
+        """记录单次调用的提示词token用量"""
+        tokens = estimate_tokens(prompt)
+
+        self.call_count += 1
+        self.last_prompt_tokens = tokens
+        self.total_prompt_tokens += tokens
+
+        logger.info(f"{self.name} 提示词: {ppt_id}, 约 {tokens} tokens")
+        if tokens > self.config.max_prompt_tokens:
+            logger.warning(f"{self.name} 提示词超出预算: {tokens} > {self.config.max_prompt_tokens}")
+
+        return tokens
+
+    async def run_prompt(self, prompt: str, ppt_id: str) -> ModelSuggestion:
+        """
+        发送自定义提示词并解析为标准建议(供迭代修正工作流使用)
+
+        Args:
+            prompt: 提示词
+            ppt_id: PPT ID
+
+        Returns:
+            ModelSuggestion: 标准化建议
+        """
+        tokens = self._record_prompt(prompt, ppt_id)
+        response = await self._call_api(prompt, ppt_id, tokens)
+        return self._parse_response(response, ppt_id)
+
+    async def complete(self, prompt: str, ppt_id: str) -> str:
+        """
+        发送提示词并返回模型输出的原始文本(供冲突仲裁等结构化请求使用)
+
+        Args:
+            prompt: 提示词
+            ppt_id: PPT ID
+
+        Returns:
+            str: 模型输出文本
+        """
+        tokens = self._record_prompt(prompt, ppt_id)
+        response = await self._call_api(prompt, ppt_id, tokens)
+        return self._response_text(response)
+
+    def _response_text(self, response: Dict[str, Any]) -> str:
+        """从API响应中提取模型输出文本(默认为choices格式)"""
+        return response.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+    def _render_slides(
+        self,
+        ppt_data: PPTParseResult,
+        fixed_text: str,
+        columns,
+        content_limit: int = 200,
+        max_slides: int = None
+    ) -> str:
+        """
+        将幻灯片渲染为紧凑表格,表格占用的token不超过剩余预算
+
+        Args:
+            ppt_data: PPT解析数据
+            fixed_text: 提示词中的固定部分(用于扣除预算)
+            columns: 表格列
+            content_limit: 每页内容的最大字符数
+            max_slides: 最多输出的页数
+
+        Returns:
+            str: 含列说明的表格文本
+        """
+        legend = f"每行一页，列: {table_legend(columns)}\n"
+        budget = self.config.max_prompt_tokens - estimate_tokens(fixed_text) - estimate_tokens(legend)
+        table = fit_slide_table(
+            get_deck_digest(ppt_data, fonts="font" in columns),
+            budget,
+            columns=columns,
+            content_limit=content_limit,
+            max_slides=max_slides,
+            index_base=1
+        )
+        return legend + table.text
+
+    async def _call_api(self, prompt: str, ppt_id: Optional[str] = None, prompt_tokens: int = 0) -> Dict[str, Any]:
+        """
+        调用模型API(带重试),记录调用耗时、重试次数和token数
+
+        Args:
+            prompt: 提示词
+            ppt_id: PPT ID
+            prompt_tokens: 提示词token数
+
+        Returns:
+            Dict: API响应
+        """
+        with get_tracer().provider_span(ppt_id, self.name, prompt_tokens) as span:
+            response = await self._call_api_with_retry(prompt, span)
+            span.usage(response)
+            return response
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    async def _call_api(self, prompt: str) -> Dict[str, Any]:
+    async def _call_api_with_retry(self, prompt: str, span) -> Dict[str, Any]:
         """
-        调用模型API(带重试)
+        调用模型API(每次尝试计入调用区间)
 
         Args:
             prompt: 提示词
+            span: 模型调用区间
 
         Returns:
             Dict: API响应
         """
+        span.attempt()
         async with httpx.AsyncClient(timeout=self.config.timeout) as client:
             response = await self._make_request(client, prompt)
             return response
@@ -117,10 +243,10 @@ class XunfeiModelClient(BaseModelClient):
             logger.info(f"讯飞星火开始分析PPT: {ppt_data.ppt_id}")
 
             # 构建提示词
-            prompt = self._build_prompt(ppt_data)
+            prompt = self._prepare_prompt(ppt_data)
 
             # 调用API
-            response = await self._call_api(prompt)
+            response = await self._call_api(prompt, ppt_data.ppt_id, self.last_prompt_tokens)
 
             # 解析响应
             suggestion = self._parse_response(response, ppt_data.ppt_id)
@@ -134,39 +260,39 @@ class XunfeiModelClient(BaseModelClient):
 
     def _build_prompt(self, ppt_data: PPTParseResult) -> str:
         """构建提示词"""
-        # 构建PPT描述
-        ppt_desc = f"PPT文件名: {ppt_data.filename}\n"
-        ppt_desc += f"总页数: {ppt_data.total_slides}\n\n"
-
-        # 添加每页内容
-        for slide in ppt_data.slides:
-            ppt_desc += f"第{slide.slide_index + 1}页 ({slide.slide_type}):\n"
-            ppt_desc += f"内容: {slide.content[:200]}...\n"  # 限制长度
-            ppt_desc += f"版式: {slide.layout_info.layout_type}\n\n"
+        header = f"""你是一个专业的PPT优化助手。请分析以下PPT内容,从内容、逻辑、排版、配色、字体、图表等维度提供优化建议。
 
-        # 构建完整提示词
-        prompt = f"""你是一个专业的PPT优化助手。请分析以下PPT内容,从内容、逻辑、排版、配色、字体、图表等维度提供优化建议。
+PPT文件名: {ppt_data.filename}
+总页数: {ppt_data.total_slides}
 
-{ppt_desc}
+"""
+        footer = """
 
 请以JSON格式返回优化建议,格式如下:
-{{
+{
   "suggestions": [
-    {{
+    {
       "slide_index": 0,
       "optimization_dimension": "layout",
       "original_content": "原始内容描述",
       "suggestion": "具体优化建议",
       "reason": "建议理由",
       "priority": "recommend"
-    }}
+    }
   ]
-}}
+}
 
 优化维度可选值: content, logic, layout, color, font, chart
 优先级可选值: must, recommend, optional
 """
-        return prompt
+        # 添加每页内容
+        slides_table = self._render_slides(
+            ppt_data,
+            header + footer,
+            columns=("index", "type", "layout", "content"),
+            content_limit=200
+        )
+        return "".join([header, slides_table, footer])
 
     async def _make_request(self, client: httpx.AsyncClient, prompt: str) -> Dict[str, Any]:
         """发起HTTP请求"""
@@ -243,8 +369,8 @@ class WenxinModelClient(BaseModelClient):
         """分析PPT并返回优化建议"""
         try:
             logger.info(f"文心一言开始分析PPT: {ppt_data.ppt_id}")
-            prompt = self._build_prompt(ppt_data)
-            response = await self._call_api(prompt)
+            prompt = self._prepare_prompt(ppt_data)
+            response = await self._call_api(prompt, ppt_data.ppt_id, self.last_prompt_tokens)
             suggestion = self._parse_response(response, ppt_data.ppt_id)
             logger.info(f"文心一言分析完成: {ppt_data.ppt_id}")
             return suggestion
@@ -254,22 +380,23 @@ class WenxinModelClient(BaseModelClient):
 
     def _build_prompt(self, ppt_data: PPTParseResult) -> str:
         """构建提示词(侧重排版和配色)"""
-        prompt = f"""作为PPT设计专家,请重点分析以下PPT的排版、配色、字体设计,提供专业的优化建议。
+        header = f"""作为PPT设计专家,请重点分析以下PPT的排版、配色、字体设计,提供专业的优化建议。
 
 PPT基本信息:
 - 文件名: {ppt_data.filename}
 - 总页数: {ppt_data.total_slides}
 
 """
-        for slide in ppt_data.slides[:5]:  # 限制前5页
-            prompt += f"\n第{slide.slide_index + 1}页:\n"
-            prompt += f"类型: {slide.slide_type}\n"
-            prompt += f"版式: {slide.layout_info.layout_type}\n"
-            if slide.style_info.font_name:
-                prompt += f"字体: {slide.style_info.font_name}\n"
-
-        prompt += "\n请以JSON格式返回优化建议,重点关注layout、color、font维度。"
-        return prompt
+        footer = "\n\n请以JSON格式返回优化建议,重点关注layout、color、font维度。"
+
+        # 限制前5页
+        slides_table = self._render_slides(
+            ppt_data,
+            header + footer,
+            columns=("index", "type", "layout", "font"),
+            max_slides=5
+        )
+        return "".join([header, slides_table, footer])
 
     async def _make_request(self, client: httpx.AsyncClient, prompt: str) -> Dict[str, Any]:
         """发起HTTP请求"""
@@ -291,6 +418,10 @@ PPT基本信息:
         response.raise_for_status()
         return response.json()
 
+    def _response_text(self, response: Dict[str, Any]) -> str:
+        """从API响应中提取模型输出文本"""
+        return response.get("result", "")
+
     def _parse_response(self, response: Dict[str, Any], ppt_id: str) -> ModelSuggestion:
         """解析响应"""
         # 类似讯飞星火的解析逻辑
@@ -338,8 +469,8 @@ class QianwenModelClient(BaseModelClient):
         """分析PPT(侧重内容逻辑和图表)"""
         try:
             logger.info(f"通义千问开始分析PPT: {ppt_data.ppt_id}")
-            prompt = self._build_prompt(ppt_data)
-            response = await self._call_api(prompt)
+            prompt = self._prepare_prompt(ppt_data)
+            response = await self._call_api(prompt, ppt_data.ppt_id, self.last_prompt_tokens)
             suggestion = self._parse_response(response, ppt_data.ppt_id)
             logger.info(f"通义千问分析完成: {ppt_data.ppt_id}")
             return suggestion
@@ -349,18 +480,14 @@ class QianwenModelClient(BaseModelClient):
 
     def _build_prompt(self, ppt_data: PPTParseResult) -> str:
         """构建提示词(侧重内容逻辑)"""
-
-        # 提取前5页的内容概要
-        slides_summary = ""
-        for idx, slide in enumerate(ppt_data.slides[:5]):
-            slides_summary += f"\n第{idx+1}页 ({slide.slide_type}):\n{slide.content[:200]}\n"
-
-        prompt = f"""你是一位专业的PPT优化专家。请分析以下PPT并提供优化建议。
+        header = f"""你是一位专业的PPT优化专家。请分析以下PPT并提供优化建议。
 
 PPT信息:
 - 文件名: {ppt_data.filename}
 - 总页数: {ppt_data.total_slides}页
-- 前5页内容概要:{slides_summary}
+- 前5页内容概要:
+"""
+        footer = """
 
 请重点分析:
 1. 内容的逻辑性和完整性
@@ -370,18 +497,18 @@ PPT信息:
 
 请必须按照以下JSON格式返回优化建议(只返回JSON，不要其他文字):
 
-{{
+{
   "suggestions": [
-    {{
+    {
       "slide_index": 1,
       "optimization_dimension": "content",
       "original_content": "原始内容片段",
       "suggestion": "具体的优化建议",
       "reason": "为什么需要优化",
       "priority": "recommend"
-    }}
+    }
   ]
-}}
+}
 
 注意:
 - optimization_dimension可选: content(内容), logic(逻辑), layout(版式), color(配色), font(字体), chart(图表)
@@ -389,7 +516,16 @@ PPT信息:
 - 请至少提供3-5条具体的优化建议
 - 只返回JSON格式，不要包含其他解释性文字
 """
-        return prompt
+
+        # 提取前5页的内容概要
+        slides_table = self._render_slides(
+            ppt_data,
+            header + footer,
+            columns=("index", "type", "content"),
+            content_limit=200,
+            max_slides=5
+        )
+        return "".join([header, slides_table, footer])
 
     async def _make_request(self, client: httpx.AsyncClient, prompt: str) -> Dict[str, Any]:
         """发起HTTP请求"""
@@ -411,6 +547,10 @@ PPT信息:
         response.raise_for_status()
         return response.json()
 
+    def _response_text(self, response: Dict[str, Any]) -> str:
+        """从API响应中提取模型输出文本"""
+        return response.get("output", {}).get("text", "")
+
     def _parse_response(self, response: Dict[str, Any], ppt_id: str) -> ModelSuggestion:
         """解析响应"""
         try:
@@ -427,7 +567,8 @@ PPT信息:
                     content = content[:-3]
                 content = content.strip()
 
-            logger.debug(f"通义千问原始响应内容: {content[:500]}")
+            if _response_log.take(self.name) is not None:
+                logger.debug(f"通义千问原始响应内容: {str(content)[:500]}")
 
             data = json.loads(content) if isinstance(content, str) else content
             suggestions_data = data.get("suggestions", [])
@@ -473,8 +614,8 @@ class HunyuanModelClient(BaseModelClient):
         """分析PPT(全维度融合)"""
         try:
             logger.info(f"腾讯混元开始分析PPT: {ppt_data.ppt_id}")
-            prompt = self._build_prompt(ppt_data)
-            response = await self._call_api(prompt)
+            prompt = self._prepare_prompt(ppt_data)
+            response = await self._call_api(prompt, ppt_data.ppt_id, self.last_prompt_tokens)
             suggestion = self._parse_response(response, ppt_data.ppt_id)
             logger.info(f"腾讯混元分析完成: {ppt_data.ppt_id}")
             return suggestion
@@ -484,18 +625,14 @@ class HunyuanModelClient(BaseModelClient):
 
     def _build_prompt(self, ppt_data: PPTParseResult) -> str:
         """构建提示词"""
-
-        # 提取前5页的内容概要
-        slides_summary = ""
-        for idx, slide in enumerate(ppt_data.slides[:5]):
-            slides_summary += f"\n第{idx+1}页 ({slide.slide_type}):\n{slide.content[:200]}\n"
-
-        prompt = f"""你是一位资深的PPT综合优化专家。请全面分析以下PPT并提供专业的优化建议。
+        header = f"""你是一位资深的PPT综合优化专家。请全面分析以下PPT并提供专业的优化建议。
 
 PPT信息:
 - 文件名: {ppt_data.filename}
 - 总页数: {ppt_data.total_slides}页
-- 前5页内容概要:{slides_summary}
+- 前5页内容概要:
+"""
+        footer = f"""
 
 请从以下多个维度进行全面分析:
 1. 内容质量和逻辑结构
@@ -527,7 +664,16 @@ PPT信息:
 - 请提供5-10条切实可行的优化建议
 - 必须只返回纯JSON，不要添加markdown标记或其他文字
 """
-        return prompt
+
+        # 提取前5页的内容概要
+        slides_table = self._render_slides(
+            ppt_data,
+            header + footer,
+            columns=("index", "type", "content"),
+            content_limit=200,
+            max_slides=5
+        )
+        return "".join([header, slides_table, footer])
 
     async def _make_request(self, client: httpx.AsyncClient, prompt: str) -> Dict[str, Any]:
         """发起HTTP请求"""
@@ -563,7 +709,8 @@ PPT信息:
                     content = content[:-3]
                 content = content.strip()
 
-            logger.debug(f"腾讯混元原始响应内容: {content[:500]}")
+            if _response_log.take(self.name) is not None:
+                logger.debug(f"腾讯混元原始响应内容: {str(content)[:500]}")
 
             data = json.loads(content) if isinstance(content, str) else content
             suggestions_data = data.get("suggestions", [])
@@ -673,6 +820,22 @@ class ModelEngine:
         logger.info(f"并行分析完成,共收到 {len(suggestions)} 个模型的建议")
         return suggestions
 
+    def prompt_usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取各模型的提示词token用量
+
+        Returns:
+            Dict: 模型名 -> 调用次数/最近一次/累计提示词token数
+        """
+        return {
+            name: {
+                "calls": client.call_count,
+                "last_prompt_tokens": client.last_prompt_tokens,
+                "total_prompt_tokens": client.total_prompt_tokens
+            }
+            for name, client in self.clients.items()
+        }
+
     async def _safe_analyze(
         self,
         client: BaseModelClient,
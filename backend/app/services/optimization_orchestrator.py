@@ -3,7 +3,7 @@
 协调内容分析、用户编辑和模型优化的整个流程
 """
 import asyncio
-from typing import Dict, Any, Tuple, List
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Any, Tuple, List, Optional
 from datetime import datetime
 from loguru import logger
 
@@ -24,71 +24,194 @@ from app.services.content_analyzer import ContentAnalyzer
 from app.services.model_engine import ModelEngine
 from app.services.iteration_corrector import IterationCorrector
 from app.services.ppt_generator import PPTGenerator
+from app.services.media_optimizer import MediaOptimizer
 from app.services.change_tracker import ChangeTracker
-from app.core.config import IterationConfig, ConflictResolutionConfig
+from app.services.tracing import get_tracer, GENERATION, CHANGE_TRACKING
+from app.utils.single_flight import SingleFlight
+from app.utils.cancellation import JobCancelled, run_cancellable
+from app.core.config import ConfigSnapshot
+
+if TYPE_CHECKING:
+    from app.services.ppt_parser import SlideStream
+
+
+# 第一阶段分析的进程内单飞: (内容哈希, 分析配置指纹) -> 进行中的分析
+_phase1_flight: SingleFlight[ContentAnalysisResult] = SingleFlight()
 
 
 class OptimizationOrchestrator:
     """优化编排器 - 协调两阶段优化流程"""
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, snapshot: ConfigSnapshot):
         """
         初始化优化编排器
 
         Args:
-            config: 系统配置
+            snapshot: 配置快照(编排器在整个生命周期内使用该快照)
         """
-        self.config = config
-
-        # 从配置字典创建配置对象
-        iteration_config = IterationConfig(**config.get('iteration', {}))
-        conflict_config = ConflictResolutionConfig(**config.get('conflict_resolution', {}))
+        self.snapshot = snapshot
+        settings = snapshot.settings
+        media_config = settings.media_optimization
+        tracking_config = settings.change_tracking
 
         # 初始化各个服务
-        self.content_analyzer = ContentAnalyzer(config)
-        self.model_engine = ModelEngine(config)
-        self.iteration_corrector = IterationCorrector(iteration_config, conflict_config)
-        self.ppt_generator = PPTGenerator()
-        self.change_tracker = ChangeTracker()
+        self.content_analyzer = ContentAnalyzer(snapshot.analyzer)
+        self.model_engine = ModelEngine(settings.models)
+        self.iteration_corrector = IterationCorrector(
+            settings.iteration,
+            settings.conflict_resolution,
+            self.model_engine
+        )
+        media_optimizer = None
+        if media_config.enabled:
+            media_optimizer = MediaOptimizer(
+                target_dpi=media_config.target_dpi,
+                jpeg_quality=media_config.jpeg_quality,
+                min_saving=media_config.min_saving,
+                max_workers=media_config.max_workers
+            )
+        self.ppt_generator = PPTGenerator(media_optimizer=media_optimizer)
+        self.change_tracker = ChangeTracker(
+            xml_diff=tracking_config.xml_diff,
+            diff_workers=tracking_config.diff_workers
+        )
 
-        logger.info("优化编排器初始化完成")
+        logger.info(f"优化编排器初始化完成,配置快照版本: {snapshot.version}")
+
+    @property
+    def streams_analysis(self) -> bool:
+        """内容分析是否分段进行(可以在解析的同时开始分析)"""
+        return self.content_analyzer.section_size > 0
 
     async def execute_phase1_analysis(
         self,
-        ppt_data: PPTParseResult
+        ppt_data: PPTParseResult,
+        content_hash: Optional[str] = None
     ) -> ContentAnalysisResult:
         """
         执行第一阶段：内容分析
 
+        提供content_hash时,内容和分析配置都相同的并发任务合并为一次分析,
+        每个任务得到带有自己ppt_id的结果副本。
+
         Args:
             ppt_data: PPT解析结果
+            content_hash: 原始文件的内容哈希
+
+        Returns:
+            ContentAnalysisResult: 内容分析结果
+        """
+        return await self._run_phase1(
+            ppt_data.ppt_id,
+            content_hash,
+            lambda: self.content_analyzer.analyze_content(ppt_data)
+        )
+
+    async def execute_phase1_streaming(
+        self,
+        stream: "SlideStream",
+        content_hash: Optional[str] = None
+    ) -> ContentAnalysisResult:
+        """
+        执行第一阶段：内容分析(边解析边分析)
+
+        已解析的分段先提交给模型,与后续页面的解析重叠。合并到进行中的相同分析时不读取幻灯片流,
+        解析仍由调用方等待完成。
+
+        Args:
+            stream: 已开始解析的幻灯片流
+            content_hash: 原始文件的内容哈希
 
         Returns:
             ContentAnalysisResult: 内容分析结果
         """
-        logger.info(f"执行第一阶段 - 内容分析: {ppt_data.ppt_id}")
+        return await self._run_phase1(
+            stream.ppt_id,
+            content_hash,
+            lambda: self.content_analyzer.analyze_stream(stream)
+        )
+
+    async def _run_phase1(
+        self,
+        ppt_id: str,
+        content_hash: Optional[str],
+        analyze: Callable[[], Awaitable[ContentAnalysisResult]]
+    ) -> ContentAnalysisResult:
+        logger.info(f"执行第一阶段 - 内容分析: {ppt_id}")
 
         try:
             # 调用内容分析器
-            analysis_result = await self.content_analyzer.analyze_content(ppt_data)
+            if content_hash is None:
+                analysis_result = await analyze()
+            else:
+                key = (content_hash, self.content_analyzer.settings_fingerprint)
+                try:
+                    shared_result, joined = await _phase1_flight.do(key, analyze)
+                except JobCancelled:
+                    # 合并到的边解析边分析随发起任务的取消而中止(本任务未被取消),改为自行分析
+                    logger.info(f"合并的分析已随其任务取消,重新分析: {ppt_id}")
+                    shared_result, joined = await analyze(), False
+                if joined:
+                    logger.info(f"合并到进行中的相同分析: {ppt_id}")
+                analysis_result = shared_result.copy(update={"ppt_id": ppt_id}, deep=True)
 
             logger.info(
-                f"第一阶段完成: {ppt_data.ppt_id}, "
+                f"第一阶段完成: {ppt_id}, "
                 f"识别 {len(analysis_result.optimization_opportunities)} 个优化机会"
             )
 
             return analysis_result
 
         except Exception as e:
-            logger.error(f"第一阶段执行失败: {ppt_data.ppt_id}, 错误: {str(e)}")
+            logger.error(f"第一阶段执行失败: {ppt_id}, 错误: {str(e)}")
             raise
 
+    def build_final_plan(
+        self,
+        ppt_data: PPTParseResult,
+        user_edits: UserEditRequest,
+        content_analysis: ContentAnalysisResult
+    ) -> FinalOptimizationPlan:
+        """
+        根据用户批准的优化机会构建最终优化方案
+
+        Args:
+            ppt_data: PPT解析结果
+            user_edits: 用户编辑请求
+            content_analysis: 内容分析结果
+
+        Returns:
+            FinalOptimizationPlan: 最终优化方案
+        """
+        # 将用户批准的优化机会转换为优化建议
+        optimization_suggestions = self._convert_opportunities_to_suggestions(
+            user_edits.modified_opportunities,
+            content_analysis
+        )
+        logger.info(f"转换了 {len(optimization_suggestions)} 条优化建议")
+
+        # 创建模拟的FinalOptimizationPlan（跳过模型分析和迭代修正）
+        return FinalOptimizationPlan(
+            ppt_id=ppt_data.ppt_id,
+            suggestions=optimization_suggestions,
+            iteration_history=[],
+            conflicts=[],
+            resolutions=[],
+            conflict_rate=0.0,
+            metadata={
+                "source": "user_approved_opportunities",
+                "user_preferences": user_edits.preferences.dict() if user_edits.preferences else {},
+                "additional_instructions": user_edits.additional_instructions
+            }
+        )
+
     async def execute_phase2_optimization(
         self,
         original_ppt_path: str,
         ppt_data: PPTParseResult,
         user_edits: UserEditRequest,
-        content_analysis: ContentAnalysisResult
+        content_analysis: ContentAnalysisResult,
+        final_plan: Optional[FinalOptimizationPlan] = None
     ) -> Tuple[PPTGenerateResult, ChangeTrackingReport]:
         """
         执行第二阶段：基于用户编辑的优化
@@ -98,6 +221,7 @@ class OptimizationOrchestrator:
             ppt_data: PPT解析结果
             user_edits: 用户编辑请求
             content_analysis: 内容分析结果
+            final_plan: 已构建的优化方案（从检查点恢复时传入，默认根据用户编辑构建）
 
         Returns:
             Tuple[PPTGenerateResult, ChangeTrackingReport]: PPT生成结果和修改追踪报告
@@ -105,44 +229,32 @@ class OptimizationOrchestrator:
         logger.info(f"执行第二阶段 - 模型优化: {ppt_data.ppt_id}")
 
         try:
-            # 1. 将用户批准的优化机会转换为优化建议
-            optimization_suggestions = self._convert_opportunities_to_suggestions(
-                user_edits.modified_opportunities,
-                content_analysis
-            )
-            logger.info(f"转换了 {len(optimization_suggestions)} 条优化建议")
-
-            # 2. 创建模拟的FinalOptimizationPlan（跳过模型分析和迭代修正）
-            final_plan = FinalOptimizationPlan(
-                ppt_id=ppt_data.ppt_id,
-                suggestions=optimization_suggestions,
-                iteration_history=[],
-                conflicts=[],
-                resolutions=[],
-                conflict_rate=0.0,
-                metadata={
-                    "source": "user_approved_opportunities",
-                    "user_preferences": user_edits.preferences.dict() if user_edits.preferences else {},
-                    "additional_instructions": user_edits.additional_instructions
-                }
-            )
+            # 1-2. 构建优化方案
+            if final_plan is None:
+                final_plan = self.build_final_plan(ppt_data, user_edits, content_analysis)
+
+            tracer = get_tracer()
 
             # 3. 生成PPT
-            generate_result = await self.ppt_generator.generate(
-                original_ppt_path,
-                ppt_data,
-                final_plan
-            )
+            async with tracer.span(ppt_data.ppt_id, GENERATION, suggestions=len(final_plan.suggestions)):
+                generate_result = await self.ppt_generator.generate(
+                    original_ppt_path,
+                    ppt_data,
+                    final_plan
+                )
             logger.info(f"PPT生成完成: {generate_result.output_filename}")
 
-            # 4. 生成修改追踪报告
-            change_report = self.change_tracker.generate_report(
-                ppt_data,
-                content_analysis,
-                user_edits,
-                final_plan,
-                generate_result
-            )
+            # 4. 生成修改追踪报告（XML比较在线程中执行）
+            async with tracer.span(ppt_data.ppt_id, CHANGE_TRACKING):
+                change_report = await run_cancellable(
+                    self.change_tracker.generate_report,
+                    ppt_data,
+                    content_analysis,
+                    user_edits,
+                    final_plan,
+                    generate_result,
+                    original_ppt_path
+                )
             logger.info(f"修改追踪报告生成完成，总修改数: {change_report.total_changes}")
 
             logger.info(f"第二阶段完成: {ppt_data.ppt_id}")
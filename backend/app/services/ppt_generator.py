@@ -15,18 +15,23 @@ from app.models.schemas import (
     PPTGenerateResult,
     OptimizationDimension
 )
+from app.services.job_profiler import get_profiler
+from app.services.media_optimizer import MediaOptimizer
+from app.utils.cancellation import CancelToken, JobCancelled, check_cancelled, run_cancellable
 
 
 class PPTGenerator:
     """PPT生成器类"""
 
-    def __init__(self, output_dir: str = "./outputs"):
+    def __init__(self, output_dir: str = "./outputs", media_optimizer: Optional[MediaOptimizer] = None):
         """
         初始化生成器
 
         Args:
             output_dir: 输出目录
+            media_optimizer: 媒体压缩器(为None时不压缩图片)
         """
+        self.media_optimizer = media_optimizer
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         logger.info(f"PPT生成器初始化,输出目录: {self.output_dir}")
@@ -87,6 +92,28 @@ class PPTGenerator:
             ppt_data: PPT数据
             plan: 优化方案
 
+        Returns:
+            PPTGenerateResult: 生成结果
+        """
+        # 打开、修改和保存PPT都是同步工作,放到线程中执行(任务取消时在检查点退出)
+        return await run_cancellable(self._build_presentation, original_path, ppt_data, plan)
+
+    def _build_presentation(
+        self,
+        original_path: str,
+        ppt_data: PPTParseResult,
+        plan: FinalOptimizationPlan,
+        cancel_token: Optional[CancelToken] = None
+    ) -> PPTGenerateResult:
+        """
+        应用优化方案并保存PPT(在线程中执行)
+
+        Args:
+            original_path: 原始PPT路径
+            ppt_data: PPT数据
+            plan: 优化方案
+            cancel_token: 取消令牌
+
         Returns:
             PPTGenerateResult: 生成结果
         """
@@ -94,11 +121,28 @@ class PPTGenerator:
         prs = Presentation(original_path)
 
         # 应用优化建议
-        self._apply_optimizations(prs, plan)
+        get_profiler().wrap(plan.ppt_id, "apply_optimizations", self._apply_optimizations)(prs, plan, cancel_token)
+
+        # 压缩图片
+        metadata = {}
+        if self.media_optimizer is not None:
+            check_cancelled(cancel_token)
+            try:
+                stats = self.media_optimizer.optimize(prs, cancel_token)
+                metadata["media_optimization"] = dict(stats._asdict(), bytes_saved=stats.bytes_saved)
+            except JobCancelled:
+                raise
+            except Exception as e:
+                logger.warning(f"媒体压缩失败,保留原图: {str(e)}")
 
         # 保存新PPT
-        output_filename = f"optimized_{ppt_data.filename}"
-        output_path = self.output_dir / output_filename
+        check_cancelled(cancel_token)
+        # 文件名只用于展示和下载;输出路径以ppt_id为前缀,同名PPT之间不会互相覆盖
+        display_name = ppt_data.filename
+        if display_name.startswith(f"{plan.ppt_id}_"):
+            display_name = display_name[len(plan.ppt_id) + 1:]
+        output_filename = f"optimized_{display_name}"
+        output_path = self.output_dir / f"{plan.ppt_id}_{output_filename}"
         prs.save(str(output_path))
 
         return PPTGenerateResult(
@@ -106,16 +150,23 @@ class PPTGenerator:
             output_filename=output_filename,
             output_path=str(output_path),
             generation_method="library",
-            success=True
+            success=True,
+            metadata=metadata
         )
 
-    def _apply_optimizations(self, prs: Presentation, plan: FinalOptimizationPlan):
+    def _apply_optimizations(
+        self,
+        prs: Presentation,
+        plan: FinalOptimizationPlan,
+        cancel_token: Optional[CancelToken] = None
+    ):
         """
         应用优化建议到PPT
 
         Args:
             prs: Presentation对象
             plan: 优化方案
+            cancel_token: 取消令牌(每处理一页检查一次)
         """
         # 按页面分组建议
         suggestions_by_slide = {}
@@ -128,6 +179,7 @@ class PPTGenerator:
         for slide_idx, suggestions in suggestions_by_slide.items():
             if slide_idx >= len(prs.slides):
                 continue
+            check_cancelled(cancel_token)
 
             slide = prs.slides[slide_idx]
             for sug in suggestions:
@@ -2,42 +2,96 @@
 PPT解析器模块
 负责解析上传的PPTX文件,提取幻灯片内容、版式、样式等信息
 """
+import asyncio
+import functools
 import uuid
-from typing import List, Dict, Any
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.shapes import MSO_SHAPE_TYPE
 from loguru import logger
 
+from app.models.compact import CompactParseResult, CompactSlide, SlideSource
 from app.models.schemas import (
     PPTParseResult,
     SlideData,
     SlideType,
-    LayoutInfo,
     StyleInfo
 )
+from app.utils.cancellation import CancelToken, check_cancelled
+from app.utils.log_sampling import LogSampler
+
+
+# 逐页解析日志的采样器(按ppt_id限流)
+_slide_log = LogSampler()
 
 
 class PPTParser:
     """PPT解析器类"""
 
-    def __init__(self):
-        """初始化解析器"""
-        self.supported_extensions = ['.pptx']
-        self.presentation = None  # 保存presentation对象引用
+    def __init__(self, lazy_details: bool = False):
+        """
+        初始化解析器
 
-    def parse(self, file_path: str, ppt_id: str = None) -> PPTParseResult:
+        Args:
+            lazy_details: 是否懒加载页面明细(版式占位符、样式、图片、图表),
+                开启后解析时只提取文本、类型和版式名,明细在首次访问时从源文件读取
+        """
+        self.supported_extensions = ['.pptx']
+        self.lazy_details = lazy_details
+
+    def parse(
+        self,
+        file_path: str,
+        ppt_id: str = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> PPTParseResult:
         """
         解析PPT文件
 
         Args:
             file_path: PPT文件路径
             ppt_id: PPT唯一标识,不提供则自动生成
+            cancel_token: 取消令牌(每解析一页检查一次)
 
         Returns:
             PPTParseResult: 解析结果
         """
+        return self.parse_compact(file_path, ppt_id, cancel_token).to_result()
+
+    def parse_compact(
+        self,
+        file_path: str,
+        ppt_id: str = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> CompactParseResult:
+        """
+        解析PPT文件,返回紧凑的解析结果(供任务缓存长期保存)
+
+        解析完成后不保留Presentation对象的引用。
+
+        Args:
+            file_path: PPT文件路径
+            ppt_id: PPT唯一标识,不提供则自动生成
+            cancel_token: 取消令牌(每解析一页检查一次)
+
+        Returns:
+            CompactParseResult: 紧凑的解析结果
+        """
+        return self.open_stream(file_path, ppt_id).run(cancel_token)
+
+    def open_stream(self, file_path: str, ppt_id: str = None) -> "SlideStream":
+        """
+        打开PPT文件并提取主题和元数据,返回逐页解析的幻灯片流
+
+        Args:
+            file_path: PPT文件路径
+            ppt_id: PPT唯一标识,不提供则自动生成
+
+        Returns:
+            SlideStream: 幻灯片流(尚未解析任何页面)
+        """
         try:
             # 生成PPT ID
             if ppt_id is None:
@@ -56,39 +110,55 @@ class PPTParser:
 
             # 打开PPT文件
             prs = Presentation(file_path)
-            self.presentation = prs  # 保存引用供其他方法使用
-
-            # 提取主题信息
-            theme = self._extract_theme(prs)
-
-            # 提取元数据
-            metadata = self._extract_metadata(prs)
 
-            # 解析每一页幻灯片
-            slides = []
-            for idx, slide in enumerate(prs.slides):
-                slide_data = self._parse_slide(slide, idx)
-                slides.append(slide_data)
-                logger.debug(f"已解析第 {idx + 1}/{len(prs.slides)} 页")
-
-            # 构建解析结果
-            result = PPTParseResult(
+            # 解析结果(页面在解析过程中逐页追加)
+            result = CompactParseResult(
                 ppt_id=ppt_id,
                 filename=file_path_obj.name,
-                total_slides=len(slides),
-                slides=slides,
-                theme=theme,
-                metadata=metadata
+                slide_width=prs.slide_width,
+                slide_height=prs.slide_height,
+                slides=[],
+                theme=self._extract_theme(prs),
+                metadata=self._extract_metadata(prs),
+                source=SlideSource(file_path, []) if self.lazy_details else None
             )
-
-            logger.info(f"PPT解析完成: {ppt_id}, 共 {len(slides)} 页")
-            return result
+            return SlideStream(self, prs, result)
 
         except Exception as e:
             logger.error(f"解析PPT失败: {file_path}, 错误: {str(e)}")
             raise
 
-    def _parse_slide(self, slide, slide_index: int) -> SlideData:
+    def _parse_slides(self, prs, result: CompactParseResult, cancel_token: Optional[CancelToken] = None):
+        """
+        逐页解析幻灯片并追加到解析结果
+
+        Args:
+            prs: python-pptx的Presentation对象
+            result: 解析结果
+            cancel_token: 取消令牌(每解析一页检查一次)
+
+        Yields:
+            int: 刚解析完成的幻灯片索引
+        """
+        ppt_id = result.ppt_id
+        try:
+            total = len(prs.slides)
+            for idx, slide in enumerate(prs.slides):
+                check_cancelled(cancel_token)
+                result.append(self._parse_slide(slide, idx), slide.part.partname)
+                skipped = _slide_log.take(ppt_id)
+                if skipped is not None:
+                    logger.debug(f"已解析第 {idx + 1}/{total} 页" + (f" (省略 {skipped} 条)" if skipped else ""))
+                yield idx
+        except Exception as e:
+            logger.error(f"解析PPT失败: {ppt_id}, 错误: {str(e)}")
+            raise
+        finally:
+            _slide_log.forget(ppt_id)
+
+        logger.info(f"PPT解析完成: {ppt_id}, 共 {result.total_slides} 页")
+
+    def _parse_slide(self, slide, slide_index: int) -> CompactSlide:
         """
         解析单页幻灯片
 
@@ -97,36 +167,66 @@ class PPTParser:
             slide_index: 幻灯片索引
 
         Returns:
-            SlideData: 幻灯片数据
+            CompactSlide: 单页解析结果
         """
         # 提取文本内容
         content = self._extract_text(slide)
 
+        # 统计图片和图表数
+        image_count, chart_count = self._count_media(slide)
+
         # 判断幻灯片类型
-        slide_type = self._detect_slide_type(slide)
+        slide_type = self._detect_slide_type(slide, image_count, chart_count)
+
+        record = CompactSlide(
+            slide_index,
+            slide_type,
+            content,
+            slide.slide_layout.name,
+            image_count=image_count,
+            chart_count=chart_count
+        )
+        if not self.lazy_details:
+            self.load_details(record, slide)
+        return record
+
+    @staticmethod
+    def open_source(source: SlideSource) -> Dict[str, Any]:
+        """
+        重新打开懒加载结果的源文件
 
-        # 提取版式信息
-        layout_info = self._extract_layout_info(slide)
+        Args:
+            source: 懒加载明细的来源
+
+        Returns:
+            Dict[str, Any]: 幻灯片部件名到Slide对象的映射
+        """
+        source.check()
+        prs = Presentation(source.path)
+        return {slide.part.partname: slide for slide in prs.slides}
+
+    @classmethod
+    def load_details(cls, record: CompactSlide, slide):
+        """
+        提取单页的版式占位符、样式、图片和图表,记入解析结果
+
+        Args:
+            record: 单页解析结果
+            slide: python-pptx的Slide对象
+        """
+        # 提取版式占位符
+        placeholders = cls._extract_placeholders(slide)
 
         # 提取样式信息
-        style_info = self._extract_style_info(slide)
+        style_info = cls._extract_style_info(slide)
 
         # 提取图片信息
-        images = self._extract_images(slide)
+        images = cls._extract_images(slide)
 
         # 提取图表信息
-        charts = self._extract_charts(slide)
-
-        return SlideData(
-            slide_id=slide_index + 1,
-            slide_index=slide_index,
-            slide_type=slide_type,
-            content=content,
-            layout_info=layout_info,
-            style_info=style_info,
-            images=images,
-            charts=charts
-        )
+        charts = cls._extract_charts(slide)
+
+        record.set_details(style_info, placeholders, images, charts)
 
     def _extract_text(self, slide) -> str:
         """提取幻灯片中的所有文本"""
@@ -136,7 +236,20 @@ class PPTParser:
                 text_parts.append(shape.text.strip())
         return "\n".join(text_parts)
 
-    def _detect_slide_type(self, slide) -> SlideType:
+    def _count_media(self, slide) -> Tuple[int, int]:
+        """统计幻灯片中的图片数和图表数"""
+        image_count = 0
+        chart_count = 0
+        for shape in slide.shapes:
+            if hasattr(shape, 'shape_type'):
+                shape_type = shape.shape_type
+                if shape_type == MSO_SHAPE_TYPE.PICTURE:
+                    image_count += 1
+                elif shape_type == MSO_SHAPE_TYPE.CHART:
+                    chart_count += 1
+        return image_count, chart_count
+
+    def _detect_slide_type(self, slide, image_count: int, chart_count: int) -> SlideType:
         """
         检测幻灯片类型
 
@@ -148,19 +261,11 @@ class PPTParser:
             return SlideType.TITLE
 
         # 检查是否包含图表
-        has_chart = any(
-            shape.shape_type == MSO_SHAPE_TYPE.CHART
-            for shape in slide.shapes
-            if hasattr(shape, 'shape_type')
-        )
+        has_chart = chart_count > 0
         if has_chart:
             return SlideType.CHART
 
         # 检查是否主要是图片
-        image_count = sum(
-            1 for shape in slide.shapes
-            if hasattr(shape, 'shape_type') and shape.shape_type == MSO_SHAPE_TYPE.PICTURE
-        )
         if image_count >= 2:
             return SlideType.IMAGE
 
@@ -172,9 +277,9 @@ class PPTParser:
 
         return SlideType.CONTENT
 
-    def _extract_layout_info(self, slide) -> LayoutInfo:
-        """提取版式信息"""
-        layout = slide.slide_layout
+    @staticmethod
+    def _extract_placeholders(slide) -> List[Dict[str, Any]]:
+        """提取版式占位符"""
         placeholders = []
 
         for shape in slide.shapes:
@@ -189,14 +294,10 @@ class PPTParser:
                 }
                 placeholders.append(placeholder_info)
 
-        return LayoutInfo(
-            layout_type=layout.name,
-            width=self.presentation.slide_width,
-            height=self.presentation.slide_height,
-            placeholders=placeholders
-        )
+        return placeholders
 
-    def _extract_style_info(self, slide) -> StyleInfo:
+    @staticmethod
+    def _extract_style_info(slide) -> StyleInfo:
         """提取样式信息"""
         style_info = StyleInfo()
 
@@ -239,7 +340,8 @@ class PPTParser:
 
         return style_info
 
-    def _extract_images(self, slide) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _extract_images(slide) -> List[Dict[str, Any]]:
         """提取图片信息"""
         images = []
         for shape in slide.shapes:
@@ -254,7 +356,8 @@ class PPTParser:
                 images.append(image_info)
         return images
 
-    def _extract_charts(self, slide) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _extract_charts(slide) -> List[Dict[str, Any]]:
         """提取图表信息"""
         charts = []
         for shape in slide.shapes:
@@ -273,8 +376,8 @@ class PPTParser:
     def _extract_theme(self, prs: Presentation) -> Dict[str, Any]:
         """提取主题信息"""
         theme = {
-            "slide_width": prs.slide_width,
-            "slide_height": prs.slide_height,
+            "slide_width": int(prs.slide_width),
+            "slide_height": int(prs.slide_height),
         }
 
         # 尝试提取配色方案
@@ -306,3 +409,126 @@ class PPTParser:
             pass
 
         return metadata
+
+
+class SlideStream:
+    """
+    逐页解析的幻灯片流
+
+    同步使用: iter_slides()逐页解析并产出SlideData,或run()一次解析完;
+    异步使用: start()在线程池中解析,async for逐页读取已解析的页面(可有多个读取方),
+    wait()等待解析完成。页面按顺序产出,total_slides在解析前即已确定。
+    """
+
+    def __init__(self, parser: PPTParser, prs, result: CompactParseResult):
+        """
+        Args:
+            parser: PPT解析器
+            prs: python-pptx的Presentation对象(解析完成后释放)
+            result: 解析结果(页面在解析过程中逐页追加)
+        """
+        self._parser = parser
+        self._prs = prs
+        self.result = result
+        self.total_slides = len(prs.slides)
+        self._loader = result.detail_loader()
+        self._token = CancelToken()
+        self._notify: Optional[Callable[[], None]] = None
+        self._future: Optional[asyncio.Future] = None
+        self._changed: Optional[asyncio.Event] = None
+
+    @property
+    def ppt_id(self) -> str:
+        return self.result.ppt_id
+
+    def _parse(self, cancel_token: Optional[CancelToken]) -> Iterator[int]:
+        prs, self._prs = self._prs, None
+        if prs is None:
+            raise RuntimeError(f"幻灯片流已被读取: {self.ppt_id}")
+        for idx in self._parser._parse_slides(prs, self.result, cancel_token):
+            if self._notify is not None:
+                self._notify()
+            yield idx
+
+    def iter_slides(self, cancel_token: Optional[CancelToken] = None) -> Iterator[SlideData]:
+        """
+        在当前线程中逐页解析并产出幻灯片数据
+
+        Args:
+            cancel_token: 取消令牌(每解析一页检查一次)
+
+        Yields:
+            SlideData: 刚解析完成的幻灯片(懒加载模式下明细在首次访问时加载)
+        """
+        for idx in self._parse(cancel_token):
+            yield self.result.slide_view(idx, self._loader)
+
+    def run(self, cancel_token: Optional[CancelToken] = None) -> CompactParseResult:
+        """
+        在当前线程中解析全部页面
+
+        Args:
+            cancel_token: 取消令牌(每解析一页检查一次)
+
+        Returns:
+            CompactParseResult: 紧凑的解析结果
+        """
+        for _ in self._parse(cancel_token):
+            pass
+        return self.result
+
+    def start(self, fn: Optional[Callable[..., CompactParseResult]] = None) -> "SlideStream":
+        """
+        在线程池中开始解析(需在事件循环中调用)
+
+        Args:
+            fn: 在线程中执行的解析函数,默认为run(可传入包装后的run,如开启性能分析时)
+
+        Returns:
+            SlideStream: 自身
+        """
+        loop = asyncio.get_event_loop()
+        changed = asyncio.Event()
+        self._changed = changed
+        # 每解析完一页唤醒读取方
+        self._notify = functools.partial(loop.call_soon_threadsafe, changed.set)
+        self._future = loop.run_in_executor(None, functools.partial(fn or self.run, cancel_token=self._token))
+        self._future.add_done_callback(lambda _: changed.set())
+        return self
+
+    def cancel(self):
+        """停止解析(线程中的解析在下一页之前退出)"""
+        self._token.cancel()
+
+    async def wait(self) -> CompactParseResult:
+        """
+        等待解析完成(start之后使用,等待期间被取消时停止解析)
+
+        Returns:
+            CompactParseResult: 紧凑的解析结果
+        """
+        try:
+            return await asyncio.shield(self._future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def __aiter__(self) -> AsyncIterator[SlideData]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[SlideData]:
+        """按顺序产出已解析的页面,解析失败时抛出解析的异常"""
+        if self._future is None:
+            raise RuntimeError(f"幻灯片流尚未开始解析: {self.ppt_id}")
+        index = 0
+        while True:
+            while index < len(self.result.slides):
+                yield self.result.slide_view(index, self._loader)
+                index += 1
+            if self._future.done():
+                self._future.result()
+                if index >= len(self.result.slides):
+                    return
+                continue
+            self._changed.clear()
+            await self._changed.wait()
@@ -0,0 +1,268 @@
+"""
+提示词渲染模块
+将PPT解析结果渲染为紧凑的表格化文本,并提供中文感知的token估算
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from loguru import logger
+
+from app.models.schemas import PPTParseResult, SlideData
+
+
+# 中日韩统一表意文字及全角标点,大多数中文模型中约1字1 token
+_CJK_PATTERN = re.compile(
+    r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]"
+)
+# 非CJK部分按"单词/数字串/单个符号"切分
+_WORD_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# 英文单词计1 token,超过4个字符的单词按每4个字符1 token计
+_CHARS_PER_LATIN_TOKEN = 4
+
+# 表格列定义: 列名 -> 取值函数
+_COLUMN_GETTERS = {
+    "index": lambda d, base: str(d.index + base),
+    "type": lambda d, base: d.slide_type,
+    "layout": lambda d, base: d.layout,
+    "font": lambda d, base: d.font,
+    "img": lambda d, base: "1" if d.has_images else "0",
+    "chart": lambda d, base: "1" if d.has_charts else "0",
+}
+
+# 摘要缓存容量(按PPT计)
+_DIGEST_CACHE_SIZE = 64
+
+
+class SlideDigest(NamedTuple):
+    """单页幻灯片的提示词摘要"""
+    index: int
+    slide_type: str
+    layout: str
+    font: str
+    content: str
+    has_images: bool
+    has_charts: bool
+
+
+class RenderedTable(NamedTuple):
+    """渲染后的幻灯片表格"""
+    text: str
+    tokens: int
+    content_limit: int
+    slide_count: int
+
+
+_digest_cache: "OrderedDict[tuple, Tuple[SlideDigest, ...]]" = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数(中文感知)
+
+    中文字符按1字1 token计,英文按单词计(长单词按4字符1 token),
+    数字串与符号各计1 token。结果为近似值,用于预算控制和成本统计。
+
+    Args:
+        text: 待估算文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    rest = _CJK_PATTERN.sub(" ", text)
+
+    latin_tokens = 0
+    for piece in _WORD_PATTERN.findall(rest):
+        if len(piece) > _CHARS_PER_LATIN_TOKEN:
+            latin_tokens += -(-len(piece) // _CHARS_PER_LATIN_TOKEN)
+        else:
+            latin_tokens += 1
+
+    return cjk_count + latin_tokens
+
+
+def normalize_cell(text: str) -> str:
+    """把文本压缩为单行表格单元格(去除多余空白,换行以 / 表示)"""
+    if not text:
+        return ""
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return " / ".join(line for line in lines if line).replace("|", "｜")
+
+
+def digest_slide(slide: SlideData, fonts: bool = False) -> SlideDigest:
+    """
+    生成单页摘要
+
+    Args:
+        slide: 幻灯片数据
+        fonts: 是否填充字体(读取页面样式明细)
+
+    Returns:
+        SlideDigest: 单页摘要
+    """
+    return SlideDigest(
+        index=slide.slide_index,
+        slide_type=slide.slide_type.value,
+        layout=normalize_cell(slide.layout_type),
+        font=normalize_cell(slide.style_info.font_name or "") if fonts else "",
+        content=normalize_cell(slide.content),
+        has_images=slide.image_count > 0,
+        has_charts=slide.chart_count > 0
+    )
+
+
+def get_deck_digest(ppt_data: PPTParseResult, fonts: bool = False) -> Tuple[SlideDigest, ...]:
+    """
+    获取PPT的摘要(按PPT缓存)
+
+    同一份解析结果在内容分析与各模型提示词之间共享一份摘要,
+    避免每次构建提示词都重新遍历和清洗幻灯片文本。
+    字体来自页面样式明细,只在需要font列时读取(懒加载的解析结果不会因此加载明细)。
+
+    Args:
+        ppt_data: PPT解析结果
+        fonts: 是否填充字体
+
+    Returns:
+        Tuple[SlideDigest, ...]: 每页摘要
+    """
+    key = (ppt_data.ppt_id, ppt_data.parse_time, ppt_data.total_slides, fonts)
+
+    with _digest_lock:
+        digest = _digest_cache.get(key)
+        if digest is not None:
+            _digest_cache.move_to_end(key)
+            return digest
+
+    digest = tuple(digest_slide(slide, fonts) for slide in ppt_data.slides)
+
+    with _digest_lock:
+        _digest_cache[key] = digest
+        while len(_digest_cache) > _DIGEST_CACHE_SIZE:
+            _digest_cache.popitem(last=False)
+
+    return digest
+
+
+def render_slide_table(
+    digest: Sequence[SlideDigest],
+    columns: Sequence[str] = ("index", "type", "content"),
+    content_limit: int = 200,
+    max_slides: Optional[int] = None,
+    index_base: int = 0
+) -> str:
+    """
+    将幻灯片摘要渲染为紧凑表格
+
+    表头只出现一次,每页一行、列间以"|"分隔,
+    相比逐页JSON省去了重复的键名和缩进空白。
+
+    Args:
+        digest: 幻灯片摘要
+        columns: 输出列,可选 index/type/layout/font/img/chart/content
+        content_limit: 每页内容的最大字符数
+        max_slides: 最多输出的页数,None表示全部
+        index_base: 页码起始值(0或1)
+
+    Returns:
+        str: 表格文本
+    """
+    rows = digest if max_slides is None else digest[:max_slides]
+
+    lines: List[str] = ["|".join(columns)]
+    for d in rows:
+        cells = []
+        for column in columns:
+            if column == "content":
+                content = d.content
+                if len(content) > content_limit:
+                    content = content[:content_limit] + "…"
+                cells.append(content)
+            else:
+                cells.append(_COLUMN_GETTERS[column](d, index_base))
+        lines.append("|".join(cells))
+
+    return "\n".join(lines)
+
+
+def fit_slide_table(
+    digest: Sequence[SlideDigest],
+    token_budget: int,
+    columns: Sequence[str] = ("index", "type", "content"),
+    content_limit: int = 200,
+    max_slides: Optional[int] = None,
+    index_base: int = 0,
+    min_content_limit: int = 40
+) -> RenderedTable:
+    """
+    在token预算内渲染幻灯片表格
+
+    超出预算时逐步减半每页内容长度,直到满足预算或达到下限;
+    仍超出时截断尾部页面。
+
+    Args:
+        digest: 幻灯片摘要
+        token_budget: 表格可用的token预算
+        columns: 输出列
+        content_limit: 初始每页内容长度
+        max_slides: 最多输出的页数
+        index_base: 页码起始值
+        min_content_limit: 每页内容长度下限
+
+    Returns:
+        RenderedTable: 渲染结果及其token数
+    """
+    slide_count = len(digest) if max_slides is None else min(len(digest), max_slides)
+    limit = content_limit
+
+    while True:
+        text = render_slide_table(digest, columns, limit, slide_count, index_base)
+        tokens = estimate_tokens(text)
+        if tokens <= token_budget or limit <= min_content_limit:
+            break
+        limit = max(min_content_limit, limit // 2)
+
+    while tokens > token_budget and slide_count > 1:
+        # 按超出比例估算需要保留的页数
+        slide_count = max(1, int(slide_count * token_budget / tokens))
+        text = render_slide_table(digest, columns, limit, slide_count, index_base)
+        tokens = estimate_tokens(text)
+
+    if slide_count < len(digest) and max_slides is None:
+        logger.warning(
+            f"提示词超出预算,仅保留前 {slide_count}/{len(digest)} 页 "
+            f"(预算: {token_budget} tokens)"
+        )
+
+    return RenderedTable(
+        text=text,
+        tokens=tokens,
+        content_limit=limit,
+        slide_count=slide_count
+    )
+
+
+def table_legend(columns: Sequence[str]) -> str:
+    """生成表格列说明(供提示词引用)"""
+    descriptions = {
+        "index": "页码",
+        "type": "页面类型",
+        "layout": "版式",
+        "font": "字体",
+        "img": "是否含图片(1/0)",
+        "chart": "是否含图表(1/0)",
+        "content": "文本内容(换行以 / 表示)",
+    }
+    return "、".join(f"{c}={descriptions[c]}" for c in columns)
+
+
+def clear_digest_cache():
+    """清空摘要缓存"""
+    with _digest_lock:
+        _digest_cache.clear()
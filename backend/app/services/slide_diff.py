@@ -0,0 +1,355 @@
+"""
+幻灯片结构化差异引擎
+逐形状比较原始与优化后PPTX的幻灯片XML(文本、字体、位置、填充),得到实际发生的修改
+"""
+import hashlib
+import multiprocessing
+import posixpath
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from loguru import logger
+
+
+_NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_A = "{%s}" % _NS["a"]
+_P = "{%s}" % _NS["p"]
+_R = "{%s}" % _NS["r"]
+
+# 形状元素标签
+_SHAPE_TAGS = {_P + "sp", _P + "pic", _P + "graphicFrame", _P + "cxnSp", _P + "grpSp"}
+
+# EMU -> 磅
+_EMU_PER_PT = 12700
+
+# 变化页数不少于该值时使用进程池并行比较
+_PARALLEL_MIN_SLIDES = 8
+
+# 子进程以spawn方式启动: 调用方处于多线程进程中(日志写线程、线程池),
+# fork出的子进程可能继承被其他线程持有的锁而死锁
+_POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+# 进程池常驻复用,避免每次比较都重新启动子进程
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+class ShapeChange(NamedTuple):
+    """单个形状属性的实际修改"""
+    slide_index: int
+    shape_name: str
+    element: str  # title/body/image/chart/background
+    attribute: str  # text/font/position/fill/added/removed
+    before: str
+    after: str
+
+
+def slide_part_names(zf: zipfile.ZipFile) -> List[str]:
+    """
+    按演示顺序获取幻灯片部件名
+
+    Args:
+        zf: 已打开的PPTX压缩包
+
+    Returns:
+        List[str]: 例如 ["ppt/slides/slide1.xml", ...]
+    """
+    rels_root = ET.fromstring(zf.read("ppt/_rels/presentation.xml.rels"))
+    targets = {
+        rel.get("Id"): rel.get("Target")
+        for rel in rels_root.iter("{%s}Relationship" % _NS["rel"])
+    }
+
+    pres_root = ET.fromstring(zf.read("ppt/presentation.xml"))
+    names = []
+    for sld_id in pres_root.iter(_P + "sldId"):
+        target = targets.get(sld_id.get(_R + "id"))
+        if not target:
+            continue
+        # 关系目标相对于ppt/目录,以"/"开头时为包内绝对路径
+        if target.startswith("/"):
+            names.append(target.lstrip("/"))
+        else:
+            names.append(posixpath.normpath(posixpath.join("ppt", target)))
+    return names
+
+
+def read_slide_parts(pptx_path: str) -> List[bytes]:
+    """按演示顺序读取全部幻灯片XML"""
+    with zipfile.ZipFile(pptx_path) as zf:
+        return [zf.read(name) for name in slide_part_names(zf)]
+
+
+def diff_presentations(
+    before_path: str,
+    after_path: str,
+    max_workers: Optional[int] = None
+) -> List[ShapeChange]:
+    """
+    比较两个PPTX文件的幻灯片,返回实际修改
+
+    字节完全相同的幻灯片(按哈希判断)直接跳过,
+    变化页较多时按页在spawn子进程中并行比较。
+
+    Args:
+        before_path: 原始PPTX路径
+        after_path: 优化后PPTX路径
+        max_workers: 进程池大小,0表示不使用进程池
+
+    Returns:
+        List[ShapeChange]: 修改列表(按页码排序)
+    """
+    before_parts = read_slide_parts(before_path)
+    after_parts = read_slide_parts(after_path)
+
+    changed: List[Tuple[int, bytes, bytes]] = []
+    for idx in range(min(len(before_parts), len(after_parts))):
+        before, after = before_parts[idx], after_parts[idx]
+        if len(before) == len(after) and hashlib.sha1(before).digest() == hashlib.sha1(after).digest():
+            continue
+        changed.append((idx, before, after))
+
+    changes: List[ShapeChange] = []
+    for idx in range(len(after_parts), len(before_parts)):
+        changes.append(ShapeChange(idx, "", "background", "removed", f"第{idx + 1}页", ""))
+    for idx in range(len(before_parts), len(after_parts)):
+        changes.append(ShapeChange(idx, "", "background", "added", "", f"第{idx + 1}页"))
+
+    logger.info(
+        f"幻灯片差异比较: 共 {len(after_parts)} 页, "
+        f"{len(before_parts) - len(changed)} 页未变化已跳过, {len(changed)} 页需比较"
+    )
+
+    if max_workers != 0 and len(changed) >= _PARALLEL_MIN_SLIDES:
+        try:
+            pool = _get_pool(max_workers)
+            results = pool.map(_diff_slide_args, changed, chunksize=max(1, len(changed) // 16))
+            slide_changes = [c for result in results for c in result]
+        except BrokenProcessPool:
+            # 子进程异常退出: 丢弃进程池,本次在当前线程比较
+            logger.warning("差异比较进程池不可用,改为在当前线程比较")
+            shutdown_diff_pool()
+            slide_changes = [c for args in changed for c in _diff_slide_args(args)]
+        changes.extend(slide_changes)
+    else:
+        for args in changed:
+            changes.extend(_diff_slide_args(args))
+
+    changes.sort(key=lambda c: c.slide_index)
+    return changes
+
+
+def _get_pool(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    """获取常驻的差异比较进程池(进程数变化时重建)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=_POOL_CONTEXT)
+            _pool_workers = max_workers
+        return _pool
+
+
+def shutdown_diff_pool():
+    """关闭差异比较进程池(应用关闭时调用)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+        _pool_workers = None
+
+
+def _diff_slide_args(args: Tuple[int, bytes, bytes]) -> List[ShapeChange]:
+    """进程池入口"""
+    return diff_slide_xml(*args)
+
+
+def diff_slide_xml(slide_index: int, before_xml: bytes, after_xml: bytes) -> List[ShapeChange]:
+    """
+    逐形状比较单页幻灯片XML
+
+    Args:
+        slide_index: 页码
+        before_xml: 原始XML
+        after_xml: 优化后XML
+
+    Returns:
+        List[ShapeChange]: 本页修改
+    """
+    before_root = ET.fromstring(before_xml)
+    after_root = ET.fromstring(after_xml)
+    changes: List[ShapeChange] = []
+
+    before_bg = _background_fill(before_root)
+    after_bg = _background_fill(after_root)
+    if before_bg != after_bg:
+        changes.append(ShapeChange(slide_index, "背景", "background", "fill", before_bg, after_bg))
+
+    before_shapes = _extract_shapes(before_root)
+    after_shapes = _extract_shapes(after_root)
+
+    for key, before in before_shapes.items():
+        after = after_shapes.get(key)
+        name, element = before["name"], before["element"]
+        if after is None:
+            changes.append(ShapeChange(slide_index, name, element, "removed", before["text"] or name, ""))
+            continue
+        for attribute in ("text", "font", "position", "fill"):
+            if before[attribute] != after[attribute]:
+                changes.append(ShapeChange(
+                    slide_index, name, element, attribute, before[attribute], after[attribute]
+                ))
+
+    for key, after in after_shapes.items():
+        if key not in before_shapes:
+            changes.append(ShapeChange(
+                slide_index, after["name"], after["element"], "added", "", after["text"] or after["name"]
+            ))
+
+    return changes
+
+
+def _extract_shapes(root: ET.Element) -> Dict[str, Dict[str, str]]:
+    """提取页面内所有形状的可比较属性(以形状id为键)"""
+    shapes: Dict[str, Dict[str, str]] = {}
+    sp_tree = root.find("p:cSld/p:spTree", _NS)
+    if sp_tree is None:
+        return shapes
+
+    for shape in sp_tree.iter():
+        if shape.tag not in _SHAPE_TAGS:
+            continue
+        c_nv_pr = shape.find("./*/p:cNvPr", _NS)
+        if c_nv_pr is None:
+            continue
+
+        shape_id = c_nv_pr.get("id", "")
+        name = c_nv_pr.get("name", "")
+        shapes[shape_id or name] = {
+            "name": name,
+            "element": _infer_element(shape),
+            "text": _shape_text(shape) if shape.tag != _P + "grpSp" else "",
+            "font": _shape_fonts(shape) if shape.tag != _P + "grpSp" else "",
+            "position": _shape_position(shape),
+            "fill": _shape_fill(shape),
+        }
+
+    return shapes
+
+
+def _infer_element(shape: ET.Element) -> str:
+    """推断形状对应的元素类别"""
+    if shape.tag == _P + "pic":
+        return "image"
+    if shape.tag == _P + "graphicFrame":
+        graphic_data = shape.find(".//a:graphicData", _NS)
+        if graphic_data is not None and "chart" in graphic_data.get("uri", ""):
+            return "chart"
+        return "body"
+
+    ph = shape.find("./*/p:nvPr/p:ph", _NS)
+    if ph is not None and ph.get("type") in ("title", "ctrTitle"):
+        return "title"
+    return "body"
+
+
+def _shape_text(shape: ET.Element) -> str:
+    """形状中的全部文本(段落以换行分隔)"""
+    paragraphs = []
+    for paragraph in shape.iter(_A + "p"):
+        paragraphs.append("".join(t.text or "" for t in paragraph.iter(_A + "t")))
+    return "\n".join(paragraphs).strip()
+
+
+def _shape_fonts(shape: ET.Element) -> str:
+    """形状中文本运行的字体属性集合(去重后排序)"""
+    signatures = set()
+    for run in shape.iter(_A + "r"):
+        r_pr = run.find("a:rPr", _NS)
+        if r_pr is None:
+            continue
+        parts = []
+        if r_pr.get("sz"):
+            parts.append(f"{int(r_pr.get('sz')) / 100:g}pt")
+        for flag in ("b", "i", "u"):
+            if r_pr.get(flag) not in (None, "0", "none"):
+                parts.append(flag)
+        latin = r_pr.find("a:latin", _NS)
+        if latin is not None and latin.get("typeface"):
+            parts.append(latin.get("typeface"))
+        color = _solid_fill_color(r_pr)
+        if color:
+            parts.append(color)
+        if parts:
+            signatures.add(" ".join(parts))
+    return "; ".join(sorted(signatures))
+
+
+def _shape_position(shape: ET.Element) -> str:
+    """形状位置与尺寸(磅)"""
+    xfrm = shape.find("p:spPr/a:xfrm", _NS)
+    if xfrm is None:
+        xfrm = shape.find("p:xfrm", _NS)
+    if xfrm is None:
+        xfrm = shape.find("p:grpSpPr/a:xfrm", _NS)
+    if xfrm is None:
+        return ""
+
+    off = xfrm.find("a:off", _NS)
+    ext = xfrm.find("a:ext", _NS)
+    values = []
+    if off is not None:
+        values += [int(off.get("x", 0)), int(off.get("y", 0))]
+    if ext is not None:
+        values += [int(ext.get("cx", 0)), int(ext.get("cy", 0))]
+    return ",".join(f"{v / _EMU_PER_PT:g}" for v in values)
+
+
+def _shape_fill(shape: ET.Element) -> str:
+    """形状填充"""
+    sp_pr = shape.find("p:spPr", _NS)
+    if sp_pr is None:
+        return ""
+    return _fill_description(sp_pr)
+
+
+def _background_fill(root: ET.Element) -> str:
+    """页面背景填充"""
+    bg_pr = root.find("p:cSld/p:bg/p:bgPr", _NS)
+    if bg_pr is None:
+        return ""
+    return _fill_description(bg_pr)
+
+
+def _fill_description(parent: ET.Element) -> str:
+    """描述元素的直接填充设置"""
+    color = _solid_fill_color(parent)
+    if color:
+        return color
+    for tag in ("noFill", "gradFill", "blipFill", "pattFill"):
+        if parent.find("a:" + tag, _NS) is not None:
+            return tag
+    return ""
+
+
+def _solid_fill_color(parent: ET.Element) -> str:
+    """读取solidFill颜色(RGB或主题色)"""
+    solid = parent.find("a:solidFill", _NS)
+    if solid is None:
+        return ""
+    for child in solid:
+        value = child.get("val")
+        if value:
+            return f"#{value}" if child.tag == _A + "srgbClr" else value
+    return ""
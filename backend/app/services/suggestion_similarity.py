@@ -0,0 +1,192 @@
+"""
+建议相似度引擎
+基于字符n-gram TF-IDF向量计算建议之间的语义相似度,用于冲突检测
+"""
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+
+
+class GroupSimilarity:
+    """单组建议的相似度聚类结果"""
+
+    __slots__ = ("labels", "cluster_count", "min_similarity")
+
+    def __init__(self, labels: List[int], cluster_count: int, min_similarity: float):
+        self.labels = labels  # 每条建议所属的簇编号
+        self.cluster_count = cluster_count  # 簇数量
+        self.min_similarity = min_similarity  # 组内两两相似度的最小值
+
+    @property
+    def has_conflict(self) -> bool:
+        """组内存在多个互不相似的簇即视为冲突"""
+        return self.cluster_count > 1
+
+    @property
+    def is_direct(self) -> bool:
+        """任意两条建议都不相似时为直接冲突,否则为部分冲突"""
+        return self.cluster_count > 1 and self.cluster_count == len(self.labels)
+
+
+class SuggestionSimilarity:
+    """建议相似度引擎"""
+
+    def __init__(
+        self,
+        ngram_range: Tuple[int, int] = (2, 3),
+        similarity_threshold: float = 0.5
+    ):
+        """
+        初始化相似度引擎
+
+        Args:
+            ngram_range: 字符n-gram的长度范围(含两端)
+            similarity_threshold: 余弦相似度不低于该值的两条建议视为一致
+        """
+        self.ngram_range = ngram_range
+        self.similarity_threshold = similarity_threshold
+
+    def vectorize(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """
+        将文本向量化为L2归一化的字符n-gram TF-IDF稀疏矩阵
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            sparse.csr_matrix: 行为文本、列为n-gram的矩阵
+        """
+        vocabulary: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        min_n, max_n = self.ngram_range
+
+        for text in texts:
+            normalized = self._normalize(text)
+            length = len(normalized)
+            for n in range(min_n, max_n + 1):
+                for start in range(length - n + 1):
+                    gram = normalized[start:start + n]
+                    col = vocabulary.get(gram)
+                    if col is None:
+                        col = vocabulary[gram] = len(vocabulary)
+                    indices.append(col)
+            indptr.append(len(indices))
+
+        data = np.ones(len(indices), dtype=np.float64)
+        tf = sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), max(len(vocabulary), 1))
+        )
+        tf.sum_duplicates()
+
+        # 平滑IDF: log((1 + n) / (1 + df)) + 1
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log((1.0 + tf.shape[0]) / (1.0 + df)) + 1.0
+        tfidf = tf.multiply(idf).tocsr()
+
+        norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(tfidf).tocsr()
+
+    def analyze_groups(self, groups: Sequence[Sequence[str]]) -> List[GroupSimilarity]:
+        """
+        批量分析多组建议的相似度
+
+        所有建议统一向量化,组内两两相似度通过一次稀疏逐行点积得到,
+        再按阈值做连通聚类。
+
+        Args:
+            groups: 建议文本分组
+
+        Returns:
+            List[GroupSimilarity]: 与输入分组一一对应的聚类结果
+        """
+        offsets = [0]
+        texts: List[str] = []
+        for group in groups:
+            texts.extend(group)
+            offsets.append(len(texts))
+
+        if not texts:
+            return []
+
+        # 完全相同的文本只向量化一次
+        unique_ids: Dict[str, int] = {}
+        text_ids = np.array(
+            [unique_ids.setdefault(self._normalize(t), len(unique_ids)) for t in texts],
+            dtype=np.int64
+        )
+        matrix = self.vectorize(list(unique_ids.keys()))
+
+        # 收集全部组内点对
+        left: List[int] = []
+        right: List[int] = []
+        for g in range(len(groups)):
+            start, end = offsets[g], offsets[g + 1]
+            for i in range(start, end):
+                for j in range(i + 1, end):
+                    left.append(i)
+                    right.append(j)
+
+        similarities = np.empty(0)
+        if left:
+            li = text_ids[np.asarray(left, dtype=np.int64)]
+            ri = text_ids[np.asarray(right, dtype=np.int64)]
+            similarities = np.asarray(
+                matrix[li].multiply(matrix[ri]).sum(axis=1)
+            ).ravel()
+            similarities[li == ri] = 1.0
+
+        results: List[GroupSimilarity] = []
+        pair_pos = 0
+        for g in range(len(groups)):
+            size = offsets[g + 1] - offsets[g]
+            pair_count = size * (size - 1) // 2
+            group_sims = similarities[pair_pos:pair_pos + pair_count]
+            pair_pos += pair_count
+            results.append(self._cluster(size, group_sims))
+
+        return results
+
+    def cosine_matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        计算一组文本的两两余弦相似度矩阵
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            np.ndarray: 相似度矩阵
+        """
+        matrix = self.vectorize(texts)
+        return matrix.dot(matrix.T).toarray()
+
+    def _cluster(self, size: int, pair_similarities: np.ndarray) -> GroupSimilarity:
+        """按阈值对组内建议做连通聚类(并查集)"""
+        parent = list(range(size))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        pos = 0
+        for i in range(size):
+            for j in range(i + 1, size):
+                if pair_similarities[pos] >= self.similarity_threshold:
+                    parent[find(i)] = find(j)
+                pos += 1
+
+        roots: Dict[int, int] = {}
+        labels = [roots.setdefault(find(i), len(roots)) for i in range(size)]
+        min_similarity = float(pair_similarities.min()) if len(pair_similarities) else 1.0
+
+        return GroupSimilarity(labels, len(roots), min_similarity)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """统一大小写并压缩空白"""
+        return " ".join(text.lower().split()) if text else ""
+
@@ -0,0 +1,367 @@
+"""
+耗时追踪模块
+记录任务各处理区间(解析、内容分析、模型调用、修正轮次、生成、修改追踪、排队等待)的耗时,
+汇总为Prometheus指标,并按任务保留耗时明细
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.models.schemas import JobTimings, SpanRecord
+from app.utils.cancellation import JobCancelled
+from app.utils.metrics import Counter, Histogram, get_metrics_registry
+
+
+# 区间名
+PARSE = "parse"
+CONTENT_ANALYSIS = "content_analysis"
+PROVIDER_CALL = "provider_call"
+CORRECTION_ROUND = "correction_round"
+ARBITRATION = "arbitration"
+PLAN = "plan"
+GENERATION = "generation"
+CHANGE_TRACKING = "change_tracking"
+
+_registry = get_metrics_registry()
+
+STAGE_SECONDS: Histogram = _registry.register(Histogram(
+    "ppt_stage_duration_seconds", "各处理区间耗时", ("stage", "outcome")
+))
+QUEUE_WAIT_SECONDS: Histogram = _registry.register(Histogram(
+    "ppt_queue_wait_seconds", "在阶段槽位或并发限流处的排队等待时间", ("queue",)
+))
+PROVIDER_SECONDS: Histogram = _registry.register(Histogram(
+    "ppt_provider_call_duration_seconds", "单次模型调用耗时(含重试)", ("provider", "outcome")
+))
+PROVIDER_RETRIES: Counter = _registry.register(Counter(
+    "ppt_provider_retries", "模型调用重试次数", ("provider",)
+))
+PROVIDER_TOKENS: Counter = _registry.register(Counter(
+    "ppt_provider_tokens", "模型调用token数(提示词为估算值,输出取自响应usage)", ("provider", "kind")
+))
+JOBS: Counter = _registry.register(Counter(
+    "ppt_jobs", "结束的任务数", ("status",)
+))
+
+
+class _JobTrace:
+    """单个任务的耗时记录"""
+
+    __slots__ = ("origin", "stages", "spans", "dropped")
+
+    def __init__(self, origin: float):
+        self.origin = origin
+        self.stages: Dict[str, float] = {}
+        self.spans: List[SpanRecord] = []
+        self.dropped = 0
+
+
+class Span:
+    """
+    耗时区间(with 或 async with)
+
+    退出时记录耗时;区间内抛出异常时结果记为error,被取消时记为cancelled。
+    """
+
+    __slots__ = ("_tracer", "ppt_id", "name", "attrs", "_started")
+
+    def __init__(self, tracer: "Tracer", ppt_id: Optional[str], name: str, attrs: Dict[str, Any]):
+        self._tracer = tracer
+        self.ppt_id = ppt_id
+        self.name = name
+        self.attrs = attrs
+        self._started = 0.0
+
+    def set(self, **attrs: Any):
+        """补充区间属性"""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, (asyncio.CancelledError, JobCancelled)):
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+        self._finish(time.monotonic() - self._started, outcome)
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def _finish(self, seconds: float, outcome: str):
+        self._tracer.record(self.ppt_id, self.name, seconds, outcome, started=self._started, **self.attrs)
+
+
+class ProviderSpan(Span):
+    """
+    模型调用区间
+
+    调用方在每次尝试前调用attempt(),收到响应后调用usage();
+    退出时额外记录模型调用耗时、重试次数和token数。
+    """
+
+    __slots__ = ()
+
+    def attempt(self):
+        """记录一次尝试"""
+        self.attrs["attempts"] = self.attrs.get("attempts", 0) + 1
+
+    def usage(self, response: Any):
+        """
+        从响应中提取输出token数(兼容 usage.completion_tokens 和 usage.output_tokens)
+
+        Args:
+            response: 模型API响应
+        """
+        usage = response.get("usage") if isinstance(response, dict) else None
+        if isinstance(usage, dict):
+            tokens = usage.get("completion_tokens", usage.get("output_tokens"))
+            if isinstance(tokens, int):
+                self.attrs["completion_tokens"] = tokens
+
+    def _finish(self, seconds: float, outcome: str):
+        super()._finish(seconds, outcome)
+        provider = str(self.attrs.get("provider", "unknown"))
+        PROVIDER_SECONDS.observe(seconds, provider=provider, outcome=outcome)
+        retries = self.attrs.get("attempts", 1) - 1
+        if retries > 0:
+            PROVIDER_RETRIES.inc(retries, provider=provider)
+        for kind in ("prompt", "completion"):
+            tokens = self.attrs.get(f"{kind}_tokens")
+            if tokens:
+                PROVIDER_TOKENS.inc(tokens, provider=provider, kind=kind)
+
+
+class _NullSpan:
+    """追踪关闭时使用的空区间"""
+
+    __slots__ = ()
+
+    def set(self, **attrs: Any):
+        pass
+
+    def attempt(self):
+        pass
+
+    def usage(self, response: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """耗时追踪器"""
+
+    def __init__(self, enabled: bool = True, max_spans_per_job: int = 200):
+        """
+        初始化追踪器
+
+        Args:
+            enabled: 是否启用(关闭时区间不做任何记录)
+            max_spans_per_job: 每个任务保留的区间明细上限(超过后只累计各区间耗时)
+        """
+        self.enabled = enabled
+        self.max_spans_per_job = max_spans_per_job
+        self._jobs: Dict[str, _JobTrace] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "Tracer":
+        """
+        从追踪配置创建追踪器
+
+        Args:
+            config: TracingConfig
+
+        Returns:
+            Tracer: 追踪器
+        """
+        return cls(enabled=config.enabled, max_spans_per_job=config.max_spans_per_job)
+
+    def span(self, ppt_id: Optional[str], name: str, **attrs: Any) -> Span:
+        """
+        创建耗时区间
+
+        Args:
+            ppt_id: 任务ID(为空时只计入指标)
+            name: 区间名
+            **attrs: 区间属性
+
+        Returns:
+            Span: 区间(with 或 async with)
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, ppt_id, name, attrs)
+
+    def provider_span(self, ppt_id: Optional[str], provider: str, prompt_tokens: int = 0, **attrs: Any) -> ProviderSpan:
+        """
+        创建模型调用区间
+
+        Args:
+            ppt_id: 任务ID
+            provider: 模型名
+            prompt_tokens: 提示词token数
+            **attrs: 其他区间属性
+
+        Returns:
+            ProviderSpan: 模型调用区间
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return ProviderSpan(self, ppt_id, PROVIDER_CALL, dict(attrs, provider=provider, prompt_tokens=prompt_tokens))
+
+    def record_wait(self, ppt_id: Optional[str], queue: str, seconds: float, started: Optional[float] = None):
+        """
+        记录排队等待时间
+
+        Args:
+            ppt_id: 任务ID
+            queue: 队列名(处理阶段或限流点)
+            seconds: 等待时间(秒)
+            started: 开始等待的时间(time.monotonic)
+        """
+        if not self.enabled:
+            return
+        QUEUE_WAIT_SECONDS.observe(seconds, queue=queue)
+        self._add(ppt_id, f"{queue}_wait", seconds, "ok", started, {})
+
+    def record(
+        self,
+        ppt_id: Optional[str],
+        name: str,
+        seconds: float,
+        outcome: str = "ok",
+        started: Optional[float] = None,
+        **attrs: Any
+    ):
+        """
+        记录已完成的区间
+
+        Args:
+            ppt_id: 任务ID(为空时只计入指标)
+            name: 区间名
+            seconds: 耗时(秒)
+            outcome: 结果 ok / error / cancelled
+            started: 开始时间(time.monotonic,默认按结束时间倒推)
+            **attrs: 区间属性
+        """
+        if not self.enabled:
+            return
+        STAGE_SECONDS.observe(seconds, stage=name, outcome=outcome)
+        self._add(ppt_id, name, seconds, outcome, started, attrs)
+
+    def _add(
+        self,
+        ppt_id: Optional[str],
+        name: str,
+        seconds: float,
+        outcome: str,
+        started: Optional[float],
+        attrs: Dict[str, Any]
+    ):
+        if ppt_id is None:
+            return
+        if started is None:
+            started = time.monotonic() - seconds
+        with self._lock:
+            trace = self._jobs.get(ppt_id)
+            if trace is None:
+                trace = self._jobs[ppt_id] = _JobTrace(started)
+            trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+            if len(trace.spans) >= self.max_spans_per_job:
+                trace.dropped += 1
+                return
+            trace.spans.append(SpanRecord(
+                name=name,
+                start_offset=round(started - trace.origin, 4),
+                seconds=round(seconds, 4),
+                outcome=outcome,
+                attrs=attrs
+            ))
+
+    def stage_totals(self, ppt_id: str) -> Optional[Dict[str, float]]:
+        """
+        获取任务各区间的累计耗时
+
+        Args:
+            ppt_id: 任务ID
+
+        Returns:
+            Optional[Dict[str, float]]: 区间名 -> 累计耗时(秒),没有记录时为None
+        """
+        with self._lock:
+            trace = self._jobs.get(ppt_id)
+            if trace is None:
+                return None
+            return {name: round(seconds, 4) for name, seconds in trace.stages.items()}
+
+    def job_timings(self, ppt_id: str) -> Optional[JobTimings]:
+        """
+        获取任务耗时明细
+
+        Args:
+            ppt_id: 任务ID
+
+        Returns:
+            Optional[JobTimings]: 耗时明细,没有记录时为None
+        """
+        with self._lock:
+            trace = self._jobs.get(ppt_id)
+            if trace is None:
+                return None
+            spans = sorted(trace.spans, key=lambda span: span.start_offset)
+            return JobTimings(
+                stages={name: round(seconds, 4) for name, seconds in trace.stages.items()},
+                spans=spans,
+                dropped_spans=trace.dropped
+            )
+
+    def job_finished(self, status: str):
+        """
+        记录结束的任务
+
+        Args:
+            status: 结束状态 completed / failed / cancelled
+        """
+        JOBS.inc(status=status)
+
+    def discard(self, ppt_id: str):
+        """删除任务的耗时记录"""
+        with self._lock:
+            self._jobs.pop(ppt_id, None)
+
+
+# 全局追踪器实例
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器实例(单例模式)"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer.from_config(get_settings().tracing)
+    return _tracer
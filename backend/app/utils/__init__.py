@@ -1,6 +1,8 @@
 """工具模块"""
 from .helpers import (
     generate_ppt_id,
+    is_valid_ppt_id,
+    generate_batch_id,
     generate_file_hash,
     ensure_dir,
     is_allowed_file,
@@ -9,6 +11,8 @@ from .helpers import (
 
 __all__ = [
     'generate_ppt_id',
+    'is_valid_ppt_id',
+    'generate_batch_id',
     'generate_file_hash',
     'ensure_dir',
     'is_allowed_file',
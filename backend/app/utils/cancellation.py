@@ -0,0 +1,73 @@
+"""
+任务取消
+asyncio取消无法中断线程中的同步工作,这里用取消令牌让线程中的工作在检查点处尽快退出
+"""
+import asyncio
+import functools
+import threading
+from typing import Callable, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class JobCancelled(Exception):
+    """任务已取消(由线程中的检查点抛出)"""
+
+
+class CancelToken:
+    """取消令牌(线程安全)"""
+
+    __slots__ = ("_event",)
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """已请求取消时抛出JobCancelled"""
+        if self._event.is_set():
+            raise JobCancelled()
+
+
+def check_cancelled(token: Optional[CancelToken]):
+    """
+    取消检查点(token为None时不做任何事)
+
+    Args:
+        token: 取消令牌
+    """
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+async def run_cancellable(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    在线程池中执行同步函数,所在的asyncio任务被取消时通知函数停止
+
+    fn需要接受cancel_token关键字参数,并在合适的位置调用check_cancelled。
+    任务被取消时立即抛出CancelledError,线程中的工作在下一个检查点退出。
+
+    Args:
+        fn: 同步函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        T: 函数返回值
+    """
+    token = CancelToken()
+    loop = asyncio.get_event_loop()
+    future = loop.run_in_executor(None, functools.partial(fn, *args, cancel_token=token, **kwargs))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        token.cancel()
+        raise
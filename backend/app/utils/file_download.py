@@ -0,0 +1,233 @@
+"""
+文件下载响应
+支持强ETag(内容哈希)、Last-Modified条件请求、单段Range请求和预压缩的gzip旁路文件
+"""
+import asyncio
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.utils.serialized_response import etag_matches
+
+
+_CHUNK_SIZE = 1024 * 1024
+
+# 内容哈希缓存: 路径 -> ((大小, 修改时间), ETag)
+_etag_cache: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_etag_lock = threading.Lock()
+
+SIDECAR_SUFFIX = ".gz"
+
+# 无法满足的Range请求(返回416)
+_UNSATISFIABLE = (-1, -1)
+
+
+def file_etag(path: str) -> str:
+    """
+    计算文件的强ETag(SHA-256内容哈希),文件大小和修改时间不变时复用缓存
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        str: 带引号的ETag
+    """
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+
+    with _etag_lock:
+        cached = _etag_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    etag = '"%s"' % digest.hexdigest()[:32]
+
+    with _etag_lock:
+        _etag_cache[path] = (signature, etag)
+    return etag
+
+
+def write_gzip_sidecar(path: str, min_saving: float = 0.05) -> Optional[str]:
+    """
+    生成预压缩的gzip旁路文件(path + ".gz"),压缩收益不足时不保留
+
+    Args:
+        path: 原文件路径
+        min_saving: 最低压缩收益(相对原文件大小的比例)
+
+    Returns:
+        Optional[str]: 旁路文件路径,未生成时为None
+    """
+    sidecar = path + SIDECAR_SUFFIX
+    with open(path, "rb") as src, gzip.open(sidecar, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+
+    if os.path.getsize(sidecar) > os.path.getsize(path) * (1 - min_saving):
+        os.remove(sidecar)
+        return None
+    return sidecar
+
+
+async def file_download_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: str
+) -> Response:
+    """
+    构造文件下载响应(ETag未缓存时在线程池中计算内容哈希,不阻塞事件循环)
+
+    - If-None-Match / If-Modified-Since 命中时返回304
+    - 单段Range请求返回206(If-Range不匹配时返回完整文件),范围无效时返回416
+    - 完整下载且客户端接受gzip时,若存在预压缩旁路文件则发送旁路文件
+
+    Args:
+        request: 当前请求
+        path: 文件路径
+        media_type: 媒体类型
+        filename: 下载文件名
+
+    Returns:
+        Response: 下载响应
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = await asyncio.get_event_loop().run_in_executor(None, file_etag, path)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+        "Content-Disposition": _content_disposition(filename),
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers={k: headers[k] for k in ("ETag", "Last-Modified", "Cache-Control")})
+
+    range_header = request.headers.get("range")
+    if range_header and _if_range_matches(request.headers.get("if-range"), etag, last_modified):
+        byte_range = _parse_range(range_header, size)
+        if byte_range == _UNSATISFIABLE:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                _iter_file(path, start, end - start + 1),
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+
+    sidecar = path + SIDECAR_SUFFIX
+    if "gzip" in request.headers.get("accept-encoding", "").lower() and _is_fresh_sidecar(sidecar, stat.st_mtime):
+        sidecar_size = os.path.getsize(sidecar)
+        headers["ETag"] = etag[:-1] + '-gzip"'
+        headers["Content-Encoding"] = "gzip"
+        headers["Content-Length"] = str(sidecar_size)
+        headers.pop("Accept-Ranges")
+        return StreamingResponse(_iter_file(sidecar, 0, sidecar_size), media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_iter_file(path, 0, size), media_type=media_type, headers=headers)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """条件请求是否命中(If-None-Match优先于If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        gzip_etag = etag[:-1] + '-gzip"'
+        return etag_matches(if_none_match, etag) or etag_matches(if_none_match, gzip_etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _if_range_matches(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+    """If-Range为空或与当前版本一致时才按Range响应"""
+    if not if_range:
+        return True
+    return if_range.strip() in (etag, last_modified)
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段Range请求头
+
+    多段或无法解析的请求返回None(按完整文件处理);范围无法满足时返回_UNSATISFIABLE。
+
+    Returns:
+        Optional[Tuple[int, int]]: 闭区间 (start, end)
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if not start_str:
+            # 后缀范围: 最后N个字节
+            length = int(end_str)
+            if length <= 0 or size == 0:
+                return _UNSATISFIABLE
+            return max(size - length, 0), size - 1
+
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        return _UNSATISFIABLE
+    return start, min(end, size - 1)
+
+
+def _is_fresh_sidecar(sidecar: str, source_mtime: float) -> bool:
+    """旁路文件存在且不早于原文件"""
+    try:
+        return os.stat(sidecar).st_mtime >= source_mtime
+    except OSError:
+        return False
+
+
+def _iter_file(path: str, offset: int, length: int) -> Iterator[bytes]:
+    """从offset开始分块读取length字节"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _content_disposition(filename: str) -> str:
+    """附件文件名(非ASCII文件名使用RFC 5987编码)"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
@@ -1,5 +1,6 @@
 """工具函数模块"""
 import os
+import re
 import hashlib
 import uuid
 from pathlib import Path
@@ -7,11 +8,25 @@ from typing import Optional
 from loguru import logger
 
 
+# generate_ppt_id生成的ID格式
+_PPT_ID_PATTERN = re.compile(r"ppt_[0-9a-f]{12}")
+
+
 def generate_ppt_id() -> str:
     """生成PPT唯一ID"""
     return f"ppt_{uuid.uuid4().hex[:12]}"
 
 
+def is_valid_ppt_id(ppt_id: str) -> bool:
+    """是否为generate_ppt_id生成格式的ID(用于拼接路径前校验)"""
+    return _PPT_ID_PATTERN.fullmatch(ppt_id) is not None
+
+
+def generate_batch_id() -> str:
+    """生成批次唯一ID"""
+    return f"batch_{uuid.uuid4().hex[:12]}"
+
+
 def generate_file_hash(file_path: str) -> str:
     """计算文件MD5哈希"""
     hash_md5 = hashlib.md5()
@@ -0,0 +1,85 @@
+"""
+日志采样
+热点路径(逐页解析、逐条模型响应)上的日志按键限流,避免大量日志拖慢处理
+"""
+import threading
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+
+# 全局采样参数(由setup_logging根据日志配置设置)
+_interval: float = 1.0
+_every: int = 100
+
+
+def configure_log_sampling(interval: float, every: int):
+    """
+    设置采样参数(对所有采样器生效)
+
+    interval和every都不大于0时不采样,每条日志都输出。
+
+    Args:
+        interval: 同一个键两条日志之间的最小间隔(秒)
+        every: 同一个键最多连续省略的日志条数(0表示不按条数输出)
+    """
+    global _interval, _every
+    _interval = interval
+    _every = every
+
+
+class LogSampler:
+    """按键限流的日志采样器(线程安全)"""
+
+    def __init__(self, max_keys: int = 1024):
+        """
+        初始化采样器
+
+        Args:
+            max_keys: 保留状态的键数上限,超过后清空(键通常是ppt_id或模型名)
+        """
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+        # 键 -> (上次输出时间, 之后省略的条数)
+        self._state: Dict[Hashable, Tuple[float, int]] = {}
+
+    def take(self, key: Hashable) -> Optional[int]:
+        """
+        判断这条日志是否输出
+
+        每个键的第一条日志总是输出;之后距上次输出超过interval,或已省略every条时输出。
+
+        Args:
+            key: 采样键
+
+        Returns:
+            Optional[int]: 应输出时返回上次输出后省略的条数,应省略时返回None
+        """
+        if _interval <= 0 and _every <= 0:
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                if len(self._state) >= self._max_keys:
+                    self._state.clear()
+                self._state[key] = (now, 0)
+                return 0
+
+            last, skipped = state
+            if (_interval > 0 and now - last >= _interval) or (_every > 0 and skipped + 1 >= _every):
+                self._state[key] = (now, 0)
+                return skipped
+
+            self._state[key] = (last, skipped + 1)
+            return None
+
+    def forget(self, key: Hashable):
+        """
+        删除键的采样状态(一个键对应的工作结束后调用)
+
+        Args:
+            key: 采样键
+        """
+        with self._lock:
+            self._state.pop(key, None)
@@ -0,0 +1,112 @@
+"""
+预序列化响应
+将结果一次性序列化为JSON字节及其压缩版本,重复请求直接发送缓存字节,并支持ETag条件请求
+"""
+import gzip
+import hashlib
+from typing import Any, Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖,未安装时只提供gzip
+    brotli = None
+
+
+# 小于该字节数的响应不压缩
+_MIN_COMPRESS_SIZE = 1024
+
+_JSON_MEDIA_TYPE = "application/json"
+
+
+class SerializedPayload:
+    """预序列化的JSON响应体"""
+
+    __slots__ = ("body", "gzip_body", "br_body", "etag")
+
+    def __init__(self, body: bytes):
+        """
+        序列化并预先压缩
+
+        Args:
+            body: JSON字节
+        """
+        self.body = body
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+        self.gzip_body: Optional[bytes] = None
+        self.br_body: Optional[bytes] = None
+        if len(body) >= _MIN_COMPRESS_SIZE:
+            self.gzip_body = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.br_body = brotli.compress(body, quality=9)
+
+    @classmethod
+    def from_object(cls, obj: Any) -> "SerializedPayload":
+        """
+        使用orjson序列化对象(支持datetime、枚举和非字符串键)
+
+        Args:
+            obj: 可序列化对象(dict/list等)
+
+        Returns:
+            SerializedPayload: 预序列化响应体
+        """
+        return cls(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+
+    def to_response(self, request: Request) -> Response:
+        """
+        按请求头返回响应: If-None-Match命中时返回304,否则按Accept-Encoding选择压缩版本
+
+        Args:
+            request: 当前请求
+
+        Returns:
+            Response: 响应
+        """
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "private, no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+
+        accept_encoding = request.headers.get("accept-encoding", "").lower()
+        if self.br_body is not None and "br" in accept_encoding:
+            headers["Content-Encoding"] = "br"
+            return Response(self.br_body, media_type=_JSON_MEDIA_TYPE, headers=headers)
+        if self.gzip_body is not None and "gzip" in accept_encoding:
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzip_body, media_type=_JSON_MEDIA_TYPE, headers=headers)
+        return Response(self.body, media_type=_JSON_MEDIA_TYPE, headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断If-None-Match是否命中ETag(弱比较)
+
+    Args:
+        if_none_match: If-None-Match请求头
+        etag: 当前ETag
+
+    Returns:
+        bool: 是否命中
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
@@ -0,0 +1,59 @@
+"""
+单飞(single-flight)调用合并
+相同键的并发调用只执行一次,其余调用等待同一个结果
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """按键合并进行中的异步调用(调用结束后不保留结果)"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[T]"] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        执行调用;已有相同键的调用进行中时等待其结果
+
+        单个等待方被取消不会影响其他等待方;所有等待方都被取消时,共享的调用也被取消。
+        调用抛出的异常会传递给所有等待方。
+
+        Args:
+            key: 合并键
+            fn: 实际执行的调用
+
+        Returns:
+            Tuple[T, bool]: 结果, 是否复用了进行中的调用
+        """
+        future = self._calls.get(key)
+        joined = future is not None
+        if not joined:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+
+            def _forget(done: "asyncio.Future[T]"):
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+                    self._waiters.pop(key, None)
+
+            future.add_done_callback(_forget)
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(future), joined
+        except asyncio.CancelledError:
+            if self._calls.get(key) is future and self._waiters.get(key) == 1:
+                future.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is future:
+                self._waiters[key] -= 1
+
+    def in_flight(self) -> int:
+        """进行中的调用数"""
+        return len(self._calls)
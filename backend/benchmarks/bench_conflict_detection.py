@@ -0,0 +1,119 @@
+"""
+冲突检测基准测试
+对比逐字符串比较与n-gram TF-IDF相似度引擎在大量合成建议上的耗时与冲突率
+
+用法(在backend目录下):
+    python -m benchmarks.bench_conflict_detection --slides 300 --models 4
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from app.core.config import IterationConfig
+from app.models.schemas import (
+    ModelSuggestion,
+    OptimizationSuggestion,
+    OptimizationDimension,
+    Priority
+)
+from app.services.conflict_index import ConflictIndex
+from app.services.suggestion_similarity import SuggestionSimilarity
+
+
+# 每个维度的若干种"方案",同一方案的不同措辞视为一致
+_PLANS = {
+    OptimizationDimension.CONTENT: ["精简正文文字,保留三个核心要点", "补充具体数据支撑论点"],
+    OptimizationDimension.LOGIC: ["调整段落顺序,先结论后论据", "增加过渡页说明章节关系"],
+    OptimizationDimension.LAYOUT: ["采用左右分栏布局,图片置于右侧", "增加页边距并统一对齐方式"],
+    OptimizationDimension.COLOR: ["使用品牌主色蓝色作为标题颜色", "降低背景饱和度,提升文字对比度"],
+    OptimizationDimension.FONT: ["标题使用28号微软雅黑加粗", "正文字号统一为18号"],
+    OptimizationDimension.CHART: ["将饼图改为柱状图以便比较", "为图表添加数据标签和单位"],
+}
+
+_PREFIXES = ["建议", "可以", "推荐", "最好", ""]
+_SUFFIXES = ["。", "，提升可读性。", "，使页面更专业。", ""]
+
+
+def build_suggestions(slides: int, models: int, divergence: float, seed: int = 42) -> List[ModelSuggestion]:
+    """
+    生成合成的多模型建议
+
+    Args:
+        slides: 页数
+        models: 模型数
+        divergence: 模型选择与多数方案不同的概率
+        seed: 随机种子
+
+    Returns:
+        List[ModelSuggestion]: 合成建议
+    """
+    rng = random.Random(seed)
+    result = []
+    for m in range(models):
+        suggestions = []
+        for slide_idx in range(slides):
+            for dimension, plans in _PLANS.items():
+                plan = plans[1] if rng.random() < divergence else plans[0]
+                text = f"{rng.choice(_PREFIXES)}{plan}{rng.choice(_SUFFIXES)}"
+                suggestions.append(OptimizationSuggestion(
+                    slide_index=slide_idx,
+                    optimization_dimension=dimension,
+                    original_content="",
+                    suggestion=text,
+                    reason="合成数据",
+                    priority=Priority.RECOMMEND
+                ))
+        result.append(ModelSuggestion(
+            ppt_id="bench",
+            model_name=f"model_{m}",
+            optimization_suggestions=suggestions,
+            core_strength="bench"
+        ))
+    return result
+
+
+def legacy_conflict_count(model_suggestions: List[ModelSuggestion]) -> int:
+    """原实现: 分组内小写字符串不完全相同即视为冲突"""
+    grouped = {}
+    for ms in model_suggestions:
+        for s in ms.optimization_suggestions:
+            grouped.setdefault((s.slide_index, s.optimization_dimension), []).append(s)
+    return sum(
+        len(group) for group in grouped.values()
+        if len(group) > 1 and len({s.suggestion.lower() for s in group}) > 1
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冲突检测基准测试")
+    parser.add_argument("--slides", type=int, default=300)
+    parser.add_argument("--models", type=int, default=4)
+    parser.add_argument("--divergence", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model_suggestions = build_suggestions(args.slides, args.models, args.divergence)
+    total = sum(len(ms.optimization_suggestions) for ms in model_suggestions)
+    similarity = SuggestionSimilarity(similarity_threshold=IterationConfig().similarity_threshold)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        legacy = legacy_conflict_count(model_suggestions)
+    legacy_time = (time.perf_counter() - start) / args.repeat
+
+    # 相似度在首次读取冲突时才计算,计时需包含conflicts()和conflict_rate
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        index = ConflictIndex(similarity).build(model_suggestions)
+        conflicts = index.conflicts()
+        rate = index.conflict_rate
+    engine_time = (time.perf_counter() - start) / args.repeat
+
+    print(f"建议总数: {total} ({args.slides}页 x {len(_PLANS)}维度 x {args.models}模型)")
+    print(f"字符串比较: 冲突率 {legacy / total:.2%}, 耗时 {legacy_time * 1000:.1f} ms")
+    print(f"相似度引擎: 冲突率 {rate:.2%}, 冲突组 {len(conflicts)}, 耗时 {engine_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
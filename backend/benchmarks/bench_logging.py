@@ -0,0 +1,143 @@
+"""
+日志开销基准测试
+在合成的大PPT上对比不同日志配置下的解析耗时:
+    none     不输出日志(基线)
+    sync     同步写文件,逐页日志不采样(原来的配置)
+    enqueue  后台线程写文件,逐页日志不采样
+    sampled  后台线程写文件,逐页日志采样
+    json     后台线程写文件,逐页日志采样,输出JSON
+
+用法(在backend目录下):
+    python -m benchmarks.bench_logging --slides 500 --runs 3
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from loguru import logger
+
+from app.services.ppt_parser import PPTParser
+from app.utils.log_sampling import configure_log_sampling
+from benchmarks.synthetic_deck import DeckSpec, build_deck
+
+
+MODES = ("none", "sync", "enqueue", "sampled", "json")
+
+
+def configure(mode: str, log_path: Path, rotation: str):
+    """
+    按模式配置日志处理器和采样参数
+
+    Args:
+        mode: 日志模式
+        log_path: 日志文件路径
+        rotation: 轮转大小
+    """
+    logger.remove()
+    if mode in ("sampled", "json"):
+        configure_log_sampling(1.0, 100)
+    else:
+        configure_log_sampling(0, 0)
+    if mode == "none":
+        return
+    logger.add(
+        str(log_path),
+        level="DEBUG",
+        rotation=rotation,
+        compression="zip",
+        enqueue=mode != "sync",
+        serialize=mode == "json"
+    )
+
+
+def run(mode: str, deck: Path, work_dir: Path, runs: int, rotation: str) -> Dict[str, float]:
+    """
+    多次解析并统计耗时
+
+    Returns:
+        Dict[str, float]: 解析耗时中位数和包含日志写完的耗时中位数(毫秒)
+    """
+    parse_times: List[float] = []
+    total_times: List[float] = []
+    for run_idx in range(runs):
+        configure(mode, work_dir / f"{mode}_{run_idx}.log", rotation)
+        started = time.perf_counter()
+        PPTParser().parse(str(deck), f"bench_{mode}_{run_idx}")
+        parsed = time.perf_counter()
+        # 移除处理器会等待后台线程写完队列中的日志
+        logger.remove()
+        finished = time.perf_counter()
+        parse_times.append((parsed - started) * 1000)
+        total_times.append((finished - started) * 1000)
+    return {"parse": statistics.median(parse_times), "total": statistics.median(total_times)}
+
+
+def run_log_only(mode: str, work_dir: Path, messages: int, rotation: str) -> Dict[str, float]:
+    """
+    只发出与解析相同的逐页日志(不解析),单独衡量日志本身的开销
+
+    Returns:
+        Dict[str, float]: 发出日志的耗时和包含日志写完的耗时(毫秒)
+    """
+    from app.services.ppt_parser import _slide_log
+
+    configure(mode, work_dir / f"{mode}_only.log", rotation)
+    key = f"bench_{mode}_only"
+    started = time.perf_counter()
+    for idx in range(messages):
+        skipped = _slide_log.take(key)
+        if skipped is not None:
+            logger.debug(f"已解析第 {idx + 1}/{messages} 页" + (f" (省略 {skipped} 条)" if skipped else ""))
+    emitted = time.perf_counter()
+    logger.remove()
+    finished = time.perf_counter()
+    _slide_log.forget(key)
+    return {"parse": (emitted - started) * 1000, "total": (finished - started) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志开销基准测试")
+    parser.add_argument("--slides", type=int, default=500, help="合成PPT页数")
+    parser.add_argument("--runs", type=int, default=3, help="每种模式的重复次数(取中位数)")
+    parser.add_argument("--rotation", default="100 MB", help="日志轮转大小(调小可观察同步压缩的停顿)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="测试的日志模式")
+    parser.add_argument("--log-only", type=int, default=50000, help="只发日志(不解析)时的日志条数,0表示跳过")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        deck = work_dir / "synthetic.pptx"
+        build_deck(deck, DeckSpec(slides=args.slides))
+
+        # 预热(导入和缓存)
+        configure("none", work_dir / "warmup.log", args.rotation)
+        PPTParser().parse(str(deck), "bench_warmup")
+
+        results = {mode: run(mode, deck, work_dir, args.runs, args.rotation) for mode in args.modes}
+        log_only = {}
+        if args.log_only:
+            log_only = {mode: run_log_only(mode, work_dir, args.log_only, args.rotation) for mode in args.modes}
+
+    logger.add(sys.stderr, level="INFO")
+    print_table(f"{args.slides} 页解析耗时 (中位数, {args.runs} 次):", "解析(ms)", results)
+    if log_only:
+        print()
+        print_table(f"只发出 {args.log_only} 条逐页日志:", "发出(ms)", log_only)
+
+
+def print_table(title: str, column: str, results: Dict[str, Dict[str, float]]):
+    """输出结果表(相对基线为调用方耗时相对none模式的增加比例)"""
+    baseline = results.get("none", {}).get("parse")
+    print(title)
+    print(f"  {'模式':<10}{column:>12}{'含写完日志(ms)':>18}{'相对基线':>12}")
+    for mode, result in results.items():
+        overhead = f"{(result['parse'] / baseline - 1) * 100:+.1f}%" if baseline else "-"
+        print(f"  {mode:<10}{result['parse']:>12.1f}{result['total']:>18.1f}{overhead:>12}")
+
+
+if __name__ == "__main__":
+    main()
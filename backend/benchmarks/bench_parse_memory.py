@@ -0,0 +1,111 @@
+"""
+解析结果内存基准测试
+用tracemalloc测量任务缓存中每页解析结果常驻的内存:
+    pydantic  PPTParseResult(原来缓存的形式)
+    dict      PPTParseResult.dict()(原来结果存储中额外保存的副本)
+    compact   CompactParseResult(页面明细已解析)
+    lazy      CompactParseResult(懒加载,明细未加载)
+同时比较两种解析方式的耗时,并检查解析完成后是否还有Presentation对象存活
+
+用法(在backend目录下):
+    python -m benchmarks.bench_parse_memory --slides 500 --images 1 --charts 1
+"""
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Tuple
+
+from loguru import logger
+from pptx.presentation import Presentation as PresentationType
+
+from app.services.ppt_parser import PPTParser
+from benchmarks.synthetic_deck import DeckSpec, build_deck
+
+
+def retained(build: Callable[[], Any]) -> Tuple[Any, int]:
+    """
+    构建对象并测量其常驻内存(构建过程中的临时对象已释放)
+
+    Args:
+        build: 构建函数
+
+    Returns:
+        Tuple[Any, int]: 对象和常驻字节数
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        obj = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return obj, after - before
+
+
+def live_presentations() -> int:
+    """存活的Presentation对象数"""
+    gc.collect()
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, PresentationType))
+
+
+def main():
+    defaults = DeckSpec()
+    parser = argparse.ArgumentParser(description="解析结果内存基准测试")
+    parser.add_argument("--slides", type=int, default=500)
+    parser.add_argument("--shapes", type=int, default=defaults.shapes_per_slide, help="每页额外文本框数")
+    parser.add_argument("--sentences", type=int, default=defaults.sentences_per_paragraph, help="每段句数")
+    parser.add_argument("--images", type=int, default=1, help="每页图片数")
+    parser.add_argument("--image-size", type=int, default=64, help="图片边长(像素,不影响解析结果大小)")
+    parser.add_argument("--charts", type=int, default=1, help="每页图表数")
+    args = parser.parse_args()
+
+    logger.remove()
+    spec = DeckSpec(
+        slides=args.slides,
+        shapes_per_slide=args.shapes,
+        sentences_per_paragraph=args.sentences,
+        images=args.images,
+        image_size=args.image_size,
+        charts=args.charts
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        deck = str(build_deck(Path(tmp) / "synthetic.pptx", spec))
+        ppt_parser = PPTParser()
+        lazy_parser = PPTParser(lazy_details=True)
+        ppt_parser.parse(deck, "bench_warmup")
+
+        pydantic_result, pydantic_bytes = retained(lambda: ppt_parser.parse(deck, "bench_pydantic"))
+        _, dict_bytes = retained(pydantic_result.dict)
+        compact_result, compact_bytes = retained(lambda: ppt_parser.parse_compact(deck, "bench_compact"))
+        lazy_result, lazy_bytes = retained(lambda: lazy_parser.parse_compact(deck, "bench_lazy"))
+        presentations = live_presentations()
+
+        parse_seconds = {}
+        for name, parse in (("eager", ppt_parser.parse_compact), ("lazy", lazy_parser.parse_compact)):
+            start = time.perf_counter()
+            parse(deck, f"bench_{name}")
+            parse_seconds[name] = time.perf_counter() - start
+
+        # 视图与原结果一致(懒加载视图在序列化时加载明细)
+        expected = pydantic_result.dict(exclude={"ppt_id", "parse_time"})
+        assert compact_result.to_result().dict(exclude={"ppt_id", "parse_time"}) == expected
+        assert lazy_result.to_result().dict(exclude={"ppt_id", "parse_time"}) == expected
+
+    content_bytes = sum(len(slide.content.encode("utf-8")) for slide in compact_result.slides)
+    print(f"{args.slides} 页 (每页文本约 {content_bytes / args.slides:.0f} 字节UTF-8):")
+    print(f"  {'形式':<10}{'总计(KB)':>12}{'每页(字节)':>14}{'相对pydantic':>14}")
+    forms = (("pydantic", pydantic_bytes), ("dict", dict_bytes), ("compact", compact_bytes), ("lazy", lazy_bytes))
+    for name, size in forms:
+        print(f"  {name:<10}{size / 1024:>12.1f}{size / args.slides:>14.0f}{size / pydantic_bytes:>14.1%}")
+    print(f"解析耗时: 完整 {parse_seconds['eager']:.2f}s, 懒加载 {parse_seconds['lazy']:.2f}s")
+    print(f"解析完成后存活的Presentation对象: {presentations}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+启动时间基准测试
+统计导入main的耗时(按模块累计耗时排序)和从启动进程到 /api/health 首次返回200的耗时,
+超过预算时以非零状态退出,可用于CI中的回归检查
+
+用法(在backend目录下):
+    python -m benchmarks.bench_startup --runs 5 --import-budget-ms 600 --ready-budget-ms 2500
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 冷启动时不应加载的重型依赖(应在第一次处理任务时才加载)
+LAZY_MODULES = ("pptx", "tenacity", "scipy", "app.services.optimization_orchestrator")
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure_imports() -> Tuple[float, Dict[str, float], List[str]]:
+    """
+    在新进程中导入main并解析 -X importtime 输出
+
+    Returns:
+        Tuple[float, Dict[str, float], List[str]]: 总耗时(毫秒), 顶层模块 -> 累计耗时(毫秒), 已加载的延迟模块
+    """
+    probe = (
+        "import sys, main; "
+        f"print('LAZY:' + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=str(BACKEND_DIR),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+    )
+
+    cumulative: Dict[str, float] = {}
+    total_ms = 0.0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, module = match.groups()
+        ms = int(cumulative_us) / 1000
+        if module == "main":
+            total_ms = ms
+        # 只统计main直接导入的模块和项目内模块
+        if len(indent) <= 3 or module.startswith("app."):
+            cumulative[module] = max(cumulative.get(module, 0.0), ms)
+
+    # main导入时会输出日志,延迟模块列表以 LAZY: 开头
+    loaded: List[str] = []
+    for line in proc.stdout.splitlines():
+        if line.startswith("LAZY:"):
+            loaded = [m for m in line[len("LAZY:"):].split(",") if m]
+    return total_ms, cumulative, loaded
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(timeout: float = 30.0) -> float:
+    """
+    启动uvicorn进程,轮询 /api/health 直到返回200
+
+    Args:
+        timeout: 超时时间(秒)
+
+    Returns:
+        float: 从启动进程到首次返回200的耗时(毫秒)
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(BACKEND_DIR),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=dict(os.environ, PYTHONUNBUFFERED="1")
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError(f"服务进程提前退出,退出码: {proc.returncode}")
+            time.sleep(0.01)
+        raise TimeoutError(f"{timeout}s 内 /api/health 未返回200")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数(取中位数)")
+    parser.add_argument("--top", type=int, default=15, help="显示累计耗时最高的模块数")
+    parser.add_argument("--import-budget-ms", type=float, default=600, help="导入main的耗时预算(毫秒)")
+    parser.add_argument("--ready-budget-ms", type=float, default=2500, help="首次health返回200的耗时预算(毫秒)")
+    args = parser.parse_args()
+
+    import_times, ready_times = [], []
+    modules: Dict[str, List[float]] = {}
+    loaded: List[str] = []
+    for _ in range(args.runs):
+        total_ms, cumulative, loaded = measure_imports()
+        import_times.append(total_ms)
+        for module, ms in cumulative.items():
+            modules.setdefault(module, []).append(ms)
+        ready_times.append(measure_ready())
+
+    import_ms = statistics.median(import_times)
+    ready_ms = statistics.median(ready_times)
+
+    print(f"导入main: {import_ms:.1f}ms (中位数, {args.runs} 次)")
+    print(f"首次 /api/health 200: {ready_ms:.1f}ms")
+    print(f"\n累计导入耗时最高的 {args.top} 个模块:")
+    ranked = sorted(((statistics.median(v), k) for k, v in modules.items()), reverse=True)
+    for ms, module in ranked[:args.top]:
+        print(f"  {ms:8.1f}ms  {module}")
+
+    failures = []
+    if loaded:
+        failures.append(f"冷启动加载了应延迟加载的模块: {', '.join(loaded)}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"导入耗时 {import_ms:.1f}ms 超过预算 {args.import_budget_ms}ms")
+    if ready_ms > args.ready_budget_ms:
+        failures.append(f"就绪耗时 {ready_ms:.1f}ms 超过预算 {args.ready_budget_ms}ms")
+
+    if failures:
+        print("\n预算检查未通过:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n预算检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+核心流程基准测试套件
+在合成PPT上测量解析、生成、迭代修正、修改报告和内容分析响应解析的耗时,
+结果保存为JSON(按提交命名),compare子命令比较两次结果并标出性能回退
+
+用法(在backend目录下):
+    python -m benchmarks.bench_suite run --slides 100 --images 1 --charts 1
+    python -m benchmarks.bench_suite compare benchmarks/results/<基线>.json benchmarks/results/<新>.json
+    python -m pytest tests/test_benchmarks.py -q  # 在小规模PPT上确认各用例可以运行
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import (
+    AnalyzerSettings,
+    ConflictResolutionConfig,
+    IterationConfig,
+    get_settings
+)
+from app.models.schemas import (
+    ContentAnalysisResult,
+    FinalOptimizationPlan,
+    OptimizationOpportunity,
+    PPTParseResult,
+    UserEditRequest
+)
+from app.services.change_tracker import ChangeTracker
+from app.services.content_analyzer import ContentAnalyzer
+from app.services.iteration_corrector import IterationCorrector
+from app.services.ppt_generator import PPTGenerator
+from app.services.ppt_parser import PPTParser
+from benchmarks.bench_conflict_detection import build_suggestions
+from benchmarks.synthetic_deck import DeckSpec, build_deck
+
+
+CASES = ("parse", "generate", "iteration", "change_report", "analysis_response")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def build_analysis_response(ppt_data: PPTParseResult) -> Dict[str, Any]:
+    """
+    生成合成的内容分析模型响应(通义千问响应格式,每页一条分析和一个优化机会)
+
+    Args:
+        ppt_data: PPT解析数据
+
+    Returns:
+        Dict[str, Any]: 模型响应
+    """
+    indices = list(range(ppt_data.total_slides))
+    analysis = {
+        "overall_analysis": {
+            "key_points": ["收入增长", "成本控制", "渠道扩张"],
+            "theme": "季度经营分析",
+            "target_audience": "管理层",
+            "presentation_goal": "汇报经营情况",
+            "outline_structure": {
+                "sections": [{
+                    "section_name": "经营概况",
+                    "slide_indices": indices,
+                    "purpose": "汇报",
+                    "is_necessary": True
+                }],
+                "structure_type": "linear",
+                "structure_quality": "good",
+                "structure_issues": []
+            },
+            "content_coherence": 7.5,
+            "logic_flow": 7.0,
+            "completeness": 8.0,
+            "overall_suggestions": ["统一各页标题格式"]
+        },
+        "slide_analyses": [
+            {
+                "slide_index": slide.slide_index,
+                "slide_title": slide.content.split("\n", 1)[0],
+                "main_points": slide.content.split("\n")[1:4],
+                "clarity": 7.0,
+                "relevance": 8.0,
+                "information_density": "appropriate",
+                "issues": [{"issue_type": "unclear", "description": "要点缺少数据支撑", "severity": "minor"}],
+                "optimization_directions": ["补充数据来源"]
+            }
+            for slide in ppt_data.slides
+        ],
+        "optimization_opportunities": [
+            {
+                "scope": "slide",
+                "slide_indices": [idx],
+                "category": "content",
+                "title": "精简正文",
+                "description": "正文要点重复",
+                "current_state": "三段正文",
+                "suggested_action": "合并为两个要点",
+                "expected_benefit": "提升可读性",
+                "priority": "medium",
+                "impact_score": 6.0
+            }
+            for idx in indices
+        ]
+    }
+    content = "分析结果如下:\n" + json.dumps(analysis, ensure_ascii=False)
+    return {"output": {"choices": [{"message": {"content": content}}]}}
+
+
+class SuiteContext:
+    """各测试用例共用的输入(合成PPT及其解析结果、建议、方案和分析结果)"""
+
+    def __init__(self, work_dir: Path, spec: DeckSpec, models: int):
+        self.work_dir = work_dir
+        self.deck = build_deck(work_dir / "synthetic.pptx", spec)
+        self.loop = asyncio.new_event_loop()
+
+        self.ppt_data = PPTParser().parse(str(self.deck), "bench_suite")
+        self.model_suggestions = build_suggestions(spec.slides, models, divergence=0.1)
+
+        self.corrector = IterationCorrector(IterationConfig(), ConflictResolutionConfig())
+        self.plan: FinalOptimizationPlan = self.run_async(
+            self.corrector.process("bench_suite", self.model_suggestions, self.ppt_data)
+        )
+
+        # 固定使用通义千问的响应格式,结果不受本地配置中分析模型的影响
+        analyzer_config = AnalyzerSettings.from_settings(get_settings()).copy(update={"model_name": "qianwen"})
+        self.analyzer = ContentAnalyzer(analyzer_config)
+        self.analysis_response = build_analysis_response(self.ppt_data)
+        self.analysis: ContentAnalysisResult = self.analyzer._parse_analysis_response(
+            self.analysis_response, "bench_suite"
+        )
+
+        self.generator = PPTGenerator(output_dir=str(work_dir / "outputs"))
+        self.generate_result = self.run_async(self.generator.generate(str(self.deck), self.ppt_data, self.plan))
+        if not self.generate_result.success:
+            raise RuntimeError(f"合成PPT生成失败: {self.generate_result.error_message}")
+
+        opportunities: List[OptimizationOpportunity] = [
+            opp.copy(update={"user_modified": True, "user_comment": "改为一个要点"})
+            for opp in self.analysis.optimization_opportunities[::5]
+        ]
+        self.user_edits = UserEditRequest(ppt_id="bench_suite", modified_opportunities=opportunities)
+        self.tracker = ChangeTracker(xml_diff=True, diff_workers=0)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def case(self, name: str) -> Callable[[], Any]:
+        """
+        获取测试用例
+
+        Args:
+            name: 用例名
+
+        Returns:
+            Callable: 无参数的被测函数
+        """
+        if name == "parse":
+            return lambda: PPTParser().parse(str(self.deck), "bench_suite")
+        if name == "generate":
+            return lambda: self.run_async(self.generator.generate(str(self.deck), self.ppt_data, self.plan))
+        if name == "iteration":
+            return lambda: self.run_async(
+                self.corrector.process("bench_suite", self.model_suggestions, self.ppt_data)
+            )
+        if name == "change_report":
+            return lambda: self.tracker.generate_report(
+                self.ppt_data,
+                self.analysis,
+                self.user_edits,
+                self.plan,
+                self.generate_result,
+                original_ppt_path=str(self.deck)
+            )
+        if name == "analysis_response":
+            return lambda: self.analyzer._parse_analysis_response(self.analysis_response, "bench_suite")
+        raise ValueError(f"未知的测试用例: {name}")
+
+    def close(self):
+        self.loop.close()
+
+
+def measure(fn: Callable[[], Any], runs: int, warmup: int) -> Dict[str, float]:
+    """
+    多次执行并统计耗时
+
+    Args:
+        fn: 被测函数
+        runs: 计时次数
+        warmup: 预热次数(不计时)
+
+    Returns:
+        Dict[str, float]: 耗时统计(毫秒)
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "stdev_ms": round(statistics.stdev(samples), 3) if runs > 1 else 0.0
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    """当前提交和工作区是否有未提交的修改(不在git仓库中时为unknown)"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        ).stdout.decode().strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        ).stdout.decode().strip()
+        return {"commit": commit, "dirty": bool(status)}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": False}
+
+
+def run_suite(args) -> int:
+    spec = DeckSpec(
+        slides=args.slides,
+        shapes_per_slide=args.shapes,
+        paragraphs=args.paragraphs,
+        sentences_per_paragraph=args.sentences,
+        images=args.images,
+        image_size=args.image_size,
+        charts=args.charts
+    )
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        context = SuiteContext(Path(tmp), spec, args.models)
+        try:
+            for name in args.cases:
+                results[name] = measure(context.case(name), args.runs, args.warmup)
+                print(f"  {name:<20}{results[name]['median_ms']:>12.2f} ms")
+        finally:
+            context.close()
+
+    revision = git_revision()
+    report = {
+        "commit": revision["commit"],
+        "dirty": revision["dirty"],
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "deck": spec._asdict(),
+        "models": args.models,
+        "cases": results
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{revision['commit']}{'-dirty' if revision['dirty'] else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已保存: {output}")
+    return 0
+
+
+def compare(
+    base: Dict[str, Any],
+    head: Dict[str, Any],
+    threshold: float,
+    min_delta_ms: float,
+    stat: str = "min_ms"
+) -> List[Dict[str, Any]]:
+    """
+    比较两次结果的耗时
+
+    新结果比基线慢threshold以上且绝对差值超过min_delta_ms时记为回退。
+
+    Args:
+        base: 基线结果
+        head: 新结果
+        threshold: 相对变化阈值(如0.1表示10%)
+        min_delta_ms: 绝对差值下限(毫秒),过滤计时噪声
+        stat: 比较的统计量(min_ms受其他进程干扰最小,median_ms更接近典型耗时)
+
+    Returns:
+        List[Dict[str, Any]]: 各用例的比较结果
+    """
+    rows = []
+    for name, head_case in head["cases"].items():
+        base_case = base["cases"].get(name)
+        if base_case is None:
+            rows.append({"case": name, "base": None, "head": head_case[stat], "change": None, "status": "新增"})
+            continue
+        before, after = base_case[stat], head_case[stat]
+        change = after / before - 1 if before else 0.0
+        if change > threshold and after - before > min_delta_ms:
+            status = "回退"
+        elif change < -threshold and before - after > min_delta_ms:
+            status = "提升"
+        else:
+            status = "持平"
+        rows.append({"case": name, "base": before, "head": after, "change": change, "status": status})
+    return rows
+
+
+def run_compare(args) -> int:
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    head = json.loads(Path(args.head).read_text(encoding="utf-8"))
+
+    print(f"基线 {base['commit']} ({base['timestamp']})  ->  新 {head['commit']} ({head['timestamp']})")
+    if base.get("deck") != head.get("deck") or base.get("models") != head.get("models"):
+        print("警告: 两次结果使用的合成PPT参数不同,比较结果仅供参考")
+
+    rows = compare(base, head, args.threshold, args.min_delta_ms, args.stat)
+    print(f"  {'用例':<20}{'基线(ms)':>12}{'新(ms)':>12}{'变化':>10}  状态")
+    for row in rows:
+        base_text = f"{row['base']:.2f}" if row["base"] is not None else "-"
+        change_text = f"{row['change'] * 100:+.1f}%" if row["change"] is not None else "-"
+        print(f"  {row['case']:<20}{base_text:>12}{row['head']:>12.2f}{change_text:>10}  {row['status']}")
+
+    regressions = [row["case"] for row in rows if row["status"] == "回退"]
+    if regressions:
+        print(f"性能回退: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaults = DeckSpec()
+    parser = argparse.ArgumentParser(description="核心流程基准测试套件")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="执行基准测试并保存结果")
+    run_parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES), help="执行的测试用例")
+    run_parser.add_argument("--runs", type=int, default=5, help="每个用例的计时次数(取中位数)")
+    run_parser.add_argument("--warmup", type=int, default=1, help="每个用例的预热次数")
+    run_parser.add_argument("--slides", type=int, default=defaults.slides)
+    run_parser.add_argument("--shapes", type=int, default=defaults.shapes_per_slide, help="每页额外文本框数")
+    run_parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs, help="正文段落数")
+    run_parser.add_argument("--sentences", type=int, default=defaults.sentences_per_paragraph, help="每段句数")
+    run_parser.add_argument("--images", type=int, default=defaults.images, help="每页图片数")
+    run_parser.add_argument("--image-size", type=int, default=defaults.image_size, help="图片边长(像素)")
+    run_parser.add_argument("--charts", type=int, default=defaults.charts, help="每页图表数")
+    run_parser.add_argument("--models", type=int, default=3, help="合成建议的模型数")
+    run_parser.add_argument("--output", help="结果路径(默认 benchmarks/results/<提交>.json)")
+
+    compare_parser = commands.add_parser("compare", help="比较两次结果,有性能回退时返回1")
+    compare_parser.add_argument("base", help="基线结果JSON")
+    compare_parser.add_argument("head", help="新结果JSON")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="判定回退的相对变化阈值")
+    compare_parser.add_argument("--stat", choices=("min_ms", "median_ms"), default="min_ms", help="比较的统计量")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0, help="判定回退的绝对差值下限(毫秒)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run_suite(args)
+    return run_compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+合成PPT生成器
+用python-pptx生成用于基准测试的PPT,可调整页数、每页形状数、图片尺寸、图表数和文字量。
+同样的参数和随机种子生成的内容相同,便于在不同提交之间比较
+
+用法(在backend目录下):
+    python -m benchmarks.synthetic_deck /tmp/deck.pptx --slides 200 --images 1 --image-size 1200 --charts 1
+"""
+import argparse
+import io
+import random
+from pathlib import Path
+from typing import NamedTuple
+
+from PIL import Image, ImageDraw
+from pptx import Presentation
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE
+from pptx.util import Inches, Pt
+
+
+_TITLES = ("季度经营分析", "市场趋势", "产品路线图", "客户反馈", "成本结构", "下一步计划")
+_SENTENCES = (
+    "收入同比增长12%,主要来自华东地区",
+    "毛利率提升至38%",
+    "下季度重点: 渠道扩张与成本控制",
+    "新客户占比达到四成,复购率稳定",
+    "研发投入集中在核心平台能力",
+    "供应链交付周期缩短了两周",
+)
+
+
+class DeckSpec(NamedTuple):
+    """合成PPT参数"""
+    slides: int = 50
+    shapes_per_slide: int = 1  # 每页额外的文本框数
+    paragraphs: int = 3  # 正文段落数
+    sentences_per_paragraph: int = 1  # 每段句数(控制文字量)
+    images: int = 0  # 每页图片数
+    image_size: int = 800  # 图片边长(像素)
+    charts: int = 0  # 每页图表数
+    seed: int = 42
+
+
+def _image_bytes(size: int, label: str, rng: random.Random) -> bytes:
+    """生成带噪点的PNG(每张内容不同,避免被python-pptx按哈希去重)"""
+    image = Image.effect_noise((size, size), rng.uniform(20, 80)).convert("RGB")
+    ImageDraw.Draw(image).text((10, 10), label, fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_deck(path: Path, spec: DeckSpec = DeckSpec()) -> Path:
+    """
+    生成合成PPT
+
+    每页使用"标题和内容"版式: 标题、若干段正文、额外文本框、图片和柱状图。
+
+    Args:
+        path: 输出路径
+        spec: 合成PPT参数
+
+    Returns:
+        Path: 输出路径
+    """
+    rng = random.Random(spec.seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for idx in range(spec.slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"第 {idx + 1} 页 {rng.choice(_TITLES)}"
+
+        body = slide.placeholders[1].text_frame
+        for para_idx in range(spec.paragraphs):
+            text = ",".join(rng.choice(_SENTENCES) for _ in range(spec.sentences_per_paragraph))
+            paragraph = body.paragraphs[0] if para_idx == 0 else body.add_paragraph()
+            paragraph.text = text
+
+        for shape_idx in range(spec.shapes_per_slide):
+            box = slide.shapes.add_textbox(
+                Inches(0.5 + shape_idx % 3 * 3), Inches(6 + shape_idx // 3 * 0.4), Inches(3), Inches(0.4)
+            )
+            box.text_frame.text = "数据来源: 财务部"
+            box.text_frame.paragraphs[0].runs[0].font.size = Pt(12)
+
+        for image_idx in range(spec.images):
+            blob = _image_bytes(spec.image_size, f"{idx}-{image_idx}", rng)
+            slide.shapes.add_picture(
+                io.BytesIO(blob), Inches(6 + image_idx * 0.3), Inches(1.5 + image_idx * 0.3), width=Inches(3)
+            )
+
+        for chart_idx in range(spec.charts):
+            data = CategoryChartData()
+            data.categories = ["Q1", "Q2", "Q3", "Q4"]
+            data.add_series("收入", [rng.randint(50, 150) for _ in range(4)])
+            data.add_series("成本", [rng.randint(30, 100) for _ in range(4)])
+            slide.shapes.add_chart(
+                XL_CHART_TYPE.COLUMN_CLUSTERED,
+                Inches(0.5 + chart_idx * 0.3), Inches(3.5 + chart_idx * 0.3), Inches(4.5), Inches(2.5),
+                data
+            )
+
+    prs.save(str(path))
+    return path
+
+
+def main():
+    defaults = DeckSpec()
+    parser = argparse.ArgumentParser(description="生成合成PPT")
+    parser.add_argument("output", help="输出路径")
+    parser.add_argument("--slides", type=int, default=defaults.slides)
+    parser.add_argument("--shapes", type=int, default=defaults.shapes_per_slide, help="每页额外文本框数")
+    parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs, help="正文段落数")
+    parser.add_argument("--sentences", type=int, default=defaults.sentences_per_paragraph, help="每段句数")
+    parser.add_argument("--images", type=int, default=defaults.images, help="每页图片数")
+    parser.add_argument("--image-size", type=int, default=defaults.image_size, help="图片边长(像素)")
+    parser.add_argument("--charts", type=int, default=defaults.charts, help="每页图表数")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+
+    spec = DeckSpec(
+        slides=args.slides,
+        shapes_per_slide=args.shapes,
+        paragraphs=args.paragraphs,
+        sentences_per_paragraph=args.sentences,
+        images=args.images,
+        image_size=args.image_size,
+        charts=args.charts,
+        seed=args.seed
+    )
+    path = build_deck(Path(args.output), spec)
+    print(f"已生成 {path} ({path.stat().st_size / 1024:.0f} KB): {spec}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 """
 主程序入口
 FastAPI应用启动文件
+
+冷启动只加载FastAPI和路由;python-pptx、httpx等较重的依赖在第一次处理任务时由服务容器加载,
+目录和日志文件在第一次使用时创建。
 """
+import asyncio
 import sys
 from pathlib import Path
 from fastapi import FastAPI
@@ -11,36 +15,46 @@ from loguru import logger
 # 添加项目根目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.core.config import get_settings
-from app.api.routes import router
-from app.utils import ensure_dir
+from app.core.config import get_settings, watch_config_file
+from app.utils.log_sampling import configure_log_sampling
+from app.api.routes import router, resume_interrupted_jobs
+from app.api.batch_routes import router as batch_router
+from app.services.slide_diff import shutdown_diff_pool
 
 
 # 配置日志
 def setup_logging():
     """配置日志系统"""
     settings = get_settings()
-    log_dir = ensure_dir(settings.logging.log_dir)
+    config = settings.logging
+    log_dir = Path(config.log_dir)
 
     # 移除默认处理器
     logger.remove()
 
+    # 热点路径日志的采样参数
+    configure_log_sampling(config.sample_interval, config.sample_every)
+
     # 添加控制台输出
     logger.add(
         sys.stdout,
-        format=settings.logging.format,
-        level=settings.logging.level,
-        colorize=True
+        format=config.format,
+        level=config.level,
+        colorize=True,
+        enqueue=config.enqueue
     )
 
-    # 添加文件输出
+    # 添加文件输出(第一条日志写入时才创建目录和文件;启用enqueue时轮转压缩也在后台线程进行)
     logger.add(
-        log_dir / "app.log",
-        format=settings.logging.format,
-        level=settings.logging.level,
-        rotation=settings.logging.rotation,
-        retention=settings.logging.retention,
-        compression="zip"
+        log_dir / ("app.json.log" if config.serialize else "app.log"),
+        format=config.format,
+        level=config.level,
+        rotation=config.rotation,
+        retention=config.retention,
+        compression=config.compression,
+        enqueue=config.enqueue,
+        serialize=config.serialize,
+        delay=True
     )
 
     logger.info("日志系统初始化完成")
@@ -75,16 +89,22 @@ def create_app() -> FastAPI:
 
     # 注册路由
     app.include_router(router, prefix="/api", tags=["PPT Optimizer"])
+    app.include_router(batch_router, prefix="/api", tags=["Batch"])
 
     # 启动事件
     @app.on_event("startup")
     async def startup_event():
         logger.info(f"{settings.app.name} v{settings.app.version} 启动中...")
 
-        # 确保必要的目录存在
-        ensure_dir(settings.upload.upload_dir)
-        ensure_dir(settings.upload.temp_dir)
-        ensure_dir(settings.logging.log_dir)
+        # 从检查点恢复中断的任务(在后台执行,不推迟应用就绪)
+        if settings.checkpoint.enabled and settings.checkpoint.resume_on_startup:
+            app.state.resume_task = asyncio.ensure_future(resume_interrupted_jobs())
+
+        # 监视配置文件,修改后自动重新加载
+        if settings.config_reload.watch:
+            app.state.config_watcher = asyncio.ensure_future(
+                watch_config_file(settings.config_reload.watch_interval)
+            )
 
         logger.info("应用启动完成")
 
@@ -92,6 +112,19 @@ def create_app() -> FastAPI:
     @app.on_event("shutdown")
     async def shutdown_event():
         logger.info("应用正在关闭...")
+        watcher = getattr(app.state, "config_watcher", None)
+        if watcher is not None:
+            watcher.cancel()
+        resume_task = getattr(app.state, "resume_task", None)
+        if resume_task is not None:
+            resume_task.cancel()
+        shutdown_diff_pool()
+        # 媒体压缩模块依赖python-pptx,只在已加载(可能创建过进程池)时关闭
+        media_optimizer = sys.modules.get("app.services.media_optimizer")
+        if media_optimizer is not None:
+            media_optimizer.shutdown_media_pool()
+        # 等待队列中的日志写完
+        await logger.complete()
 
     return app
 
@@ -0,0 +1,5 @@
+"""pytest配置: 将backend目录加入Python路径(与main.py一致)"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
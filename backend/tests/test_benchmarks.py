@@ -0,0 +1,37 @@
+"""
+基准测试套件冒烟测试
+在小规模合成PPT上逐个执行 benchmarks.bench_suite 的用例,确认各用例可以运行;
+计时结果和性能回退检查仍使用 python -m benchmarks.bench_suite run/compare
+
+用法(在backend目录下):
+    python -m pytest tests/test_benchmarks.py -q
+"""
+import pytest
+
+from benchmarks.bench_suite import CASES, SuiteContext, compare, measure
+from benchmarks.synthetic_deck import DeckSpec
+
+
+_SPEC = DeckSpec(slides=6, images=1, image_size=64, charts=1)
+
+
+@pytest.fixture(scope="module")
+def context(tmp_path_factory):
+    suite = SuiteContext(tmp_path_factory.mktemp("bench_suite"), _SPEC, models=2)
+    yield suite
+    suite.close()
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_case_runs(context, name):
+    assert context.case(name)() is not None
+
+
+def test_measure_and_compare(context):
+    result = measure(context.case("analysis_response"), runs=2, warmup=0)
+    assert result["runs"] == 2 and result["median_ms"] > 0
+
+    baseline = {"cases": {"analysis_response": result}}
+    slower = {"cases": {"analysis_response": dict(result, min_ms=result["min_ms"] * 2 + 10)}}
+    assert [row["status"] for row in compare(baseline, baseline, 0.1, 1.0)] == ["持平"]
+    assert [row["status"] for row in compare(baseline, slower, 0.1, 1.0)] == ["回退"]
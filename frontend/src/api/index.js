@@ -42,9 +42,9 @@ export default {
     return api.get(`/status/${pptId}`)
   },
 
-  // 获取处理结果
-  getResult(pptId) {
-    return api.get(`/result/${pptId}`)
+  // 获取处理结果（params.include_changes=false 时修改报告只含头部）
+  getResult(pptId, params = {}) {
+    return api.get(`/result/${pptId}`, { params })
   },
 
   // 下载优化后的PPT
@@ -69,6 +69,11 @@ export default {
     return api.post(`/submit-edits/${pptId}`, editRequest)
   },
 
+  // 取消任务
+  cancelJob(pptId) {
+    return api.delete(`/jobs/${pptId}`)
+  },
+
   // 跳过审查（使用默认建议）
   skipReview(pptId) {
     return api.post(`/skip-review/${pptId}`)
@@ -77,5 +82,15 @@ export default {
   // 获取修改追踪报告
   getChangeReport(pptId) {
     return api.get(`/change-report/${pptId}`)
+  },
+
+  // 获取修改追踪报告头部（统计汇总）
+  getChangeReportSummary(pptId) {
+    return api.get(`/change-report/${pptId}/summary`)
+  },
+
+  // 分页获取修改记录（slide/dimension/source/impact/change_type/page/page_size）
+  getChangeReportChanges(pptId, params = {}) {
+    return api.get(`/change-report/${pptId}/changes`, { params })
   }
 }